@@ -0,0 +1,58 @@
+"""Bytes on the wire with and without gzip transfer encoding.
+
+Fetches every event of synthetic calendars from the local stand-in server,
+once asking for compressed responses and once with --nogzip::
+
+    python benchmarks/compression.py
+    python benchmarks/compression.py --events 10000 --descr-size 2000
+
+The byte counts are response bodies as sent, i.e. compressed when gzip is
+on, and include the discovery document.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli.gcal import GoogleCalendarInterface  # noqa: E402
+from gcalcli.tests.standin import (StandinServer,  # noqa: E402
+                                   SyntheticCalendars)
+
+
+def run(server, gzip):
+    before = server.stats['bytes']
+    start = time.perf_counter()
+    gcal = GoogleCalendarInterface(use_cache=False, gzip=gzip,
+                                   api_endpoint=server.url)
+    count = sum(1 for _ in gcal.events())
+    return count, server.stats['bytes'] - before, \
+        time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--calendars', type=int, default=4)
+    parser.add_argument('--descr-size', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=250)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticCalendars(events=args.events, calendars=args.calendars,
+                              descr_size=args.descr_size)
+    print('%-6s %8s %12s %9s' % ('gzip', 'events', 'bytes', 'seconds'))
+    results = {}
+    with StandinServer(data, page_size=args.page_size,
+                       latency=args.latency) as server:
+        for gzip in (False, True):
+            count, size, elapsed = results[gzip] = run(server, gzip)
+            print('%-6s %8d %12d %9.3f' % ('on' if gzip else 'off', count,
+                                           size, elapsed))
+    print('%.1fx fewer bytes with gzip' % (results[False][1] /
+                                           float(results[True][1])))
+
+
+if __name__ == '__main__':
+    main()
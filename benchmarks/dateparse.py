@@ -0,0 +1,46 @@
+"""Date parsing throughput over typical --when inputs.
+
+Compares a fresh DateTimeParser with a cold memo on every call (what bulk
+adds, edits and imports used to pay per timestamp) against the shared,
+memoised parser::
+
+    python benchmarks/dateparse.py --count 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli import utils  # noqa: E402
+
+WHEN = ['2018-09-24T15:30', '9/24/2018', '24/09/2018', 'Sep 24 2018 3:30pm',
+        '2018-09-24T15:30-8:00', '20180924T15', '8am', '12/14/2018 10:00',
+        'tomorrow', 'next monday 9am', 'today 5pm', 'in 2 hours']
+
+
+def run(count, cold):
+    inputs = [WHEN[n % len(WHEN)] for n in range(count)]
+    start = time.perf_counter()
+    for when in inputs:
+        if cold:
+            utils._parse_absolute.cache_clear()
+            utils.DateTimeParser._pdtCalendar = None
+        utils.DateTimeParser().from_string(when)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    for name, cold in (('cold', True), ('memoised', False)):
+        elapsed = run(args.count, cold)
+        print('%-9s %8d parses %8.3fs %10.1f us/parse' % (
+            name, args.count, elapsed, elapsed / args.count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""End-to-end timings of gcalcli commands against the local stand-in server.
+
+Each command runs as a fresh ``gcalcli`` process, the way users run it,
+against synthetic calendars of 1k, 10k and 100k events::
+
+    python benchmarks/e2e.py
+    python benchmarks/e2e.py --sizes 1000 --latency 0.05 --repeat 3
+    python benchmarks/e2e.py --only search --extra='--fetch_threads=1'
+
+Wall time is the best of ``--repeat`` runs; the request and byte counts
+come from the stand-in's own counters for the last run.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli.tests.standin import (RARE_SUMMARY, StandinServer,  # noqa: E402
+                                   SyntheticCalendars)
+
+GCALCLI = [sys.executable, '-c', 'from gcalcli.cli import main; main()']
+
+ICS_EVENT = '''BEGIN:VEVENT
+UID:import-%(n)d@standin.gcalcli
+SUMMARY:Imported %(n)d
+LOCATION:Room %(room)d
+DTSTART:%(day)sT%(hour)02d0000Z
+DTEND:%(day)sT%(hour)02d3000Z
+DESCRIPTION:Synthetic imported event %(n)d
+END:VEVENT
+'''
+
+
+def write_ics(path, count):
+    with open(path, 'w') as f:
+        f.write('BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:gcalcli-bench\n')
+        for n in range(count):
+            day = '2018%02d%02d' % (n % 12 + 1, n % 28 + 1)
+            f.write(ICS_EVENT % {'n': n, 'room': n % 10, 'day': day,
+                                 'hour': 8 + n % 10})
+        f.write('END:VCALENDAR\n')
+
+
+def commands(ics_file):
+    # run in this order: import adds events and delete removes them
+    return [
+        ('agenda', ['agenda', '2018-03-01', '2018-03-31']),
+        ('search', ['search', 'review']),
+        ('calw', ['calw', '4', '2018-03-05']),
+        ('calm', ['calm', '2018-03-01']),
+        ('import', ['--calendar', 'Synthetic 0', 'import', ics_file]),
+        ('delete', ['--iamaexpert', 'delete', RARE_SUMMARY]),
+    ]
+
+
+def run(server, argv, home, extra=()):
+    env = dict(os.environ, HOME=home)
+    cmd = GCALCLI + ['--api_endpoint', server.url, '--nocache',
+                     '--nocolor', '--nolineart'] + list(extra) + argv
+    before = dict(server.stats)
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        sys.stderr.write(proc.stderr.decode('utf-8', 'replace'))
+        raise SystemExit('%s failed' % ' '.join(argv))
+    delta = {k: server.stats[k] - before.get(k, 0)
+             for k in ('requests', 'batched', 'bytes', 'errors')}
+    return elapsed, delta, len(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='comma separated event counts')
+    parser.add_argument('--calendars', type=int, default=4)
+    parser.add_argument('--recurrence', type=float, default=0.2)
+    parser.add_argument('--descr-size', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=250)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-code', type=int, default=403,
+                        choices=(403, 429))
+    parser.add_argument('--import-count', type=int, default=None,
+                        help='events per import (default: size / 100)')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--only', default=None,
+                        help='comma separated subset of commands to run')
+    parser.add_argument('--extra', default='',
+                        help="extra gcalcli flags, e.g. "
+                             "--extra='--fetch_threads=1'")
+    args = parser.parse_args(argv)
+
+    only = args.only.split(',') if args.only else None
+    print('%8s  %-7s %9s %9s %8s %11s %7s' % (
+        'events', 'command', 'seconds', 'requests', 'batched', 'bytes',
+        'errors'))
+
+    home = tempfile.mkdtemp(prefix='gcalcli-bench-')
+    for size in [int(s) for s in args.sizes.split(',')]:
+        ics_file = os.path.join(home, 'import-%d.ics' % size)
+        write_ics(ics_file, args.import_count or max(size // 100, 1))
+
+        for name, cmd in commands(ics_file):
+            if only and name not in only:
+                continue
+            best = None
+            for _ in range(args.repeat):
+                # fresh data every run so import/delete see the same state
+                data = SyntheticCalendars(events=size,
+                                          calendars=args.calendars,
+                                          recurrence=args.recurrence,
+                                          descr_size=args.descr_size)
+                with StandinServer(data, page_size=args.page_size,
+                                   latency=args.latency,
+                                   error_rate=args.error_rate,
+                                   error_code=args.error_code) as server:
+                    elapsed, delta, _ = run(server, cmd, home,
+                                            args.extra.split())
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, delta)
+            elapsed, delta = best
+            print('%8d  %-7s %9.3f %9d %8d %11d %7d' % (
+                size, name, elapsed, delta['requests'], delta['batched'],
+                delta['bytes'], delta['errors']))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Window queries over locally held events: IntervalIndex vs a linear scan.
+
+Builds an index over synthetic events (a mix of short meetings and
+multi-day events), then times week-sized overlap queries, the per-week
+lookups calw/calm make, and incremental updates::
+
+    python benchmarks/intervals.py
+    python benchmarks/intervals.py --events 1000000 --queries 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli.intervals import IntervalIndex  # noqa: E402
+
+START = datetime(2018, 1, 1)
+CALENDARS = [{'id': 'cal%d' % n} for n in range(10)]
+
+
+def make_events(count, rnd):
+    events = []
+    for n in range(count):
+        s = START + timedelta(minutes=15 * rnd.randrange(4 * 24 * 365 * 2))
+        if rnd.random() < 0.05:
+            length = timedelta(days=rnd.randrange(1, 15))
+        else:
+            length = timedelta(minutes=15 * rnd.randrange(1, 9))
+        events.append({'id': 'e%d' % n, 'gcalcli_cal': CALENDARS[n % 10],
+                       's': s, 'e': s + length})
+    return events
+
+
+def scan(events, start, end):
+    return [e for e in events if e['s'] < end and e['e'] > start]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(0)
+    events = sorted(make_events(args.events, rnd), key=lambda e: e['s'])
+    windows = []
+    for _ in range(args.queries):
+        start = START + timedelta(days=rnd.randrange(2 * 365))
+        windows.append((start, start + timedelta(days=7)))
+
+    build, index = timed(IntervalIndex, events)
+    print('%d events, %d week-long windows' % (len(events), len(windows)))
+    print('%-28s %9.3fs' % ('build index', build))
+
+    def run_scan():
+        return sum(len(scan(events, *w)) for w in windows)
+
+    def run_index():
+        return sum(len(index.overlapping(*w)) for w in windows)
+
+    scan_time, found = timed(run_scan)
+    index_time, indexed = timed(run_index)
+    assert found == indexed
+    print('%-28s %9.3fs  (%d matches)' % ('linear scan', scan_time, found))
+    print('%-28s %9.3fs  (%.0fx)' % ('index.overlapping', index_time,
+                                     scan_time / index_time))
+
+    def run_weeks():
+        # what calw 52 does: the events starting in each week
+        return sum(len(index.starting(START + timedelta(weeks=w),
+                                      START + timedelta(weeks=w + 1)))
+                   for w in range(52))
+
+    weeks_time, _ = timed(run_weeks)
+    print('%-28s %9.3fs' % ('52 weeks via index.starting', weeks_time))
+
+    def run_updates():
+        for n in range(args.updates):
+            event = dict(events[rnd.randrange(len(events))])
+            event['s'] += timedelta(hours=1)
+            event['e'] += timedelta(hours=1)
+            index.add(event)
+
+    update_time, _ = timed(run_updates)
+    print('%-28s %9.3fs  (%.1fus each)' % (
+        '%d moves' % args.updates, update_time,
+        1e6 * update_time / args.updates))
+
+
+if __name__ == '__main__':
+    main()
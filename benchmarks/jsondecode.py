@@ -0,0 +1,96 @@
+"""Decoding big events pages: the standard library vs orjson and ujson.
+
+Records full events list pages of 2500 events with long descriptions from
+the local stand-in server, and the same pages with only the fields the
+calendar views read, then times decoding them through gcalcli's JSON model
+with each decoder that is installed::
+
+    python benchmarks/jsondecode.py
+    python benchmarks/jsondecode.py --pages DIR
+
+With --pages, every *.json file in DIR is decoded instead, e.g. pages
+saved from a real account.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli.gcal import (FastJsonModel,  # noqa: E402
+                          GoogleCalendarInterface)
+from gcalcli.tests.standin import (StandinServer,  # noqa: E402
+                                   SyntheticCalendars)
+
+
+def decoders():
+    yield 'json', json.loads
+    try:
+        import orjson
+        yield 'orjson', orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        yield 'ujson', ujson.loads
+    except ImportError:
+        pass
+
+
+def record(args):
+    data = SyntheticCalendars(events=args.events, calendars=args.calendars,
+                              descr_size=args.descr_size)
+    lean = 'etag,nextPageToken,items(%s)' % \
+        GoogleCalendarInterface.LEAN_EVENT_FIELDS
+    pages = {'full': [], 'lean': []}
+    with StandinServer(data, page_size=2500) as server:
+        for cal in data.calendars:
+            url = '%s/calendar/v3/calendars/%s/events?maxResults=2500' % (
+                server.url, cal['id'])
+            pages['full'].append(urlopen(url).read())
+            pages['lean'].append(urlopen(url + '&fields=' + lean).read())
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--pages', default=None,
+                        help='decode the *.json files in this directory')
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--calendars', type=int, default=4)
+    parser.add_argument('--descr-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        pages = {'pages': []}
+        for path in sorted(glob.glob(os.path.join(args.pages, '*.json'))):
+            with open(path, 'rb') as f:
+                pages['pages'].append(f.read())
+    else:
+        pages = record(args)
+
+    print('%-6s %-7s %7s %9s %9s' % ('pages', 'decoder', 'MB', 'seconds',
+                                     'MB/s'))
+    for name, content in pages.items():
+        size = sum(len(page) for page in content) / 1e6
+        for decoder, loads in decoders():
+            model = FastJsonModel(loads)
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for page in content:
+                    model.deserialize(page)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print('%-6s %-7s %7.1f %9.3f %9.1f' % (name, decoder, size, best,
+                                                   size / best))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
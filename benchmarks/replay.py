@@ -0,0 +1,68 @@
+"""Timings of a gcalcli command replayed from a recording, without network.
+
+Record a slow run once, wherever the data is (credentials are redacted)::
+
+    gcalcli --record /tmp/slow-calw calw 4
+
+and time it anywhere, with the same command and options, and optionally
+profile it::
+
+    python benchmarks/replay.py /tmp/slow-calw calw 4
+    python benchmarks/replay.py --repeat 10 /tmp/slow-calw calw 4
+    python benchmarks/replay.py --profile /tmp/calw.prof /tmp/slow-calw calw 4
+
+Each run is a fresh ``gcalcli`` process; wall time is the best of
+``--repeat`` runs.  Replays ask for the same times the recording did, but
+dates are shown in the local timezone, so set TZ as it was when recording.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+GCALCLI = [sys.executable, '-c', 'from gcalcli.cli import main; main()']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('recording', help='folder made with --record')
+    parser.add_argument('command', nargs=argparse.REMAINDER,
+                        help='the gcalcli command and options recorded')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--profile', default=None,
+                        help='also write a cProfile of one run here')
+    args = parser.parse_args(argv)
+
+    home = tempfile.mkdtemp(prefix='gcalcli-replay-')
+    env = dict(os.environ, HOME=home,
+               PYTHONPATH=os.path.join(os.path.dirname(__file__), '..'))
+    cmd = GCALCLI + ['--replay', args.recording] + args.command
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if proc.returncode:
+            sys.stderr.write(proc.stdout.decode('utf-8', 'replace'))
+            sys.stderr.write(proc.stderr.decode('utf-8', 'replace'))
+            raise SystemExit('replay failed')
+        best = elapsed if best is None else min(best, elapsed)
+    print('%s: best of %d runs %.3fs, %d bytes of output' % (
+        ' '.join(args.command), args.repeat, best, len(proc.stdout)))
+
+    if args.profile:
+        script = os.path.join(home, 'gcalcli_main.py')
+        with open(script, 'w') as f:
+            f.write('from gcalcli.cli import main\nmain()\n')
+        subprocess.run([sys.executable, '-m', 'cProfile', '-o', args.profile,
+                        script, '--replay', args.recording] + args.command,
+                       env=env, stdout=subprocess.DEVNULL, check=True)
+        print('profile written to %s' % args.profile)
+
+
+if __name__ == '__main__':
+    main()
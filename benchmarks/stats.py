@@ -0,0 +1,83 @@
+"""Time and memory of the stats command over a synthetic year.
+
+Serves a year of events on 50 calendars from the local stand-in server and
+runs ``gcalcli stats`` for each --by grouping, next to ``agenda --tsv`` over
+the same window, the output the same figures had to be worked out from
+before::
+
+    python benchmarks/stats.py
+    python benchmarks/stats.py --events 200000 --calendars 100
+
+Each command is a fresh ``gcalcli`` process; peak memory is its maximum
+resident set size, as Linux reports it in /proc.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcalcli.tests.standin import (StandinServer,  # noqa: E402
+                                   SyntheticCalendars)
+
+# the child reports its own high water mark: the maximum resident set size
+# the kernel keeps for it would also count the pages of this process it
+# was forked from
+GCALCLI = [sys.executable, '-c', '''
+import atexit, sys
+from gcalcli.cli import main
+def report():
+    with open('/proc/self/status') as f:
+        sys.stderr.write([l for l in f if l.startswith('VmHWM')][0])
+atexit.register(report)
+main()''']
+WINDOW = ['2018-01-01', '2019-01-01']
+
+
+def commands():
+    yield 'agenda --tsv', ['--tsv', 'agenda'] + WINDOW
+    for by in ('week', 'day', 'calendar', 'attendee'):
+        yield 'stats ' + by, ['--by', by, 'stats'] + WINDOW
+
+
+def run(server, argv, home, extra=()):
+    env = dict(os.environ, HOME=home)
+    cmd = GCALCLI + ['--api_endpoint', server.url, '--nocache',
+                     '--nocolor'] + list(extra) + argv
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        sys.stderr.write(proc.stderr.decode('utf-8', 'replace'))
+        raise SystemExit('%s failed' % ' '.join(argv))
+    peak_kb = int(proc.stderr.split(b'VmHWM:')[1].split()[0])
+    return elapsed, peak_kb / 1024.0, proc.stdout.count(b'\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--calendars', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=2500)
+    parser.add_argument('--extra', default='',
+                        help="extra gcalcli flags, e.g. "
+                             "--extra='--fetch_threads=1'")
+    args = parser.parse_args(argv)
+
+    data = SyntheticCalendars(events=args.events, calendars=args.calendars,
+                              descr_size=200)
+    home = tempfile.mkdtemp(prefix='gcalcli-bench-')
+    print('%-15s %9s %9s %8s' % ('command', 'seconds', 'peak MB', 'lines'))
+    with StandinServer(data, page_size=args.page_size) as server:
+        for name, cmd in commands():
+            elapsed, peak, lines = run(server, cmd, home, args.extra.split())
+            print('%-15s %9.3f %9.1f %8d' % (name, elapsed, peak, lines))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,7 @@ usage:
                              Google search with quotes, exclusion, etc.
                            - for example to get just games: "soccer -practice"
                            - [start] and [end] use the same formats as agenda
+                           - --limit <n> shows only the first n events
 
   agenda [start] [end]     get an agenda for a time period
                            - start time default is 12am today
@@ -32,16 +33,68 @@ usage:
                               '2007-09-24T15:30-8:00'
                               '20070924T15'
                               '8am'
+                           - --limit <n> shows only the first n events and
+                             stops fetching once they are known
+                           - --watch <seconds> keeps redrawing the agenda,
+                             refetching only the events that changed
+                           - --result_ttl <seconds> reuses the output of the
+                             same agenda, search, calw, calm, caly, conflicts,
+                             findtime or stats for that long, and falls back
+                             to it when offline; with --stale_while_revalidate
+                             older output is shown at once and refreshed in
+                             the background, which suits status bars
+
+  conflicts [start] [end]  list the events that overlap each other, across
+                           all of the selected calendars
+                           - [start] and [end] default as for agenda, from
+                             midnight this morning
+                           - all-day events, events marked free and, with
+                             --nodeclined, declined events are left out
+                           - with --tsv, one line per conflict: when the two
+                             overlap, then each event's title and calendar
+
+  findtime [start] [end]   list the earliest times when all of the selected
+                           calendars are free
+                           - [start] defaults to now and [end] as for agenda
+                           - --duration minutes long, 30 by default
+                           - only within --working_hours (default 9:00-17:00)
+                             on weekdays, or every day with --weekends
+                           - --limit times (default 5)
+                           - calendars you can only see free/busy
+                             information for are asked for just that
+                           - with --tsv, one line per time: start date and
+                             time, then end date and time
+
+  stats [start] [end]      add up how the time in a window was used
+                           - [start] and [end] default as for agenda
+                           - --by week (default), day, calendar or attendee
+                           - per row: the number of events, their summed
+                             time, the time they kept busy (overlaps counted
+                             once) and the days of all-day events
+                           - events crossing midnight or the start of a week
+                             are split between the days or weeks
+                           - with --tsv, one line per row with the times in
+                             hours and all-day time in days
 
   calw <weeks> [start]     get a week based agenda in a nice calendar format
                            - weeks is the number of weeks to display
                            - start time default is beginning of this week
                            - note that all events for the week(s) are displayed
+                           - --watch <seconds> keeps the calendar up to date
 
   calm [start]             get a month agenda in a nice calendar format
                            - start time default is the beginning of this month
                            - note that all events for the month are displayed
                              and only one month will be displayed
+                           - --watch <seconds> keeps the calendar up to date
+
+  caly [start]             get a year at a glance: one character per day,
+                           darker the more events it has next to the
+                           busiest day
+                           - start time default is the beginning of this year
+                           - a year of weeks is displayed from the week
+                             containing the start
+                           - --watch <seconds> keeps the calendar up to date
 
   quick <text>             quick add an event to a calendar
                            - a single --calendar must specified
@@ -64,6 +117,12 @@ usage:
                                       --description 'It is going to be hard!'
                                       --reminder 30
                                       add
+                           - --batch <file> adds every row of a CSV, TSV or
+                             JSON Lines file ('-' for stdin) using batched
+                             requests; columns are named after the options
+                             above (title, where, when, duration, who,
+                             reminder, allday, description) and empty
+                             columns default to those options
 
   delete <text> [start] [end]
                            delete event(s) within the optional time period
@@ -98,4 +157,29 @@ usage:
                            - <mins> default is 10
                            - default command:
                               'notify-send -u critical -a gcalcli %%s'
+
+  bench [requests]         time the API as your calendars see it, reading
+                           only: auth, discovery, the calendar list, and
+                           listing events with page sizes of 50, 250 and
+                           2500 using 1, 4, 8 and 16 threads
+                           - [requests] per page size and thread count,
+                             default 32
+                           - per phase: p50 and p95 latency, items (events
+                             or calendars) per second and how many requests
+                             were throttled
+                           - ends with the --page_size and --fetch_threads
+                             that listed events quickest without throttling
+                           - with --tsv, one line per phase
+
+  batch [file]             run the commands in a file ('-' or none for
+                           standard input), one command line per line
+                           - e.g. 'agenda 2018-03-01 2018-03-08'
+                           - blank lines and lines starting with # are skipped
+                           - options given before batch apply to every line
+                           - the commands share one session and the events
+                             fetched so far, so overlapping windows are only
+                             fetched once
+                           - each command's output follows a ==> line <==
+                             header
+                           - --watch and nested batches are not allowed
 '''
@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
 import locale
+import errno
+import hashlib
+import io
+import json
 import os
+import select
+import shlex
 import signal
+import subprocess
 import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date
 from gcalcli import (__API_CLIENT_ID__, __API_CLIENT_SECRET__, __program__,
                      __version__, __author__, colors)
 
-from gcalcli import gcal
+from gcalcli import gcal, trace
+from gcalcli.memprofile import MemoryProfile
+from gcalcli.recording import Recorder, ReplayError, Replayer
 from gcalcli.utils import get_time_from_str
 
 # Required 3rd party libraries
 try:
     import gflags
+    import httplib2
+    from apiclient.errors import HttpError
 except ImportError as e:
     print("ERROR: Missing module - {}".format(e.args[0]))
     sys.exit(1)
@@ -42,8 +57,6 @@ except ImportError as e:
 #
 
 # XXX Todo/Cleanup XXX
-# threading is currently broken when getting event list
-# if threading works then move pageToken processing from GetAllEvents to thread
 # support different types of reminders plus multiple ones (popup, sms, email)
 # add caching, should be easy (dump all calendar JSON data to file)
 # add support for multiline description input in the 'add' and 'edit' commands
@@ -108,6 +121,14 @@ def get_cal_colors(cal_names):
     return cal_colors
 
 
+def valid_trace(value):
+    try:
+        trace.parse_categories(value or '')
+    except ValueError:
+        return False
+    return True
+
+
 def get_color(value):
     color_names = {'default': colors.CLR_NRM(),
                    'black': colors.CLR_BLK(),
@@ -134,8 +155,225 @@ def get_color(value):
         return None
 
 
-def debug_print(msg):
-    print_msg(colors.CLR_YLW(), msg)
+CLEAR_SCREEN = '\033[2J'
+
+
+def repaint(old_lines, new_lines):
+    """Escape sequences that turn a screen showing `old_lines` into one
+    showing `new_lines`, rewriting only the lines that differ."""
+    out = ''
+    for row, line in enumerate(new_lines):
+        if row < len(old_lines) and old_lines[row] == line:
+            continue
+        # move to the row, draw from a clean color state, clear the rest
+        out += '\033[%d;1H%s%s%s\033[K' % (
+                row + 1, colors.CLR_NRM(), line, colors.CLR_NRM())
+    if len(new_lines) < len(old_lines):
+        out += '\033[%d;1H\033[J' % (len(new_lines) + 1)
+    return out
+
+
+class OutputClosed(Exception):
+    """Whoever was reading our output (e.g. `| head`) has gone away."""
+    pass
+
+
+class BufferedOutput(object):
+    """Stands in for sys.stdout when it isn't a terminal, collecting the
+    output and writing it out in large chunks.  Once the reader goes away
+    every write and check() raises OutputClosed, which stops whatever is
+    being fetched or rendered."""
+
+    def __init__(self, stream, size=65536):
+        self.stream = stream
+        self.size = size
+        self.chunks = []
+        self.pending = 0
+        self.closed = False
+
+    def write(self, data):
+        if self.closed:
+            raise OutputClosed()
+        self.chunks.append(data)
+        self.pending += len(data)
+        if self.pending >= self.size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.closed:
+            raise OutputClosed()
+        data = ''.join(self.chunks)
+        self.chunks = []
+        self.pending = 0
+        try:
+            if data:
+                self.stream.write(data)
+            self.stream.flush()
+        except (BrokenPipeError, OSError) as e:
+            if getattr(e, 'errno', None) != errno.EPIPE:
+                raise
+            self._reader_gone()
+
+    def check(self):
+        """Raises OutputClosed if the reader has gone away, without
+        waiting for the next flush to find out."""
+        if self.closed:
+            raise OutputClosed()
+        if not hasattr(select, 'poll'):
+            return
+        try:
+            poll = select.poll()
+            poll.register(self.stream.fileno(), 0)
+            events = poll.poll(0)
+        except (AttributeError, OSError, ValueError):
+            return
+        # a pipe with no reader polls as an error
+        if events and events[0][1] & select.POLLERR:
+            self._reader_gone()
+
+    def close(self):
+        try:
+            self.flush()
+        except OutputClosed:
+            pass
+
+    def _reader_gone(self):
+        self.closed = True
+        self.chunks = []
+        # so the interpreter's own flush at exit doesn't complain either
+        try:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, self.stream.fileno())
+            os.close(devnull)
+        except (AttributeError, OSError, ValueError):
+            pass
+        raise OutputClosed()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def check_output():
+    """Raises OutputClosed once nobody is reading our output."""
+    if isinstance(sys.stdout, BufferedOutput):
+        sys.stdout.check()
+
+
+# commands that only need the fields in LEAN_EVENT_FIELDS
+LEAN_COMMANDS = ['calw', 'calm', 'caly', 'findtime', 'stats']
+
+# commands whose output only depends on the calendars, flags and arguments
+RESULT_COMMANDS = ['agenda', 'search', 'calw', 'calm', 'caly', 'conflicts',
+                   'findtime', 'stats']
+# flags that don't change what a command prints
+RESULT_KEY_IGNORED = set(['result_ttl', 'stale_while_revalidate', 'refresh',
+                          'cache', 'fetch_threads', 'debug', 'gzip',
+                          'flagfile', 'undefok'])
+REVALIDATING = 'GCALCLI_REVALIDATING'
+
+
+def result_cache_file(flags, args):
+    """Where the output of `args` with these flags is cached.  Today's date
+    is part of the key since relative times like the default agenda window
+    depend on it."""
+    values = flags.FlagValuesDict()
+    key = [(name, values[name]) for name in sorted(values)
+           if name not in RESULT_KEY_IGNORED]
+    key = repr((args, key, date.today().toordinal()))
+
+    if flags.config_folder:
+        folder = os.path.expanduser('%s/results' % flags.config_folder)
+    else:
+        folder = os.path.expanduser('~/.gcalcli_results')
+    return os.path.join(folder,
+                        hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def read_result(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def write_result(path, output):
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    # write then rename, so readers never see half a result
+    fd, tmp = tempfile.mkstemp(dir=folder)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'created': time.time(), 'output': output}, f)
+    os.replace(tmp, path)
+
+
+def revalidate(path, ttl, argv):
+    """Reruns the command `argv` in a detached process that refreshes the
+    result at `path`, unless another one is doing that already."""
+    lock = path + '.lock'
+    try:
+        if time.time() - os.path.getmtime(lock) < max(ttl, 60):
+            return
+        os.remove(lock)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except OSError:
+        return
+
+    subprocess.Popen(
+        [sys.executable, '-c', 'from gcalcli.cli import main; main()'] +
+        argv[1:],
+        env=dict(os.environ, **{REVALIDATING: lock}),
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def cached_command(flags, args, run, argv=None):
+    """Runs the command through the result cache: output younger than
+    --result_ttl is printed without running it, and older output is printed
+    if running it fails to reach the API, or right away (refreshing it in
+    the background by rerunning `argv`, sys.argv by default) with
+    --stale_while_revalidate."""
+    path = result_cache_file(flags, args)
+    lock = os.environ.get(REVALIDATING)
+    cached = None if (flags.refresh or lock) else read_result(path)
+
+    if cached:
+        fresh = time.time() - cached['created'] < flags.result_ttl
+        if fresh or flags.stale_while_revalidate:
+            trace.CACHE('result cache: %s output from %s',
+                        'fresh' if fresh else 'stale', path)
+            sys.stdout.write(cached['output'])
+            if not fresh:
+                revalidate(path, flags.result_ttl, argv or sys.argv)
+            return
+
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            run()
+    except (HttpError, httplib2.HttpLib2Error, OSError):
+        stale = read_result(path)
+        if not stale or lock:
+            sys.stdout.write(output.getvalue())
+            raise
+        trace.CACHE('result cache: API unreachable, stale output from %s',
+                    path)
+        sys.stdout.write(stale['output'])
+        return
+    except SystemExit:
+        sys.stdout.write(output.getvalue())
+        raise
+    finally:
+        if lock and os.path.exists(lock):
+            os.remove(lock)
+
+    write_result(path, output.getvalue())
+    sys.stdout.write(output.getvalue())
 
 
 def print_err_msg(msg):
@@ -145,11 +383,10 @@ def print_err_msg(msg):
 def print_msg(color, msg):
     if colors.CLR.use_color:
         msg = str(color) + msg + str(colors.CLR_NRM())
-    print(msg, end='')
+    sys.stdout.write(msg)
 
 
-def parse_args(argv=sys.argv):
-    flags = gflags.FLAGS
+def define_flags(flags):
     flags.UseGnuGetOpt()  # allow mixing of commands and options
     gflags.DEFINE_bool("help", None, "Show this help")
     gflags.DEFINE_bool("helpshort", None, "Show command help only")
@@ -192,6 +429,10 @@ def parse_args(argv=sys.argv):
             "detail_description_width", 80, "Set description width")
     gflags.DEFINE_enum("detail_url", None, ["long", "short"], "Set URL output")
     gflags.DEFINE_bool("tsv", False, "Use Tab Separated Value output")
+    gflags.DEFINE_integer(
+            "limit", None,
+            "Show at most this many events with agenda and search, fetching "
+            "no more pages than needed", lower_bound=1)
     gflags.DEFINE_bool("started", True, "Show events that have started")
     gflags.DEFINE_bool("declined", True, "Show events that have been declined")
     gflags.DEFINE_integer("width", 10, "Set output width", short_name="w")
@@ -211,6 +452,19 @@ def parse_args(argv=sys.argv):
             "color_now_marker", "brightred", "Color for the now marker")
     gflags.DEFINE_string("color_border", "white", "Color of line borders")
     gflags.DEFINE_string("locale", None, "System locale")
+    gflags.DEFINE_integer(
+            "fetch_threads", 8,
+            "Concurrent requests used to fetch calendars, with large "
+            "calendars split into time shards; 1 fetches the pages of one "
+            "calendar at a time, each one while the page before is parsed")
+    gflags.DEFINE_integer(
+            "page_size", None,
+            "Events per page when fetching, up to 2500; the API sends 250 "
+            "if not given", lower_bound=1, upper_bound=2500)
+    gflags.DEFINE_string(
+            "api_endpoint", None,
+            "Talk to an alternative Calendar API root instead of Google, "
+            "e.g. a local stand-in server.  Disables OAuth.")
     gflags.DEFINE_multistring(
             "reminder", [],
             "Reminders in the form 'TIME METH' or 'TIME'.  TIME "
@@ -226,6 +480,14 @@ def parse_args(argv=sys.argv):
             "duration", None,
             "Event duration in minutes or days if --allday is given.")
     gflags.DEFINE_string("description", None, "Event description")
+    gflags.DEFINE_string(
+            "working_hours", "9:00-17:00",
+            "Hours findtime looks for free time in, e.g. 9-17 or 8:30-18:00")
+    gflags.DEFINE_bool(
+            "weekends", False, "Let findtime suggest times at weekends")
+    gflags.DEFINE_enum(
+            "by", "week", gcal.GoogleCalendarInterface.STATS_BY,
+            "What stats adds time up by")
     gflags.DEFINE_bool(
             "allday", False,
             "If --allday is given, the event will be an all-day event "
@@ -233,17 +495,72 @@ def parse_args(argv=sys.argv):
             "time part of the --when will be ignored.")
     gflags.DEFINE_bool(
             "prompt", True, "Prompt for missing data when adding events")
+    gflags.DEFINE_string(
+            "batch", None,
+            "Add every event in a CSV, TSV or JSON Lines file ('-' reads "
+            "standard input) with the add command")
     gflags.DEFINE_bool(
             "default_reminders", True,
             "If no --reminder is given, use the defaults.  If this is "
             "false, do not create any reminders.")
     gflags.DEFINE_bool("iamaexpert", False, "Probably not")
+    gflags.DEFINE_bool(
+            "debug", False, "Print debugging output: everything --trace "
+            "can, as text unless --trace_format says otherwise")
+    gflags.DEFINE_string(
+            "trace", None,
+            "Trace what happens in these comma separated categories to "
+            "stderr or --trace_file: http, cache, plan, parse, render or "
+            "all")
+    gflags.DEFINE_enum(
+            "trace_format", "text", trace.FORMATS,
+            "Trace as lines of text, or as JSON trace events to load into "
+            "a timeline viewer such as chrome://tracing or Perfetto")
+    gflags.DEFINE_string(
+            "trace_file", None, "Write the trace to this file")
+    gflags.DEFINE_bool(
+            "gzip", True, "Ask for compressed API responses (--nogzip to "
+            "turn off)")
     gflags.DEFINE_bool("refresh", False, "Delete and refresh cached data")
     gflags.DEFINE_bool("cache", True, "Execute command without using cache")
+    gflags.DEFINE_integer(
+            "result_ttl", None,
+            "Reuse the output of agenda, search, calw, calm, caly, conflicts, "
+            "findtime and stats for this many seconds, and fall back to "
+            "older output if the API can't be reached", lower_bound=0)
+    gflags.DEFINE_bool(
+            "stale_while_revalidate", False,
+            "With --result_ttl, show expired output right away and refresh "
+            "it in the background")
     gflags.DEFINE_bool(
             "verbose", False, "Be verbose on imports", short_name="v")
     gflags.DEFINE_bool(
             "dump", False, "Print events and don't import", short_name="d")
+    gflags.DEFINE_integer(
+            "watch", None,
+            "Redraw agenda, calw, calm or caly every WATCH seconds, "
+            "refetching only changed events")
+    gflags.DEFINE_string(
+            "record", None,
+            "Record every API request and response into this folder, with "
+            "credentials redacted, to be replayed with --replay")
+    gflags.DEFINE_string(
+            "replay", None,
+            "Answer API requests from a folder recorded with --record "
+            "instead of the network; give the command and options it was "
+            "recorded with, in the same timezone")
+    gflags.DEFINE_bool(
+            "memprofile", False,
+            "Trace memory use and report, on stderr, the memory allocated "
+            "and peak after each phase (fetch, parse, render) and the "
+            "lines that allocated most; queries have fetch, which takes in "
+            "decoding the events, and render (with --limit or "
+            "--fetch_threads 1 events are rendered as they are fetched, "
+            "within fetch), import has parse")
+    gflags.DEFINE_string(
+            "memprofile_snapshots", None,
+            "With --memprofile, also write a tracemalloc snapshot per "
+            "phase into this folder")
     gflags.DEFINE_bool(
             "use_reminders", False,
             "Honour the remind time when running remind command")
@@ -253,6 +570,7 @@ def parse_args(argv=sys.argv):
                                     "reminders", "description", "longurl",
                                     "shorturl", "url", "attendees",
                                     "attachments", "email"] for x in value))
+    gflags.RegisterValidator("trace", valid_trace)
     gflags.RegisterValidator(
             "reminder",
             lambda value: all(gcal.parse_reminder(x) for x in value))
@@ -272,6 +590,14 @@ def parse_args(argv=sys.argv):
             "color_border", lambda value: get_color(value) is not None)
     gflags.ADOPT_module_key_flags(gflags)
 
+
+def parse_args(argv=sys.argv):
+    flags = gflags.FLAGS
+    if 'help' not in flags:
+        define_flags(flags)
+    # batch parses a command line per command
+    flags.Reset()
+
     try:
         if os.path.exists(os.path.expanduser('~/.gcalclirc')):
             # We want .gcalclirc to be sourced before any other --flagfile
@@ -304,7 +630,41 @@ def parse_args(argv=sys.argv):
 
 
 def main():
-    args, flags = parse_args()
+    if not sys.stdout.isatty():
+        sys.stdout = BufferedOutput(sys.stdout)
+    try:
+        _main()
+    except OutputClosed:
+        sys.exit(1)
+    except ReplayError as e:
+        print_err_msg('Error: %s\n' % e)
+        sys.exit(1)
+    finally:
+        if isinstance(sys.stdout, BufferedOutput):
+            sys.stdout.close()
+
+
+def _main():
+    args, flags, cal_names, cal_name_colors = prepare(sys.argv)
+
+    if args[0] == 'batch':
+        run_batch(args, sys.argv)
+    else:
+        execute(args, flags, cal_names, cal_name_colors)
+
+
+def prepare(argv):
+    """Parses `argv` and sets up for its command.  Returns the command and
+    its arguments, the flags, and the names and colours of the calendars
+    to use."""
+    args, flags = parse_args(argv)
+
+    if flags.debug or flags.trace:
+        trace.enable(trace.CATEGORIES if flags.debug
+                     else trace.parse_categories(flags.trace),
+                     flags.trace_file, flags.trace_format)
+    else:
+        trace.disable()
 
     if flags.version:
         version()
@@ -318,11 +678,9 @@ def main():
         usage()
         sys.exit(0)
 
-    if not flags.color:
-        colors.CLR.use_color = False
-
-    if not flags.lineart:
-        gcal.ART.useArt = False
+    # set either way, batch runs commands with different flags
+    colors.CLR.use_color = flags.color
+    gcal.ART.useArt = flags.lineart
 
     if flags.conky:
         colors.SetConkyColors()
@@ -342,8 +700,11 @@ def main():
         sys.exit(1)
 
     # No sense instaniating gcalcli for nothing
-    if not args[0] in ['list', 'search', 'agenda', 'calw', 'calm', 'quick',
-                       'add', 'delete', 'edit', 'remind', 'import', 'help']:
+    if not args[0] in ['list', 'search', 'agenda', 'calw', 'calm', 'caly',
+                       'quick',
+                       'add', 'delete', 'edit', 'remind', 'import',
+                       'conflicts', 'findtime', 'stats', 'bench', 'batch',
+                       'help']:
         print_err_msg('Error: %s is an invalid command' % args[0])
         sys.exit(1)
 
@@ -352,6 +713,11 @@ def main():
         usage()
         sys.exit(0)
 
+    if flags.record and flags.replay:
+        print_err_msg('Error: --record and --replay can\'t be used '
+                      'together\n')
+        sys.exit(1)
+
     if len(flags.calendar) == 0:
         flags.calendar = flags.default_calendar
 
@@ -408,6 +774,129 @@ def main():
         if 'email' in flags.details:
             flags['detail_email'].value = True
 
+    return args, flags, cal_names, cal_name_colors
+
+
+def execute(args, flags, cal_names, cal_name_colors, session=None,
+            window_cache=None, argv=None):
+    """Runs the command, through the result cache if that's on; `argv` is
+    its command line, to rerun it by.  Returns the GoogleCalendarInterface
+    it ran on, unless its output was cached."""
+    ran = []
+
+    def run():
+        ran.append(run_command(args, flags, cal_names, cal_name_colors,
+                               session, window_cache))
+
+    if (flags.result_ttl is not None and args[0] in RESULT_COMMANDS and
+            not flags.watch and not flags.record and not flags.replay):
+        cached_command(flags, args, run, argv)
+    else:
+        run()
+
+    return ran[0] if ran else None
+
+
+def batch_lines(path):
+    """The command lines to run from `path`, or stdin for None or '-'.
+    Blank lines and lines starting with # are skipped."""
+    if path in (None, '-'):
+        lines = sys.stdin.read().splitlines()
+    else:
+        try:
+            with open(os.path.expanduser(path)) as f:
+                lines = f.read().splitlines()
+        except IOError as e:
+            print_err_msg('Error: %s\n' % e)
+            sys.exit(1)
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def run_batch(args, argv):
+    """Runs the commands in a batch, one per line, each with the options
+    given for the batch followed by its own.  Commands with the same
+    credentials share one authorized session, calendar list and the events
+    fetched so far, so overlapping windows are fetched once.  Each
+    command's output comes after a ==> line <== header."""
+    if len(args) > 2:
+        print_err_msg('Error: invalid batch arguments\n')
+        sys.exit(1)
+
+    # the options given for the batch: argv less batch and its file, taken
+    # from the end since options come first
+    options = list(argv)
+    for arg in reversed(args):
+        del options[len(options) - 1 - options[::-1].index(arg)]
+
+    sessions = {}
+    failed = 0
+    for n, line in enumerate(batch_lines(args[1] if len(args) > 1
+                                         else None)):
+        if n:
+            sys.stdout.write('\n')
+        sys.stdout.write('==> %s <==\n' % line)
+        try:
+            line_argv = options + shlex.split(line)
+            line_args, flags, cal_names, cal_name_colors = prepare(line_argv)
+            if line_args[0] == 'batch' or flags.watch:
+                print_err_msg('Error: %s can\'t be run in a batch\n' %
+                              ('batch' if line_args[0] == 'batch'
+                               else '--watch'))
+                sys.exit(1)
+
+            key = (flags.config_folder, flags.client_id,
+                   flags.client_secret, flags.api_endpoint, flags.gzip,
+                   flags.record, flags.replay)
+            session, window_cache = sessions.get(key, (None, {}))
+            # a stale result is refreshed by rerunning just this line
+            gci = execute(line_args, flags, cal_names, cal_name_colors,
+                          session, window_cache, line_argv)
+            sessions[key] = (gci or session, window_cache)
+        except (ValueError, ReplayError) as e:
+            # ValueError from shlex
+            print_err_msg('Error: %s\n' % e)
+            failed += 1
+        except SystemExit as e:
+            if e.code:
+                failed += 1
+        sys.stdout.flush()
+
+    if failed:
+        sys.exit(1)
+
+
+# recorders and replayers by folder, shared by the commands of a batch
+TRANSPORTS = {}
+
+
+def transport(flags):
+    """The Recorder or Replayer for --record or --replay, if given."""
+    if flags.record:
+        key = ('record', os.path.abspath(os.path.expanduser(flags.record)))
+        make = Recorder
+    elif flags.replay:
+        key = ('replay', os.path.abspath(os.path.expanduser(flags.replay)))
+        make = Replayer
+    else:
+        return None
+    if key not in TRANSPORTS:
+        try:
+            TRANSPORTS[key] = make(key[1])
+        except (OSError, ReplayError) as e:
+            print_err_msg('Error: %s\n' % e)
+            sys.exit(1)
+    return TRANSPORTS[key]
+
+
+def run_command(args, flags, cal_names, cal_name_colors, session=None,
+                window_cache=None):
+    profile = None
+    if flags.memprofile:
+        profile = MemoryProfile(flags.memprofile_snapshots)
+
     gci = gcal.GoogleCalendarInterface(
            cal_names=cal_names,
            cal_name_colors=cal_name_colors,
@@ -435,12 +924,24 @@ def main():
            border_color=get_color(flags.color_border),
            tsv=flags.tsv,
            refresh_cache=flags.refresh,
-           use_cache=flags.cache,
+           # recordings have to hold everything a replay asks for
+           use_cache=flags.cache and not flags.record and not flags.replay,
            config_folder=flags.config_folder,
            client_id=flags.client_id,
            client_secret=flags.client_secret,
            defaultReminders=flags.default_reminders,
-           all_day=flags.allday)
+           all_day=flags.allday,
+           api_endpoint=flags.api_endpoint,
+           fetch_threads=flags.fetch_threads,
+           limit=flags.limit,
+           gzip=flags.gzip,
+           page_size=flags.page_size,
+           event_fields=(gcal.GoogleCalendarInterface.LEAN_EVENT_FIELDS
+                         if args[0] in LEAN_COMMANDS else None),
+           session=session,
+           window_cache=window_cache,
+           transport=transport(flags),
+           memprofile=profile)
 
     if args[0] == 'list':
         gci.list_all_calendars()
@@ -462,18 +963,64 @@ def main():
     elif args[0] == 'agenda':
 
         if len(args) == 3:  # start and end
-            gci.agenda_query(start_text=args[1], end_text=args[2])
+            query = dict(start_text=args[1], end_text=args[2])
         elif len(args) == 2:  # start
-            gci.agenda_query(start_text=args[1])
+            query = dict(start_text=args[1])
         elif len(args) == 1:  # defaults
-            gci.agenda_query()
+            query = {}
         else:
             print_err_msg('Error: invalid agenda arguments\n')
             sys.exit(1)
 
+        if flags.watch:
+            gci.watch(args[0], flags.watch, **query)
+        else:
+            gci.agenda_query(**query)
+
+        if not flags.tsv:
+            sys.stdout.write('\n')
+
+    elif args[0] == 'conflicts':
+        if len(args) == 3:  # start and end
+            gci.conflicts_query(start_text=args[1], end_text=args[2])
+        elif len(args) == 2:  # start
+            gci.conflicts_query(start_text=args[1])
+        elif len(args) == 1:  # defaults
+            gci.conflicts_query()
+        else:
+            print_err_msg('Error: invalid conflicts arguments\n')
+            sys.exit(1)
+
         if not flags.tsv:
             sys.stdout.write('\n')
 
+    elif args[0] == 'findtime':
+        if len(args) > 3:
+            print_err_msg('Error: invalid findtime arguments\n')
+            sys.exit(1)
+        if flags.duration is not None and flags.duration < 1:
+            print_err_msg('Error: invalid duration\n')
+            sys.exit(1)
+
+        gci.findtime_query(*args[1:], duration=flags.duration or 30,
+                           hours=flags.working_hours, weekends=flags.weekends,
+                           count=flags.limit or 5)
+
+    elif args[0] == 'stats':
+        if len(args) > 3:
+            print_err_msg('Error: invalid stats arguments\n')
+            sys.exit(1)
+
+        gci.stats_query(*args[1:], by=flags.by)
+
+    elif args[0] == 'bench':
+        if len(args) > 2 or (len(args) == 2 and not args[1].isdigit()) or \
+                (len(args) == 2 and int(args[1]) < 1):
+            print_err_msg('Error: invalid bench arguments\n')
+            sys.exit(1)
+
+        gci.bench_query(int(args[1]) if len(args) == 2 else 32)
+
     elif args[0] == 'calw':
         if not flags.width:
             print_err_msg('Error: invalid width, don\'t be an idiot!\n')
@@ -488,15 +1035,20 @@ def main():
                 sys.exit(1)
 
         if len(args) == 3:  # weeks and start
-            gci.cal_query(args[0], count=int(args[1]), start_text=args[2])
+            query = dict(count=int(args[1]), start_text=args[2])
         elif len(args) == 2:  # weeks
-            gci.cal_query(args[0], count=int(args[1]))
+            query = dict(count=int(args[1]))
         elif len(args) == 1:  # defaults
-            gci.cal_query(args[0])
+            query = {}
         else:
             print_err_msg('Error: invalid calw arguments\n')
             sys.exit(1)
 
+        if flags.watch:
+            gci.watch(args[0], flags.watch, **query)
+        else:
+            gci.cal_query(args[0], **query)
+
         sys.stdout.write('\n')
 
     elif args[0] == 'calm':
@@ -505,13 +1057,34 @@ def main():
             sys.exit(1)
 
         if len(args) == 2:  # start
-            gci.cal_query(args[0], start_text=args[1])
+            query = dict(start_text=args[1])
         elif len(args) == 1:  # defaults
-            gci.cal_query(args[0])
+            query = {}
         else:
             print_err_msg('Error: invalid calm arguments\n')
             sys.exit(1)
 
+        if flags.watch:
+            gci.watch(args[0], flags.watch, **query)
+        else:
+            gci.cal_query(args[0], **query)
+
+        sys.stdout.write('\n')
+
+    elif args[0] == 'caly':
+        if len(args) == 2:  # start
+            query = dict(start_text=args[1])
+        elif len(args) == 1:  # defaults
+            query = {}
+        else:
+            print_err_msg('Error: invalid caly arguments\n')
+            sys.exit(1)
+
+        if flags.watch:
+            gci.watch(args[0], flags.watch, **query)
+        else:
+            gci.caly_query(**query)
+
         sys.stdout.write('\n')
 
     elif args[0] == 'quick':
@@ -521,6 +1094,28 @@ def main():
 
         gci.quick_add_event(args[1], reminder=flags.reminder)
 
+    elif (args[0] == 'add') and flags.batch:
+        try:
+            f = sys.stdin if flags.batch == '-' else open(flags.batch)
+        except IOError as e:
+            print_err_msg("Error: " + str(e) + "!\n")
+            sys.exit(1)
+
+        with f:
+            rows, errors = gcal.parse_batch_events(f, {
+                'title': flags.title, 'where': flags.where,
+                'when': flags.when, 'duration': flags.duration,
+                'description': flags.description, 'who': flags.who,
+                'reminder': flags.reminder, 'allday': flags.allday})
+
+        if errors:
+            print_err_msg(''.join(e + '\n' for e in errors))
+            print_err_msg('Nothing added.\n')
+            sys.exit(1)
+
+        if gci.add_events(rows):
+            sys.exit(1)
+
     elif (args[0] == 'add'):
         if flags.prompt:
             if flags.title is None:
@@ -609,6 +1204,16 @@ def main():
             print_err_msg('Error: invalid import arguments\n')
             sys.exit(1)
 
+    if trace.CACHE.on:
+        trace.CACHE('ETags: %s', gci.etag_report())
+
+    if profile:
+        profile.phase('render')
+        profile.report(sys.stderr)
+        profile.stop()
+
+    return gci
+
 
 def SIGINT_handler(signum, frame):
     print_err_msg('Signal caught, bye!\n')
@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
+import bisect
+import collections
+import csv
+import functools
+import hashlib
+import heapq
+import io
+import itertools
 import json
 import locale
+import math
 import os
 import random
 import re
 import shlex
 import sys
+import tempfile
 import textwrap
+import threading
 import time
-from datetime import date, datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from datetime import date, datetime, time as dtime, timedelta
 from unicodedata import east_asian_width
 from argparse import Namespace
 
 from gcalcli import (__API_CLIENT_ID__, __API_CLIENT_SECRET__, __program__,
                      __version__, colors)
-from gcalcli import cli
+from gcalcli import cli, trace
+from gcalcli.intervals import (IntervalIndex, UsageTotals, free_slots,
+                               interval_union, overlapping_pairs,
+                               window_gaps)
 from gcalcli.utils import DateTimeParser, days_since_epoch, get_time_from_str
 
 
@@ -22,9 +38,11 @@ from gcalcli.utils import DateTimeParser, days_since_epoch, get_time_from_str
 try:
     from dateutil.tz import tzlocal
     from dateutil.parser import parse
+    from dateutil.relativedelta import relativedelta
     import httplib2
     from apiclient.discovery import build
     from apiclient.errors import HttpError
+    from apiclient.model import JsonModel
     from oauth2client.file import Storage
     from oauth2client.client import OAuth2WebServerFlow
     from oauth2client.tools import run_flow
@@ -33,6 +51,17 @@ except ImportError as e:
     sys.exit(1)
 
 
+# Decoding big pages of events is quicker with orjson or ujson, if either is
+# installed, than with the standard library
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        json_loads = json.loads
+
+
 # cPickle is a standard library, but in case someone did something really
 # dumb, fall back to pickle.  If that's not there, your python is fucked
 try:
@@ -118,18 +147,51 @@ class ART_UTE(ART):
     plain = '+'
 
 
+class FastJsonModel(JsonModel):
+    """The client library's JSON model, decoding responses with
+    `json_loads` rather than always with the standard library."""
+
+    def __init__(self, loads=None):
+        JsonModel.__init__(self)
+        self._loads = loads or json_loads
+
+    def deserialize(self, content):
+        try:
+            with trace.PARSE.span('decode %d bytes', len(content)):
+                return self._loads(content)
+        except ValueError:
+            # not JSON after all: leave it to the stock model
+            return JsonModel.deserialize(self, content)
+
+
+def per_query(method):
+    """Fixes `now` for the calling thread at the time `method` is called,
+    so that everything a query shows is relative to the same instant."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'now', None) is not None:
+            # called from within another query
+            return method(self, *args, **kwargs)
+        self._local.now = self._query_time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.now = None
+    return wrapper
+
+
 class GoogleCalendarInterface:
+    """All state is per instance and queries may run concurrently from
+    several threads, so a long-lived process can keep one instance per set
+    of credentials."""
 
-    cache = {}
-    all_cals = []
-    allEvents = []
-    cals = []
-    now = datetime.now(tzlocal())
     agendaLength = 5
+    # the Calendar API takes at most 50 calls per batch request
+    batchSize = 50
+    # watch mode refetches everything every this many refreshes, to catch
+    # events that were moved out of the window since the last full fetch
+    watchResync = 10
     maxRetries = 5
-    authHttp = None
-    cal_service = None
-    url_service = None
     command = 'notify-send -u critical -a gcalcli %s'
     date_parser = DateTimeParser()
 
@@ -138,6 +200,27 @@ class GoogleCalendarInterface:
     ACCESS_READER = 'reader'
     ACCESS_FREEBUSY = 'freeBusyReader'
 
+    # where _plan() has a calendar's events come from
+    PLAN_CACHE = 'cache'
+    PLAN_SYNC = 'sync'
+    PLAN_LIST = 'list'
+    PLAN_FREEBUSY = 'freebusy'
+
+    DETAILS_INDENT = 19 * ' '
+    # rendered details blocks kept, least recently drawn dropped first
+    DETAILS_CACHED = 1024
+
+    # all that the calendar views, stats and findtime read of an event, so
+    # the rest (descriptions above all) needn't be sent or decoded
+    LEAN_EVENT_FIELDS = ('id,etag,status,summary,start,end,transparency,'
+                         'attendees(email,responseStatus)')
+
+    # what bench tries, see bench()
+    BENCH_PAGE_SIZES = [50, 250, 2500]
+    BENCH_THREADS = [1, 4, 8, 16]
+    # settings throttled more often than this are ruled out
+    BENCH_MAX_THROTTLED = 0.01
+
     UNIWIDTH = {'W': 2, 'F': 2, 'N': 1, 'Na': 1, 'H': 1, 'A': 1}
 
     def __init__(self,
@@ -172,7 +255,17 @@ class GoogleCalendarInterface:
                  client_id=__API_CLIENT_ID__,
                  client_secret=__API_CLIENT_SECRET__,
                  defaultReminders=False,
-                 all_day=False):
+                 all_day=False,
+                 api_endpoint=None,
+                 fetch_threads=8,
+                 limit=None,
+                 gzip=True,
+                 page_size=None,
+                 event_fields=None,
+                 session=None,
+                 window_cache=None,
+                 transport=None,
+                 memprofile=None):
 
         self.military = military
         self.ignore_started = ignore_started
@@ -208,10 +301,39 @@ class GoogleCalendarInterface:
 
         self.client_id = client_id
         self.client_secret = client_secret
-
-        self._get_cached()
+        self.api_endpoint = api_endpoint
+        self.fetchThreads = fetch_threads
+        self.limit = limit
+        self.gzip = gzip
+        self.page_size = page_size
+        self.event_fields = event_fields
+
+        self.authHttp = None
+        self.credentials = None
+        self.cal_service = None
+        self.url_service = None
+        self.cache = {}
+        self.all_cals = []
+        self.cals = []
+        self.etag_stats = collections.Counter()
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._pool = None
+        self._prefetcher = None
+        self._pruned = False
+        self._details = None
+        self._wrappers = {}
+        self.window_cache = window_cache
+        self.transport = transport
+        self.memprofile = memprofile
+
+        if session is not None:
+            self._share(session)
+        else:
+            self._get_cached()
 
         if len(cal_names):
+            cals = []
             # Changing the order of this and the `cal in self.all_cals` loop
             # is necessary for the matching to actually be sane (ie match
             # supplied name to cached vs matching cache against supplied names)
@@ -234,9 +356,57 @@ class GoogleCalendarInterface:
                         cal['colorSpec'] = cal_name_colors[i]
                 # Add relevant matches to the list of calendars we want to
                 # operate against
-                self.cals += matches
+                cals += matches
+            # overlapping patterns match some calendars more than once
+            self.cals = unique_cals(cals)
         else:
-            self.cals = self.all_cals
+            self.cals = list(self.all_cals)
+
+    def _share(self, session):
+        """Takes the authorized connections, services, calendar list and
+        worker pools of `session`, an earlier instance with the same
+        credentials, instead of setting up new ones."""
+        with session._lock:
+            self.authHttp = session.authHttp
+            self.credentials = session.credentials
+            self.cal_service = session.cal_service
+            self.url_service = session.url_service
+            self._pool = session._pool
+            self._prefetcher = session._prefetcher
+        self.cache = session.cache
+        # colours are picked per instance, see below
+        self.all_cals = [dict((k, v) for k, v in cal.items()
+                              if k != 'colorSpec')
+                         for cal in session.all_cals]
+        self._local = session._local
+        self._lock = session._lock
+
+    @property
+    def now(self):
+        """The time the calling thread's current query started, see
+        per_query(), or the actual time outside of queries."""
+        now = getattr(self._local, 'now', None)
+        if now is not None:
+            return now
+        if self.transport is not None:
+            return self.transport.time()
+        return datetime.now(tzlocal())
+
+    @now.setter
+    def now(self, value):
+        self._local.now = value
+
+    def _query_time(self):
+        """The time a query starts at; when replaying, the time the same
+        query started at when it was recorded."""
+        if self.transport is not None:
+            return self.transport.query_time()
+        return datetime.now(tzlocal())
+
+    def _mem_phase(self, name):
+        """Marks the end of a phase for --memprofile."""
+        if self.memprofile is not None:
+            self.memprofile.phase(name)
 
     @staticmethod
     def _LocalizeDateTime(dt):
@@ -247,22 +417,110 @@ class GoogleCalendarInterface:
         else:
             return dt.astimezone(tzlocal())
 
-    def _retry_with_backoff(self, method):
+    def _retry_with_backoff(self, method, http=None):
+        if http is None:
+            http = self._thread_http()
+        etag_file = self._etag_file(method)
+        cached = self._read_etag(etag_file) if etag_file else None
+        if cached:
+            method.headers['If-None-Match'] = cached['etag']
+
         for n in range(0, self.maxRetries):
+            # no point fetching any more once nobody reads the output
+            cli.check_output()
             try:
-                return method.execute()
+                result = method.execute(http=http)
             except HttpError as e:
-                error = json.loads(e.content)
-                if error.get('code') == '403' and \
-                        error.get('errors')[0].get('reason') \
-                        in ['rateLimitExceeded', 'userRateLimitExceeded']:
+                if cached and e.resp.status == 304:
+                    trace.CACHE('not modified: %s', method.uri)
+                    self._count_etag('not_modified')
+                    os.utime(etag_file)
+                    return cached['body']
+                if is_rate_limited(e):
+                    trace.HTTP('rate limited, retry %d', n + 1)
                     time.sleep((2 ** n) + random.random())
                 else:
                     raise
+            else:
+                if etag_file:
+                    self._count_etag('modified')
+                    self._write_etag(etag_file, result)
+                return result
 
         return None
 
+    def _etag_file(self, method):
+        """Where the response to a GET is kept, with its ETag, to be
+        revalidated with If-None-Match next time; None if it isn't."""
+        if not self.use_cache or getattr(method, 'method', None) != 'GET' or \
+                'updatedMin=' in method.uri:
+            # incremental syncs ask for something new every time
+            return None
+        if self.config_folder:
+            folder = os.path.expanduser('%s/etags' % self.config_folder)
+        else:
+            folder = os.path.expanduser('~/.gcalcli_etags')
+        return os.path.join(
+            folder, hashlib.sha1(method.uri.encode('utf-8')).hexdigest())
+
+    def _read_etag(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return json_loads(f.read())
+        except (IOError, ValueError):
+            return None
+
+    def _write_etag(self, path, result):
+        if not isinstance(result, dict) or 'etag' not in result:
+            return
+        folder = os.path.dirname(path)
+        with self._lock:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            if not self._pruned:
+                self._prune_etags(folder)
+        fd, tmp = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'etag': result['etag'], 'body': result}, f)
+        os.replace(tmp, path)
+
+    def _prune_etags(self, folder, days=30):
+        # responses to one-off queries (e.g. from now on with --nostarted)
+        # are never asked for again, so drop what hasn't been used lately
+        self._pruned = True
+        cutoff = time.time() - days * 24 * 60 * 60
+        for entry in os.scandir(folder):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _count_etag(self, outcome):
+        with self._lock:
+            self.etag_stats[outcome] += 1
+
+    def etag_report(self):
+        """How many revalidated requests came back 304 Not Modified."""
+        total = self.etag_stats['modified'] + \
+            self.etag_stats['not_modified']
+        if not total:
+            return 'no cacheable requests'
+        return '%d of %d cacheable requests not modified (%.0f%%)' % (
+            self.etag_stats['not_modified'], total,
+            100.0 * self.etag_stats['not_modified'] / total)
+
     def _GoogleAuth(self):
+        with self._lock:
+            return self._google_auth()
+
+    def _google_auth(self):
+        if not self.authHttp and (self.api_endpoint or
+                                  getattr(self.transport, 'offline', False)):
+            # alternative endpoints (e.g. the stand-in server used by the
+            # benchmarks) don't do OAuth, and nor do replays
+            self.authHttp = self._new_http()
+
         if not self.authHttp:
             if self.config_folder:
                 storage = Storage(os.path.expanduser("%s/oauth" %
@@ -280,23 +538,83 @@ class GoogleCalendarInterface:
                         client_secret=self.client_secret,
                         scope=['https://www.googleapis.com/auth/calendar',
                                'https://www.googleapis.com/auth/urlshortener'],
-                        user_agent=__program__ + '/' + __version__),
+                        user_agent=user_agent(self.gzip)),
                     storage, flags)
 
-            self.authHttp = credentials.authorize(httplib2.Http())
+            self.credentials = credentials
+            self.authHttp = self._new_http()
 
         return self.authHttp
 
+    def _new_http(self):
+        http = httplib2.Http()
+        if self.transport is not None:
+            # innermost, to see the requests as they are sent
+            http = self.transport.wrap(http)
+        if trace.HTTP.on:
+            http = trace_requests(http)
+        http = set_transfer_encoding(http, self.gzip)
+        if self.credentials:
+            http = self.credentials.authorize(http)
+        return http
+
+    def _thread_http(self):
+        """An authorized Http for the calling worker thread; httplib2
+        connections can't be shared between threads.  None (use the
+        service's own) if the service wasn't built on our _GoogleAuth."""
+        if self.authHttp is None:
+            return None
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = self._new_http()
+        return http
+
+    def _thread_pool(self):
+        with self._lock:
+            if not self._pool:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.fetchThreads)
+            return self._pool
+
+    def _prefetch_pool(self):
+        # separate from _thread_pool, whose workers wait on prefetches
+        with self._lock:
+            if not self._prefetcher:
+                self._prefetcher = ThreadPoolExecutor(
+                    max_workers=self.fetchThreads)
+            return self._prefetcher
+
     def _cal_service(self):
+        with self._lock:
+            return self._build_cal_service()
+
+    def _build_cal_service(self):
         if not self.cal_service:
-            self.cal_service = \
-                build(serviceName='calendar',
-                      version='v3',
-                      http=self._GoogleAuth())
+            self.cal_service = self._discover(self._GoogleAuth())
 
         return self.cal_service
 
+    def _discover(self, http):
+        """Builds the Calendar API service from its discovery document."""
+        if self.api_endpoint:
+            return build(serviceName='calendar',
+                         version='v3',
+                         http=http,
+                         model=FastJsonModel(),
+                         discoveryServiceUrl=(
+                             self.api_endpoint.rstrip('/') +
+                             '/discovery/v1/apis/{api}/{apiVersion}/rest'))
+
+        return build(serviceName='calendar',
+                     version='v3',
+                     http=http,
+                     model=FastJsonModel())
+
     def _url_service(self):
+        with self._lock:
+            return self._build_url_service()
+
+    def _build_url_service(self):
         if not self.url_service:
             self._GoogleAuth()
             self.url_service = \
@@ -329,6 +647,8 @@ class GoogleCalendarInterface:
                 with open(cache_file, 'rb') as _cache_:
                     self.cache = pickle.load(_cache_)
                     self.all_cals = self.cache['all_cals']
+                trace.CACHE('%d calendars from %s', len(self.all_cals),
+                            cache_file)
                 # XXX assuming data is valid, need some verification check here
                 return
             except IOError:
@@ -511,42 +831,42 @@ class GoogleCalendarInterface:
             else:
                 idx = len(eventString)
 
-            cli.debug_print("------ printLen=%d (end of string)\n" % idx)
+            trace.RENDER('------ printLen=%d (end of string)', idx)
             return (printLen, idx)
 
         cutWidth, cut, forceCut = self._NextCut(eventString, 0)
-        cli.debug_print(
-                "------ cutWidth=%d cut=%d \"%s\"\n" % (
-                    cutWidth, cut, eventString))
+        trace.RENDER('------ cutWidth=%d cut=%d "%s"', cutWidth, cut,
+                     eventString)
 
         if forceCut:
-            cli.debug_print(
-                    "--- forceCut cutWidth=%d cut=%d\n" % (cutWidth, cut))
+            trace.RENDER('--- forceCut cutWidth=%d cut=%d', cutWidth, cut)
             return (cutWidth, cut)
 
-        cli.debug_print("--- looping\n")
+        trace.RENDER('--- looping')
 
         while cutWidth < self.calWidth:
 
-            cli.debug_print("--- cutWidth=%d cut=%d \"%s\"\n" % (
-                cutWidth, cut, eventString[cut:]))
+            if trace.RENDER.on:
+                trace.RENDER('--- cutWidth=%d cut=%d "%s"', cutWidth, cut,
+                             eventString[cut:])
 
             while cut < self.calWidth and \
                     cut < printLen and \
                     eventString[cut] == ' ':
-                cli.debug_print("-> skipping space <-\n")
+                trace.RENDER('-> skipping space <-')
                 cutWidth += 1
                 cut += 1
 
-            cli.debug_print("--- cutWidth=%d cut=%d \"%s\"\n" % (
-                cutWidth, cut, eventString[cut:]))
+            if trace.RENDER.on:
+                trace.RENDER('--- cutWidth=%d cut=%d "%s"', cutWidth, cut,
+                             eventString[cut:])
 
             nextCutWidth, nextCut, forceCut = \
                 self._NextCut(eventString[cut:], cutWidth)
 
             if forceCut:
-                cli.debug_print("--- forceCut cutWidth=%d cut=%d\n" % (
-                    cutWidth, cut))
+                trace.RENDER('--- forceCut cutWidth=%d cut=%d', cutWidth,
+                             cut)
                 break
 
             cutWidth += nextCutWidth
@@ -555,16 +875,16 @@ class GoogleCalendarInterface:
             if eventString[cut] == '\n':
                 break
 
-            cli.debug_print("--- loop cutWidth=%d cut=%d\n" % (cutWidth, cut))
+            trace.RENDER('--- loop cutWidth=%d cut=%d', cutWidth, cut)
 
         return (cutWidth, cut)
 
+    @trace.RENDER.traced
     def _graph_events(self, cmd, startDateTime, count, event_list):
 
-        # ignore started events (i.e. events that start previous day and end
-        # start day)
-        while (len(event_list) and event_list[0]['s'] < startDateTime):
-            event_list = event_list[1:]
+        # each week only shows the events starting in it, so events that
+        # started before startDateTime are never shown
+        events = IntervalIndex(event_list)
 
         dayWidthLine = (self.calWidth * str(ART_HRZ()))
 
@@ -683,10 +1003,9 @@ class GoogleCalendarInterface:
             cli.print_msg(colors.CLR_NRM(), line + "\n")
 
             weekColorStrings = ['', '', '', '', '', '', '']
-            weekEventStrings = self._GetWeekEventStrings(cmd, curMonth,
-                                                         startWeekDateTime,
-                                                         endWeekDateTime,
-                                                         event_list)
+            weekEventStrings = self._GetWeekEventStrings(
+                cmd, curMonth, startWeekDateTime, endWeekDateTime,
+                events.starting(startWeekDateTime, endWeekDateTime))
 
             # get date range objects for the next week
             startWeekDateTime = endWeekDateTime
@@ -756,6 +1075,135 @@ class GoogleCalendarInterface:
             else:
                 cli.print_msg(colors.CLR_NRM(), botWeekDivider + "\n")
 
+    # a day's glyph in caly, from no events to a top quarter day
+    HEAT = ' .:o#'
+
+    def _day_counts(self, first_day, days, event_list):
+        """The number of events on each of `days` days from the epoch day
+        `first_day`, counting events on every day they cover.  Each event
+        only marks where its run of days starts and stops, and one running
+        sum turns the marks into counts, so this is O(events + days)."""
+        marks = [0] * (days + 1)
+        just_before = timedelta(microseconds=1)
+        for event in event_list:
+            first = math.floor(days_since_epoch(event['s'])) - first_day
+            # an event ending at midnight is over by that day
+            last = max(first, math.floor(
+                days_since_epoch(event['e'] - just_before)) - first_day)
+            if last < 0 or first >= days:
+                continue
+            marks[max(first, 0)] += 1
+            marks[min(last, days - 1) + 1] -= 1
+        return list(itertools.accumulate(marks[:days]))
+
+    def _year_window(self, start_text=''):
+        """A year of whole weeks from the start of the week containing
+        `start_text`, or the first of January this year."""
+        if start_text in ('', None):
+            start = self.now.replace(month=1, day=1, hour=0, minute=0,
+                                     second=0, microsecond=0)
+        else:
+            start = self._when(start_text, 'start')
+            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        year_start = start
+        dayNum = int(start.strftime("%w"))
+        if self.calMonday:
+            dayNum -= 1
+            if dayNum < 0:
+                dayNum = 6
+        start = (start - timedelta(days=dayNum))
+        # relativedelta, as Feb 29 has no match a year on
+        weeks = ((year_start + relativedelta(years=1) - start).days +
+                 6) // 7
+        return start, start + timedelta(days=weeks * 7), weeks
+
+    @trace.RENDER.traced
+    def _graph_year(self, startDateTime, weeks, event_list):
+
+        first_day = math.floor(days_since_epoch(startDateTime))
+        counts = self._day_counts(first_day, weeks * 7, event_list)
+        busy_days = sorted(n for n in counts if n)
+        busiest = busy_days[-1] if busy_days else 0
+        # the quartiles of the days with events, so a few very busy days
+        # don't wash out the rest
+        quartiles = [busy_days[len(busy_days) * q // 4] for q in (1, 2, 3)
+                     if busy_days]
+        today = math.floor(days_since_epoch(self.now)) - first_day
+
+        labelWidth = 4
+        gridWidth = weeks
+
+        def divider(left, middle, right):
+            return (str(self.border_color) + str(left) +
+                    labelWidth * str(ART_HRZ()) + str(middle) +
+                    gridWidth * str(ART_HRZ()) + str(right) +
+                    str(colors.CLR_NRM()))
+
+        def row(label, cells):
+            label += ' ' * (labelWidth - self._PrintLen(label))
+            return (str(self.border_color) + str(ART_VRT()) +
+                    str(colors.CLR_NRM()) + str(self.date_color) + label +
+                    str(colors.CLR_NRM()) + str(self.border_color) +
+                    str(ART_VRT()) + str(colors.CLR_NRM()) + cells +
+                    str(colors.CLR_NRM()) + str(self.border_color) +
+                    str(ART_VRT()) + str(colors.CLR_NRM()))
+
+        # month names over the week their first day falls in
+        months = ''
+        for week in range(weeks):
+            week_start = startDateTime + timedelta(days=week * 7)
+            for j in range(7):
+                day = week_start + timedelta(days=j)
+                if day.day == 1 and len(months) <= week and \
+                        week + 3 <= gridWidth:
+                    months += ' ' * (week - len(months)) + day.strftime('%b')
+        months = months[:gridWidth]
+        months += ' ' * (gridWidth - self._PrintLen(months))
+        year = startDateTime + timedelta(days=6)
+
+        cli.print_msg(colors.CLR_NRM(),
+                      "\n" + divider(ART_ULC(), ART_UTE(), ART_URC()) + "\n")
+        cli.print_msg(colors.CLR_NRM(),
+                      row(year.strftime('%Y'),
+                          str(self.date_color) + months) + "\n")
+        cli.print_msg(colors.CLR_NRM(),
+                      divider(ART_LTE(), ART_CRS(), ART_RTE()) + "\n")
+
+        for j in range(7):
+            label = (startDateTime + timedelta(days=j)).strftime('%a')
+            cells = ''
+            for week in range(weeks):
+                n = week * 7 + j
+                level = 0
+                if counts[n]:
+                    level = 1 + bisect.bisect_left(quartiles, counts[n])
+                if n == today:
+                    cells += (str(self.nowMarkerColor) +
+                              (self.HEAT[level] if level else '*') +
+                              str(colors.CLR_NRM()))
+                else:
+                    cells += self.HEAT[level]
+            cli.print_msg(colors.CLR_NRM(), row(label, cells) + "\n")
+
+        cli.print_msg(colors.CLR_NRM(),
+                      divider(ART_LLC(), ART_BTE(), ART_LRC()) + "\n")
+        cli.print_msg(colors.CLR_NRM(), ' ' * (labelWidth + 2))
+        cli.print_msg(self.date_color, 'less %s more' % self.HEAT[1:])
+        cli.print_msg(colors.CLR_NRM(), '  (busiest day: %d events)\n' %
+                      busiest)
+
+    @per_query
+    def caly_query(self, start_text=''):
+        try:
+            start, end, weeks = self._year_window(start_text)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        event_list = self._search_for_cal_events(start, end, None)
+        self._graph_year(start, weeks, event_list)
+
     def _tsv(self, startDateTime, event_list):
         for event in event_list:
             if self.ignore_started and (event['s'] < self.now):
@@ -791,36 +1239,210 @@ class GoogleCalendarInterface:
             output = "%s\n" % output.replace('\n', '''\\n''')
             sys.stdout.write(output)
 
-    def _print_event(self, event, prefix):
-
-        def _formatDescr(descr, indent, box):
-            wrapper = textwrap.TextWrapper()
+    def _wrapper(self, indent, width):
+        # TextWrapper only reads its settings, so one per shape will do
+        wrapper = self._wrappers.get((indent, width))
+        if wrapper is None:
+            wrapper = self._wrappers[(indent, width)] = textwrap.TextWrapper(
+                initial_indent=indent, subsequent_indent=indent, width=width)
+        return wrapper
+
+    def _format_descr(self, descr, indent, box):
+        if box:
+            wrapper = self._wrapper(indent + '  ', self.detail_descr_width - 2)
+        else:
+            wrapper = self._wrapper(indent, self.detail_descr_width)
+        new_descr = ""
+        for line in descr.split("\n"):
             if box:
-                wrapper.initial_indent = (indent + '  ')
-                wrapper.subsequent_indent = (indent + '  ')
-                wrapper.width = (self.detail_descr_width - 2)
+                tmpLine = wrapper.fill(line)
+                for singleLine in tmpLine.split("\n"):
+                    singleLine = singleLine.ljust(self.detail_descr_width,
+                                                  ' ')
+                    new_descr += singleLine[:len(indent)] + \
+                        str(ART_VRT()) + \
+                        singleLine[(len(indent) + 1):
+                                   (self.detail_descr_width - 1)] + \
+                        str(ART_VRT()) + '\n'
             else:
-                wrapper.initial_indent = indent
-                wrapper.subsequent_indent = indent
-                wrapper.width = self.detail_descr_width
-            new_descr = ""
-            for line in descr.split("\n"):
-                if box:
-                    tmpLine = wrapper.fill(line)
-                    for singleLine in tmpLine.split("\n"):
-                        singleLine = singleLine.ljust(self.detail_descr_width,
-                                                      ' ')
-                        new_descr += singleLine[:len(indent)] + \
-                            str(ART_VRT()) + \
-                            singleLine[(len(indent) + 1):
-                                       (self.detail_descr_width - 1)] + \
-                            str(ART_VRT()) + '\n'
-                else:
-                    new_descr += wrapper.fill(line) + "\n"
-            return new_descr.rstrip()
+                new_descr += wrapper.fill(line) + "\n"
+        return new_descr.rstrip()
+
+    # each detail takes an event and returns its lines, or none at all
+
+    def _calendar_detail(self, event):
+        return ["%s  Calendar: %s\n" % (self.DETAILS_INDENT,
+                                        event['gcalcli_cal']['summary'])]
+
+    def _url_detail(self, event):
+        lines = []
+        link = event.get('htmlLink')
+        if link is not None:
+            lines.append("%s  Link: %s\n" % (self.DETAILS_INDENT,
+                                             self._ShortenURL(link)))
+        link = event.get('hangoutLink')
+        if link is not None:
+            lines.append("%s  Hangout Link: %s\n" % (
+                self.DETAILS_INDENT, self._ShortenURL(link)))
+        return lines
+
+    def _location_detail(self, event):
+        location = event.get('location', '').strip()
+        if not location:
+            return []
+        return ["%s  Location: %s\n" % (self.DETAILS_INDENT, location)]
+
+    def _attendees_detail(self, event):
+        attendees = event.get('attendees')
+        if attendees is None:
+            return []
+        lines = ["%s  Attendees:\n" % self.DETAILS_INDENT]
+        organizer = event['organizer']
+        for person in [organizer] + attendees:
+            if 'self' not in person:
+                lines.append("%s    %s: <%s>\n" % (
+                    self.DETAILS_INDENT,
+                    person.get('displayName', 'Not Provided').strip(),
+                    person.get('email', 'Not Provided').strip()))
+        return lines
+
+    def _attachments_detail(self, event):
+        attachments = event.get('attachments')
+        if attachments is None:
+            return []
+        lines = ["%s  Attachments:\n" % self.DETAILS_INDENT]
+        for attachment in attachments:
+            lines.append("%s    %s\n%s    -> %s\n" % (
+                self.DETAILS_INDENT,
+                attachment.get('title', 'Not Provided').strip(),
+                self.DETAILS_INDENT,
+                attachment.get('fileUrl', 'Not Provided').strip()))
+        return lines
+
+    def _length_detail(self, event):
+        return ["%s  Length: %s\n" % (self.DETAILS_INDENT,
+                                      event['e'] - event['s'])]
+
+    def _reminder_detail(self, event):
+        reminders = event.get('reminders')
+        if reminders is None:
+            return []
+        if reminders['useDefault'] is True:
+            return ["%s  Reminder: (default)\n" % self.DETAILS_INDENT]
+        return ["%s  Reminder: %s %d minutes\n" % (
+                    self.DETAILS_INDENT, rem['method'], rem['minutes'])
+                for rem in reminders.get('overrides', [])]
+
+    def _email_detail(self, event):
+        email = event['creator'].get('email', '').strip()
+        if not email:
+            return []
+        return ["%s  Email: %s\n" % (self.DETAILS_INDENT, email)]
+
+    def _descr_detail(self, event):
+        descr = event.get('description', '').strip()
+        if not descr:
+            return []
+        descrIndent = self.DETAILS_INDENT + '  '
+        box = True  # leave old non-box code for option later
+        if box:
+            topMarker = (descrIndent +
+                         str(ART_ULC()) +
+                         (str(ART_HRZ()) *
+                          ((self.detail_descr_width - len(descrIndent)) -
+                           2)) +
+                         str(ART_URC()))
+            botMarker = (descrIndent +
+                         str(ART_LLC()) +
+                         (str(ART_HRZ()) *
+                          ((self.detail_descr_width - len(descrIndent)) -
+                           2)) +
+                         str(ART_LRC()))
+            xstr = "%s  Description:\n%s\n%s\n%s\n" % (
+                self.DETAILS_INDENT,
+                topMarker,
+                self._format_descr(descr, descrIndent, box),
+                botMarker
+            )
+        else:
+            marker = descrIndent + '-' * \
+                (self.detail_descr_width - len(descrIndent))
+            xstr = "%s  Description:\n%s\n%s\n%s\n" % (
+                self.DETAILS_INDENT,
+                marker,
+                self._format_descr(descr, descrIndent, box),
+                marker
+            )
+        return [xstr]
+
+    def _detail_formatters(self):
+        """The details shown, compiled into a list of the formatters for
+        just the enabled ones, with a cache of the rendered blocks by event.
+        Both are rebuilt whenever the settings or the output style change.
+        """
+        settings = (self.detail_calendar, self.detail_url,
+                    self.detail_location, self.detail_attendees,
+                    self.detail_attachments, self.detail_length,
+                    self.detail_reminder, self.detail_email,
+                    self.detail_descr, self.detail_descr_width,
+                    colors.CLR.use_color, str(colors.CLR_NRM()), ART.useArt)
+        details = self._details
+        if details is not None and details[0] == settings:
+            return details
+
+        formatters = [formatter for enabled, formatter in [
+            (self.detail_calendar, self._calendar_detail),
+            (self.detail_url, self._url_detail),
+            (self.detail_location, self._location_detail),
+            (self.detail_attendees, self._attendees_detail),
+            (self.detail_attachments, self._attachments_detail),
+            (self.detail_length, self._length_detail),
+            (self.detail_reminder, self._reminder_detail),
+            (self.detail_email, self._email_detail),
+            (self.detail_descr, self._descr_detail)] if enabled]
+        self._details = details = (settings, formatters,
+                                   collections.OrderedDict())
+        return details
+
+    def _details_block(self, event):
+        """The details of `event` as printed, reused while the event's etag
+        is unchanged, e.g. between redraws with --watch.  The blocks of the
+        DETAILS_CACHED events drawn last are kept."""
+        settings, formatters, blocks = self._detail_formatters()
+        if not formatters:
+            return ''
+
+        cal = event['gcalcli_cal']
+        key = (cal['id'], event.get('id'))
+        version = (event.get('etag'), cal['summary'])
+        cached = blocks.get(key)
+        if cached is not None and cached[0] == version and version[0]:
+            blocks.move_to_end(key)
+            return cached[1]
+
+        # as cli.print_msg(colors.CLR_NRM(), line) would print each line
+        if colors.CLR.use_color:
+            wrap = str(colors.CLR_NRM()) + '%s' + str(colors.CLR_NRM())
+        else:
+            wrap = '%s'
+        block = ''.join(wrap % line for formatter in formatters
+                        for line in formatter(event))
+        if version[0]:
+            blocks[key] = (version, block)
+            blocks.move_to_end(key)
+            while len(blocks) > self.DETAILS_CACHED:
+                blocks.popitem(last=False)
+        return block
+
+    def _forget_details(self, event):
+        """Drops the cached details block of `event`."""
+        if self._details is not None:
+            self._details[2].pop((event['gcalcli_cal']['id'],
+                                  event.get('id')), None)
+
+    def _print_event(self, event, prefix):
 
         indent = 10 * ' '
-        detailsIndent = 19 * ' '
 
         if self.military:
             timeFormat = '%-5s'
@@ -851,127 +1473,7 @@ class GoogleCalendarInterface:
                     event_color, fmt % (
                         tmp_time_str, self._ValidTitle(event).strip()))
 
-        if self.detail_calendar:
-            xstr = "%s  Calendar: %s\n" % (
-                detailsIndent,
-                event['gcalcli_cal']['summary']
-            )
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_url and 'htmlLink' in event:
-            hLink = self._ShortenURL(event['htmlLink'])
-            xstr = "%s  Link: %s\n" % (detailsIndent, hLink)
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_url and 'hangoutLink' in event:
-            hLink = self._ShortenURL(event['hangoutLink'])
-            xstr = "%s  Hangout Link: %s\n" % (detailsIndent, hLink)
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_location and \
-           'location' in event and \
-           event['location'].strip():
-            xstr = "%s  Location: %s\n" % (
-                detailsIndent,
-                event['location'].strip()
-            )
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_attendees and 'attendees' in event:
-            xstr = "%s  Attendees:\n" % (detailsIndent)
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-            if 'self' not in event['organizer']:
-                xstr = "%s    %s: <%s>\n" % (
-                    detailsIndent,
-                    event['organizer'].get('displayName', 'Not Provided')
-                                      .strip(),
-                    event['organizer'].get('email', 'Not Provided').strip()
-                )
-                cli.print_msg(colors.CLR_NRM(), xstr)
-
-            for attendee in event['attendees']:
-                if 'self' not in attendee:
-                    xstr = "%s    %s: <%s>\n" % (
-                        detailsIndent,
-                        attendee.get('displayName', 'Not Provided').strip(),
-                        attendee.get('email', 'Not Provided').strip()
-                    )
-                    cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_attachments and 'attachments' in event:
-            xstr = "%s  Attachments:\n" % (detailsIndent)
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-            for attendee in event['attachments']:
-                xstr = "%s    %s\n%s    -> %s\n" % (
-                    detailsIndent,
-                    attendee.get('title', 'Not Provided').strip(),
-                    detailsIndent,
-                    attendee.get('fileUrl', 'Not Provided').strip()
-                )
-                cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_length:
-            diffDateTime = (event['e'] - event['s'])
-            xstr = "%s  Length: %s\n" % (detailsIndent, diffDateTime)
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_reminder and 'reminders' in event:
-            if event['reminders']['useDefault'] is True:
-                xstr = "%s  Reminder: (default)\n" % (detailsIndent)
-                cli.print_msg(colors.CLR_NRM(), xstr)
-            elif 'overrides' in event['reminders']:
-                for rem in event['reminders']['overrides']:
-                    xstr = "%s  Reminder: %s %d minutes\n" % \
-                           (detailsIndent, rem['method'], rem['minutes'])
-                    cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_email and \
-           'email' in event['creator'] and \
-           event['creator']['email'].strip():
-            xstr = "%s  Email: %s\n" % (
-                detailsIndent,
-                event['creator']['email'].strip()
-            )
-            cli.print_msg(colors.CLR_NRM(), xstr)
-
-        if self.detail_descr and \
-           'description' in event and \
-           event['description'].strip():
-            descrIndent = detailsIndent + '  '
-            box = True  # leave old non-box code for option later
-            if box:
-                topMarker = (descrIndent +
-                             str(ART_ULC()) +
-                             (str(ART_HRZ()) *
-                              ((self.detail_descr_width - len(descrIndent)) -
-                               2)) +
-                             str(ART_URC()))
-                botMarker = (descrIndent +
-                             str(ART_LLC()) +
-                             (str(ART_HRZ()) *
-                              ((self.detail_descr_width - len(descrIndent)) -
-                               2)) +
-                             str(ART_LRC()))
-                xstr = "%s  Description:\n%s\n%s\n%s\n" % (
-                    detailsIndent,
-                    topMarker,
-                    _formatDescr(event['description'].strip(),
-                                 descrIndent, box),
-                    botMarker
-                )
-            else:
-                marker = descrIndent + '-' * \
-                    (self.detail_descr_width - len(descrIndent))
-                xstr = "%s  Description:\n%s\n%s\n%s\n" % (
-                    detailsIndent,
-                    marker,
-                    _formatDescr(event['description'].strip(),
-                                 descrIndent, box),
-                    marker
-                )
-            cli.print_msg(colors.CLR_NRM(), xstr)
+        sys.stdout.write(self._details_block(event))
 
     def _delete_event(self, event):
 
@@ -1131,29 +1633,38 @@ class GoogleCalendarInterface:
                 sys.stdout.write('\n')
                 sys.exit(1)
 
+            # edited in place, so its etag is the same until it's saved
+            self._forget_details(event)
             self._print_event(event, event['s'].strftime('\n%Y-%m-%d'))
 
+    def _hidden(self, event, now=None, keep_declined=False):
+        """True for events --nostarted or --nodeclined leave out, but for
+        declined ones with `keep_declined`."""
+        if self.ignore_started and (event['s'] < (now or self.now)):
+            return True
+        return self.ignoreDeclined and not keep_declined and \
+            self._declined(event)
+
+    def _declined(self, event):
+        for attendee in event.get('attendees', []):
+            if attendee.get('email') == event['gcalcli_cal']['id']:
+                return attendee.get('responseStatus') == 'declined'
+        return False
+
+    @trace.RENDER.traced
     def _iterate_events(self, startDateTime, event_list,
                         yearDate=False, work=None):
 
-        if len(event_list) == 0:
-            cli.print_msg(colors.CLR_YLW(), "\nNo Events Found...\n")
-            return
-
         # 10 chars for day and length must match 'indent' in _print_event
         dayFormat = '\n%Y-%m-%d' if yearDate else '\n%a %b %d'
         day = ''
+        found = False
 
         for event in event_list:
 
-            if self.ignore_started and (event['s'] < self.now):
+            found = True
+            if self._hidden(event):
                 continue
-            if self.ignoreDeclined:
-                if 'attendees' in event:
-                    attendee = [a for a in event['attendees']
-                                if a['email'] == event['gcalcli_cal']['id']][0]
-                    if attendee and attendee['responseStatus'] == 'declined':
-                        continue
 
             tmpDayStr = event['s'].strftime(dayFormat)
             prefix = None
@@ -1165,19 +1676,57 @@ class GoogleCalendarInterface:
             if work:
                 work(event)
 
-    def _GetAllEvents(self, cal, events, end):
+        if not found:
+            cli.print_msg(colors.CLR_YLW(), "\nNo Events Found...\n")
 
-        event_list = []
+    def _GetAllEvents(self, cal, events, end, include_cancelled=False,
+                      http=None):
+        # each next page is fetched while this one is converted, however
+        # many fetch threads there are
+        return list(self._iter_events(cal, events, end,
+                                      include_cancelled=include_cancelled,
+                                      http=http, prefetch=True))
+
+    def _page_fields(self):
+        # a partial response still needs the paging and the etag
+        if self.event_fields is None:
+            return None
+        return 'etag,nextPageToken,items(%s)' % self.event_fields
+
+    def _next_page(self, cal, pageToken, http=None):
+        return self._retry_with_backoff(
+            self._cal_service().events().
+            list(calendarId=cal['id'], pageToken=pageToken,
+                 fields=self._page_fields()),
+            http=http)
+
+    def _prefetch_page(self, cal, pageToken):
+        return self._next_page(cal, pageToken, http=self._thread_http())
+
+    def _iter_events(self, cal, events, end, include_cancelled=False,
+                     http=None, prefetch=False):
+        """The events on `events` and the pages after it.  The next page is
+        only fetched once this one is consumed, unless `prefetch` is set, in
+        which case it is fetched in the background while this one is
+        parsed."""
 
         while 1:
             if 'items' not in events:
                 break
 
+            pageToken = events.get('nextPageToken')
+            nextPage = None
+            if pageToken and prefetch:
+                nextPage = self._prefetch_pool().submit(
+                    self._prefetch_page, cal, pageToken)
+
             for event in events['items']:
 
                 event['gcalcli_cal'] = cal
 
                 if 'status' in event and event['status'] == 'cancelled':
+                    if include_cancelled:
+                        yield event
                     continue
 
                 if 'dateTime' in event['start']:
@@ -1210,35 +1759,332 @@ class GoogleCalendarInterface:
                 if event['s'].year >= 2038 or event['e'].year >= 2038:
                     continue
 
-                event_list.append(event)
+                yield event
 
-            pageToken = events.get('nextPageToken')
-            if pageToken:
-                events = self._retry_with_backoff(
-                    self._cal_service().events().
-                    list(calendarId=cal['id'], pageToken=pageToken))
+            if nextPage:
+                events = nextPage.result()
+            elif pageToken:
+                events = self._next_page(cal, pageToken, http=http)
             else:
                 break
 
+    def _list_events(self, cal, start, end, searchText, updated_min=None,
+                     orderBy=None, maxResults=None):
+        return self._cal_service().events().\
+            list(calendarId=cal['id'],
+                 timeMin=start.isoformat() if start else None,
+                 timeMax=end.isoformat() if end else None,
+                 q=searchText if searchText else None,
+                 updatedMin=updated_min.isoformat() if updated_min else None,
+                 showDeleted=True if updated_min else None,
+                 orderBy=orderBy,
+                 maxResults=maxResults or self.page_size,
+                 singleEvents=True,
+                 fields=self._page_fields())
+
+    def _cal_events(self, cal, start, end, searchText, updated_min=None):
+        # with updated_min only the events changed since then are fetched,
+        # including the ones deleted (status 'cancelled')
+        events = self._retry_with_backoff(self._list_events(
+            cal, start, end, searchText, updated_min=updated_min))
+        return self._GetAllEvents(cal, events, end,
+                                  include_cancelled=bool(updated_min))
+
+    def _fetch_shard(self, cal, start, end, searchText, query_end):
+        """First page of a calendar's events in [start, end), in start time
+        order.  Returns those events and, if there are more, the two halves
+        of the rest of the shard, to be fetched the same way."""
+        http = self._thread_http()
+        page = self._retry_with_backoff(self._list_events(
+            cal, start, end, searchText, orderBy='startTime'), http=http)
+        events = self._GetAllEvents(cal, dict(page, nextPageToken=None),
+                                    query_end, http=http)
+        if not page.get('nextPageToken'):
+            return events, []
+
+        # Carry on from the last start on the page; events starting right
+        # there, or still running, come back again and are dropped when
+        # merging.  All-day dates are in the calendar's timezone, so allow a
+        # day of slack for those.
+        last = page['items'][-1]['start']
+        if 'dateTime' in last:
+            rest = self._LocalizeDateTime(parse(last['dateTime']))
+        else:
+            rest = self._LocalizeDateTime(parse(last['date'])) - \
+                timedelta(days=1)
+        if start and rest <= start:
+            # more than a page starting at once, just follow the pages
+            return self._GetAllEvents(cal, page, query_end, http=http), []
+
+        if end:
+            middle = rest + (end - rest) / 2
+        else:
+            # open ended: everything past a year from now is one shard;
+            # split at midnight so the requests, and so their ETags, are
+            # the same all day
+            middle = (max(rest, self.now) + timedelta(days=365)).replace(
+                hour=0, minute=0, second=0, microsecond=0)
+        return events, [(rest, middle), (middle, end)]
+
+    def _sharded_cal_events(self, fetches, searchText):
+        """The events of each of `fetches`, (cal, start, end) triples,
+        fetched as time shards that are split in half for as long as they
+        have more than a page of events.  Shards are fetched fetchThreads at
+        a time, all fetches together, and sparse stretches of time cost a
+        single request."""
+        self._cal_service()
+        pool = self._thread_pool()
+
+        def submit(i, shard_start, shard_end):
+            cal, _, end = fetches[i]
+            future = pool.submit(self._fetch_shard, cal, shard_start,
+                                 shard_end, searchText, end)
+            pending[future] = (i, shard_start)
+
+        pending = {}
+        for i, (_, start, end) in enumerate(fetches):
+            submit(i, start, end)
+
+        shards = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, shard_start = pending.pop(future)
+                events, rest = future.result()
+                shards.append((i, shard_start.timestamp() if shard_start
+                               else float('-inf'), events))
+                for rest_start, rest_end in rest:
+                    submit(i, rest_start, rest_end)
+
+        # merge in shard order; events overlapping a shard boundary come
+        # back from both shards
+        cal_events = [[] for fetch in fetches]
+        seen = set()
+        for i, _, events in sorted(shards, key=lambda x: x[:2]):
+            for event in events:
+                if (i, event['id']) not in seen:
+                    seen.add((i, event['id']))
+                    cal_events[i].append(event)
+
+        return cal_events
+
+    def _first_pages(self, cals, start, end, searchText, maxResults=None):
+        """The first page of each of `cals`' events in start time order,
+        fetched concurrently."""
+        def first_page(cal):
+            return self._retry_with_backoff(self._list_events(
+                cal, start, end, searchText, orderBy='startTime',
+                maxResults=maxResults), http=self._thread_http())
+
+        self._cal_service()
+        if self.fetchThreads > 1:
+            return list(self._thread_pool().map(first_page, cals))
+        return [first_page(cal) for cal in cals]
+
+    def _merged_cal_events(self, start, end, searchText, limit=None,
+                           now=None, prefetch=False, keep_declined=False):
+        """The events that will be shown, merged across calendars.  Each
+        calendar is read in start time order and its next page is only
+        fetched when the merge needs it, or with `prefetch` while its current
+        page is merged, so paging stops as soon as the consumer does, e.g.
+        once the head of the merge can't change any more with --limit."""
+
+        plan = self._plan(start, end, searchText, cached=False)
+        cals = [cal for cal, _, _ in plan]
+        pages = self._first_pages(cals, start, end, searchText,
+                                  maxResults=min(limit, 2500) if limit
+                                  else None)
+        streams = [self._iter_events(cal, page, end, prefetch=prefetch)
+                   for cal, page in zip(cals, pages)]
+
+        for event in heapq.merge(*streams, key=lambda x: x['s']):
+            if not self._hidden(event, now, keep_declined):
+                yield event
+
+    def _iter_cal_events(self, start, end, searchText, limit=None, now=None,
+                         keep_declined=False):
+        if limit:
+            yield from itertools.islice(self._merged_cal_events(
+                start, end, searchText, limit, now,
+                keep_declined=keep_declined), limit)
+            # streamed: the events were rendered as they came, so this
+            # phase covers both
+            self._mem_phase('fetch')
+        elif (self.fetchThreads > 1 or
+              self._windowed(start, end, searchText)):
+            # fetching everything at once in shards beats paging lazily
+            for event in self._search_for_cal_events(start, end, searchText):
+                if not self._hidden(event, now, keep_declined):
+                    yield event
+        else:
+            yield from self._merged_cal_events(start, end, searchText,
+                                               now=now, prefetch=True,
+                                               keep_declined=keep_declined)
+            self._mem_phase('fetch')
+
+    def _search_for_cal_events(self, start, end, searchText, limit=None):
+
+        if limit:
+            return list(self._iter_cal_events(start, end, searchText, limit))
+
+        plan = self._plan(start, end, searchText)
+        cal_events = self._run_plan(plan, searchText)
+
+        if self._windowed(start, end, searchText):
+            event_list = self._window_cal_events(plan, cal_events, start, end)
+        else:
+            event_list = []
+            for events in cal_events:
+                event_list.extend(events)
+            event_list.sort(key=lambda x: x['s'])
+
+        self._mem_phase('fetch')
+
         return event_list
 
-    def _search_for_cal_events(self, start, end, searchText):
+    def _windowed(self, start, end, searchText):
+        return (self.window_cache is not None and start is not None and
+                end is not None and not searchText)
+
+    def _window_entry(self, cal):
+        """The window_cache entry for `cal`: an IntervalIndex of the events
+        fetched and the (start, end) windows they were fetched for."""
+        key = (cal['id'], self.event_fields)
+        entry = self.window_cache.get(key)
+        if entry is None:
+            entry = self.window_cache[key] = (IntervalIndex(), [])
+        return entry
+
+    def _plan(self, start, end, searchText, synced=False, cached=True,
+              busy=False):
+        """How to get the selected calendars' events in [start, end): a
+        (cal, source, windows) step per calendar, once each however many
+        times it was selected, where windows are the stretches of time to
+        fetch and source is one of
+
+        - PLAN_CACHE: nothing to fetch, window_cache has all of it (if
+          `cached` is set)
+        - PLAN_FREEBUSY: the freebusy API, several calendars to a request,
+          for calendars we can only see the busy times of, when those are
+          all the query needs (`busy`).  Busy times are merged and cut to
+          the window, and all-day events are among them, so they can't
+          stand in for the events that list gives a freeBusyReader.
+        - PLAN_SYNC: only what changed, for `synced` queries
+        - PLAN_LIST: events().list()
+
+        With the window cache, the windows are what it is missing of
+        [start, end), merged where they overlap or touch."""
+        windowed = cached and self._windowed(start, end, searchText)
+        plan = []
+        for cal in unique_cals(self.cals):
+            busy_only = (busy and start is not None and end is not None and
+                         not searchText and
+                         cal['accessRole'] == self.ACCESS_FREEBUSY)
+            windows = [(start, end)]
+            if windowed:
+                covered = self._window_entry(cal)[1]
+                windows = list(interval_union(window_gaps(covered, start,
+                                                          end)))
+
+            if not windows:
+                source = self.PLAN_CACHE
+            elif busy_only:
+                source = self.PLAN_FREEBUSY
+            elif synced:
+                source = self.PLAN_SYNC
+            else:
+                source = self.PLAN_LIST
+            plan.append((cal, source, windows))
+
+        if trace.PLAN.on:
+            trace.PLAN('%d calendars for %s - %s', len(plan), start, end)
+            for cal, source, windows in plan:
+                trace.PLAN('  %s: %s %s', cal['summary'], source,
+                           ', '.join('%s - %s' % window for window in windows)
+                           or '-', role=cal['accessRole'])
+        return plan
+
+    def _run_plan(self, plan, searchText, updated_min=None):
+        """The events the PLAN_LIST and PLAN_SYNC steps of `plan` fetch, as
+        a list per step.  Listing is sharded across all the steps' windows
+        together; PLAN_SYNC steps fetch the changes since `updated_min`."""
+        cal_events = [[] for step in plan]
+
+        fetches = []
+        for i, (cal, source, windows) in enumerate(plan):
+            for window in windows:
+                if source == self.PLAN_SYNC:
+                    cal_events[i].extend(self._cal_events(
+                        cal, window[0], window[1], searchText,
+                        updated_min=updated_min))
+                elif source == self.PLAN_LIST:
+                    fetches.append((i, cal) + window)
+
+        if self.fetchThreads > 1 and fetches:
+            fetched = self._sharded_cal_events(
+                [fetch[1:] for fetch in fetches], searchText)
+        else:
+            fetched = [self._cal_events(cal, start, end, searchText)
+                       for _, cal, start, end in fetches]
+        for (i, _, _, _), events in zip(fetches, fetched):
+            cal_events[i].extend(events)
+
+        return cal_events
 
+    def _window_cal_events(self, plan, cal_events, start, end):
+        """The events of [start, end) from window_cache, once `cal_events`,
+        what `plan` fetched, is added to it: a batch of commands over
+        overlapping windows fetches each stretch of time once."""
         event_list = []
-        for cal in self.cals:
-            work = self._cal_service().events().\
-                list(calendarId=cal['id'],
-                     timeMin=start.isoformat() if start else None,
-                     timeMax=end.isoformat() if end else None,
-                     q=searchText if searchText else None,
-                     singleEvents=True)
-            events = self._retry_with_backoff(work)
-            event_list.extend(self._GetAllEvents(cal, events, end))
+        for (cal, source, windows), events in zip(plan, cal_events):
+            index, covered = self._window_entry(cal)
+            for event in events:
+                index.add(event)
+            covered[:] = interval_union(sorted(covered + windows))
+
+            for event in index.overlapping(start, end):
+                # as the API does, leave out events ending at `start`
+                if event['e'] <= start:
+                    continue
+                if event['gcalcli_cal'] is not cal:
+                    # fetched for another instance, with its colours
+                    event = dict(event, gcalcli_cal=cal)
+                event_list.append(event)
 
         event_list.sort(key=lambda x: x['s'])
 
         return event_list
 
+    def _sync_cal_events(self, state, start, end):
+        """Like _search_for_cal_events, but only fetches what changed since
+        the last call with the same `state` dict and window."""
+        fetched_at = datetime.now(tzlocal())
+
+        if state.get('window') != (start, end) or \
+                state.get('syncs', 0) >= self.watchResync:
+            state['window'] = (start, end)
+            state['syncs'] = 0
+            state['events'] = IntervalIndex(
+                self._search_for_cal_events(start, end, None))
+        else:
+            state['syncs'] += 1
+            plan = self._plan(start, end, None, synced=True, cached=False)
+            cal_events = self._run_plan(plan, None,
+                                        updated_min=state['fetched_at'])
+            for (cal, _, _), events in zip(plan, cal_events):
+                for event in events:
+                    if event.get('status') == 'cancelled':
+                        state['events'].discard((cal['id'], event['id']))
+                    else:
+                        state['events'].add(event)
+
+        # leave some slack for clock skew between us and the server
+        state['fetched_at'] = fetched_at - timedelta(minutes=1)
+
+        # events moved out of the window are only dropped at the next full
+        # fetch, but needn't be shown until then
+        return state['events'].overlapping(start, end)
+
     def list_all_calendars(self):
 
         access_len = 0
@@ -1260,56 +2106,81 @@ class GoogleCalendarInterface:
             cli.print_msg(self._calendar_color(cal),
                           table_format % (cal['accessRole'], cal['summary']))
 
+    def _when(self, when, what):
+        """`when` as a datetime, parsing it if it's a string."""
+        if not isinstance(when, str):
+            return self._LocalizeDateTime(when)
+        try:
+            return self.date_parser.from_string(when)
+        except Exception:
+            raise ValueError('failed to parse %s time' % what)
+
+    @per_query
+    def events(self, start=None, end=None, searchText=None, limit=None,
+               include_declined=False):
+        """Lazily yields the events of the selected calendars that overlap
+        [start, end) and match `searchText`, in start order, leaving out
+        those ignore_started hides and, unless `include_declined` is set,
+        those ignoreDeclined hides.  Each event is the API's event resource
+        plus `s` and `e`, its start and end as local datetimes, and
+        `gcalcli_cal`, the calendar it is on.
+
+        `start` and `end` are datetimes or anything the command line takes,
+        None for no bound.  Raises ValueError if they don't parse."""
+        if start is not None:
+            start = self._when(start, 'start')
+        if end is not None:
+            end = self._when(end, 'end')
+        return self._iter_cal_events(start, end, searchText or None, limit,
+                                     self.now, include_declined)
+
+    @per_query
+    def search_events(self, searchText, start=None, end=None, limit=None,
+                      include_declined=False):
+        """events() matching `searchText`, from now on if ignore_started is
+        set and there's no `start`."""
+        if start is None and self.ignore_started:
+            start = self.now
+        return self.events(start, end, searchText, limit, include_declined)
+
+    @per_query
+    def agenda_events(self, start=None, end=None, limit=None):
+        """events() in the window the agenda shows, by default from
+        midnight this morning for agendaLength days."""
+        start, end = self._agenda_window(start, end)
+        return self.events(start, end, limit=limit)
+
+    @per_query
     def text_query(self, searchText='', start_text='', end_text=''):
         # the empty string would get *ALL* events...
         if searchText == '':
             return
 
-        # This is really just an optimization to the gcalendar api
-        # why ask for a bunch of events we are going to filter out
-        # anyway?
-        # TODO: Look at moving this into the _search_for_cal_events
-        #       Don't forget to clean up agenda_query too!
-
-        if start_text == '':
-            start = self.now if self.ignore_started else None
-        else:
-            try:
-                start = self.date_parser.from_string(start_text)
-            except Exception:
-                cli.print_err_msg('Error: failed to parse start time\n')
-                return
-
-        if end_text == '':
-            end = None
-        else:
-            try:
-                end = self.date_parser.from_string(end_text)
-            except Exception:
-                cli.print_err_msg('Error: failed to parse end time\n')
-                return
-
-        event_list = self._search_for_cal_events(start, end, searchText)
+        try:
+            # TSV output has always kept declined events
+            event_list = self.search_events(searchText, start_text or None,
+                                            end_text or None,
+                                            limit=self.limit,
+                                            include_declined=self.tsv)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
 
         if self.tsv:
             self._tsv(self.now, event_list)
         else:
             self._iterate_events(self.now, event_list, yearDate=True)
 
-    def agenda_query(self, start_text='', end_text=''):
+    def _agenda_window(self, start_text='', end_text=''):
 
-        if start_text == '':
+        if start_text in ('', None):
             # convert now to midnight this morning and use for default
             start = self.now.replace(hour=0,
                                      minute=0,
                                      second=0,
                                      microsecond=0)
         else:
-            try:
-                start = self.date_parser.from_string(start_text)
-            except Exception:
-                cli.print_err_msg('Error: failed to parse start time\n')
-                return
+            start = self._when(start_text, 'start')
 
         # Again optimizing calls to the api.  If we've been told to
         # ignore started events, then it doesn't make ANY sense to
@@ -1317,23 +2188,439 @@ class GoogleCalendarInterface:
         if self.ignore_started and start < self.now:
             start = self.now
 
-        if end_text == '':
+        if end_text in ('', None):
             end = (start + timedelta(days=self.agendaLength))
         else:
-            try:
-                end = self.date_parser.from_string(end_text)
-            except Exception:
-                cli.print_err_msg('Error: failed to parse end time\n')
-                return
+            end = self._when(end_text, 'end')
 
-        event_list = self._search_for_cal_events(start, end, None)
+        return start, end
 
+    def _agenda_render(self, start, event_list):
         if self.tsv:
             self._tsv(start, event_list)
         else:
             self._iterate_events(start, event_list, yearDate=False)
 
-    def cal_query(self, cmd, start_text='', count=1):
+    @per_query
+    def agenda_query(self, start_text='', end_text=''):
+        try:
+            start, end = self._agenda_window(start_text, end_text)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        # TSV output has always kept declined events
+        self._agenda_render(start, self.events(start, end, limit=self.limit,
+                                               include_declined=self.tsv))
+
+    def conflicts(self, start=None, end=None):
+        """The pairs of events on the selected calendars that overlap in
+        the agenda window, earlier event first.  Events the agenda would
+        hide, all-day events, events marked as free and an event showing on
+        two of the calendars don't count."""
+        def busy(event):
+            return not self._hidden(event) and \
+                'date' not in event['start'] and \
+                event.get('transparency') != 'transparent'
+
+        start, end = self._agenda_window(start, end)
+        events = [e for e in self._search_for_cal_events(start, end, None)
+                  if busy(e)]
+        return [(a, b) for a, b in overlapping_pairs(events)
+                if a['id'] != b['id']]
+
+    @per_query
+    def conflicts_query(self, start_text='', end_text=''):
+        try:
+            pairs = self.conflicts(start_text, end_text)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        if self.tsv:
+            for a, b in pairs:
+                # when the two overlap, then the two events
+                s = max(a['s'], b['s'])
+                e = min(a['e'], b['e'])
+                output = '\t'.join([
+                    s.strftime('%Y-%m-%d'), s.strftime('%H:%M'),
+                    e.strftime('%Y-%m-%d'), e.strftime('%H:%M'),
+                    self._ValidTitle(a).strip(),
+                    a['gcalcli_cal']['summary'].strip(),
+                    self._ValidTitle(b).strip(),
+                    b['gcalcli_cal']['summary'].strip()])
+                sys.stdout.write(output.replace('\n', '\\n') + '\n')
+            return
+
+        if not pairs:
+            cli.print_msg(colors.CLR_YLW(), "\nNo Conflicts Found...\n")
+        for a, b in pairs:
+            self._print_event(a, a['s'].strftime('\n%Y-%m-%d'))
+            self._print_event(b, None)
+
+    STATS_BY = ['week', 'day', 'calendar', 'attendee']
+
+    def _day_pieces(self, start, end, days=1):
+        """[start, end) cut at local midnights into (day, start, end), where
+        `days` is 7 to cut it by the week instead."""
+        day = start.date()
+        if days == 7:
+            day -= timedelta(days=(day.weekday() + (not self.calMonday)) % 7)
+        while True:
+            day_end = self._LocalizeDateTime(
+                datetime.combine(day + timedelta(days=days), dtime()))
+            yield day, start, min(end, day_end)
+            if day_end >= end:
+                return
+            start = day_end
+            day += timedelta(days=days)
+
+    def _usage_pieces(self, event, start, end, by):
+        if by in ('day', 'week'):
+            yield from self._day_pieces(start, end,
+                                        days=7 if by == 'week' else 1)
+        elif by == 'calendar':
+            yield event['gcalcli_cal']['summary'], start, end
+        else:
+            emails = [a['email'] for a in event.get('attendees', [])
+                      if 'email' in a and
+                      a.get('responseStatus') != 'declined']
+            # events without guests only take their calendar's time
+            for email in emails or [event['gcalcli_cal']['id']]:
+                yield email, start, end
+
+    @per_query
+    def stats(self, start=None, end=None, by='week'):
+        """How the window's time went, by `by`: a (rows, total) pair where
+        rows are (key, usage) pairs in key order, or busiest first for
+        calendars and attendees, and usage has the number of events, their
+        summed time, the time at least one of them took (their union) and
+        the all-day time, which isn't counted as busy.  Events are clipped
+        to the window, and to each day or week they cross.
+
+        The events are streamed past in start order and only the running
+        totals are kept, so memory is bounded by a page or two per calendar
+        whatever the length of the window."""
+        if by not in self.STATS_BY:
+            raise ValueError('invalid stats grouping: %s' % by)
+        start, end = self._agenda_window(start, end)
+
+        totals = UsageTotals(timedelta(0))
+        total = UsageTotals(timedelta(0))
+        for event in self._merged_cal_events(
+                start, end, None, prefetch=True):
+            s, e = max(event['s'], start), min(event['e'], end)
+            if e < s:
+                continue
+            allday = 'date' in event['start']
+            total.add(None, s, e, allday)
+            for key, piece_start, piece_end in self._usage_pieces(
+                    event, s, e, by):
+                totals.add(key, piece_start, piece_end, allday)
+
+        if by in ('day', 'week'):
+            rows = sorted(totals.items(), key=lambda row: row[0])
+        else:
+            rows = sorted(totals.items(),
+                          key=lambda row: (-row[1].summed, row[0]))
+        return rows, total.get(None)
+
+    @staticmethod
+    def _hours(delta, tsv=False):
+        minutes = int(delta.total_seconds() // 60)
+        if tsv:
+            return '%.2f' % (minutes / 60.0)
+        return '%d:%02d' % (minutes // 60, minutes % 60)
+
+    @per_query
+    def stats_query(self, start_text='', end_text='', by='week'):
+        try:
+            rows, total = self.stats(start_text, end_text, by)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        if self.tsv:
+            for key, usage in rows:
+                output = '\t'.join([
+                    str(key), str(usage.events),
+                    self._hours(usage.summed, True),
+                    self._hours(usage.union, True),
+                    '%.2f' % (usage.allday.total_seconds() / 86400)])
+                sys.stdout.write(output.replace('\n', '\\n') + '\n')
+            return
+
+        if total is None:
+            cli.print_msg(colors.CLR_YLW(), "\nNo Events Found...\n")
+            return
+
+        width = max([len(by)] + [len(str(key)) for key, usage in rows])
+        cli.print_msg(colors.CLR_NRM(), '\n%-*s  %6s  %9s  %9s  %7s\n' % (
+            width, by, 'events', 'summed', 'busy', 'all-day'))
+        for key, usage in rows + [(None, total)]:
+            if key is None:
+                key = 'total'
+                cli.print_msg(colors.CLR_NRM(), '\n')
+            cli.print_msg(self.date_color, '%-*s' % (width, key))
+            cli.print_msg(colors.CLR_NRM(), '  %6d  %9s  %9s  %7s\n' % (
+                usage.events, self._hours(usage.summed),
+                self._hours(usage.union),
+                '%g' % round(usage.allday.total_seconds() / 86400, 1)))
+
+    def _freebusy(self, cals, start, end):
+        """The busy times of each of `cals` as (start, end) in start order,
+        by calendar id, from the freebusy API.  Calendars it has errors for
+        (not found, too many to expand, ...) are left out."""
+        busy = {}
+        # the API takes at most 50 calendars per query
+        for n in range(0, len(cals), 50):
+            result = self._retry_with_backoff(
+                self._cal_service().freebusy().query(body={
+                    'timeMin': start.isoformat(),
+                    'timeMax': end.isoformat(),
+                    'items': [{'id': cal['id']} for cal in cals[n:n + 50]]}))
+            for cal_id, info in result['calendars'].items():
+                if info.get('errors'):
+                    trace.PLAN('freebusy failed for %s: %s', cal_id,
+                               ', '.join(error.get('reason', '?')
+                                         for error in info['errors']))
+                    continue
+                busy[cal_id] = sorted(
+                    (self._LocalizeDateTime(parse(b['start'])),
+                     self._LocalizeDateTime(parse(b['end'])))
+                    for b in info.get('busy', []))
+        return busy
+
+    def _busy_times(self, cal, page, end):
+        for event in self._iter_events(cal, page, end,
+                                       prefetch=True):
+            if event.get('transparency') == 'transparent' or \
+                    (self.ignoreDeclined and self._declined(event)):
+                continue
+            yield event['s'], event['e']
+
+    def _working_windows(self, start, end, hours, weekends):
+        day = start.date()
+        while True:
+            opens = self._LocalizeDateTime(datetime.combine(day, hours[0]))
+            if opens >= end:
+                return
+            if weekends or day.weekday() < 5:
+                closes = self._LocalizeDateTime(
+                    datetime.combine(day, hours[1]))
+                opens, closes = max(opens, start), min(closes, end)
+                if opens < closes:
+                    yield opens, closes
+            day += timedelta(days=1)
+
+    @per_query
+    def find_time(self, start=None, end=None, duration=timedelta(minutes=30),
+                  hours=(dtime(9), dtime(17)), weekends=False):
+        """Lazily yields, earliest first, the free times of at least
+        `duration` that all the selected calendars share, within the working
+        `hours` of weekdays (or every day with `weekends`).  The window
+        defaults as for the agenda, except that it starts now.
+
+        Calendars we can only see free/busy information for are asked for
+        just that, as planned by _plan(); the others, and those the freebusy
+        API fails for, are read page by page as the search gets to them, so
+        memory stays bounded however many calendars there are."""
+        default_start = start in ('', None)
+        start, end = self._agenda_window(start, end)
+        if default_start:
+            start = max(start, self.now)
+        if hours[0] >= hours[1]:
+            raise ValueError('working hours must end after they start')
+
+        plan = self._plan(start, end, None, cached=False, busy=True)
+        readers = [cal for cal, source, _ in plan
+                   if source == self.PLAN_FREEBUSY]
+        busy = self._freebusy(readers, start, end) if readers else {}
+        # listed instead where freebusy failed
+        others = [cal for cal, _, _ in plan if cal['id'] not in busy]
+
+        streams = [busy[cal['id']] for cal in readers if cal['id'] in busy]
+        pages = self._first_pages(others, start, end, None)
+        streams.extend(self._busy_times(cal, page, end)
+                       for cal, page in zip(others, pages))
+
+        return free_slots(interval_union(heapq.merge(*streams)),
+                          self._working_windows(start, end, hours, weekends),
+                          duration)
+
+    def _time_str(self, dt):
+        if self.military:
+            return dt.strftime('%H:%M')
+        return dt.strftime('%I:%M').lstrip('0') + dt.strftime('%p').lower()
+
+    @per_query
+    def findtime_query(self, start_text='', end_text='', duration=30,
+                       hours='9:00-17:00', weekends=False, count=5):
+        try:
+            slots = self.find_time(start_text, end_text,
+                                   timedelta(minutes=duration),
+                                   parse_working_hours(hours), weekends)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        day = None
+        for start, end in itertools.islice(slots, count):
+            if self.tsv:
+                sys.stdout.write('%s\t%s\t%s\t%s\n' % (
+                    start.strftime('%Y-%m-%d'), start.strftime('%H:%M'),
+                    end.strftime('%Y-%m-%d'), end.strftime('%H:%M')))
+                continue
+            length = int((end - start).total_seconds() // 60)
+            if start.date() != day:
+                day = start.date()
+                cli.print_msg(self.date_color, start.strftime('\n%Y-%m-%d'))
+            else:
+                cli.print_msg(colors.CLR_NRM(), '\n' + ' ' * 10)
+            cli.print_msg(colors.CLR_NRM(), '  %7s - %-7s  (%d:%02d)' % (
+                self._time_str(start), self._time_str(end),
+                length // 60, length % 60))
+
+        if day is None and not self.tsv:
+            cli.print_msg(colors.CLR_YLW(), "\nNo Free Time Found...")
+        if not self.tsv:
+            sys.stdout.write('\n')
+
+    def _bench_requests(self, requests, threads):
+        """Runs `requests`, functions from an Http to an API request,
+        `threads` at a time and without retrying.  Returns the seconds each
+        took, how many were throttled, the items (events or calendars) they
+        returned and the wall time."""
+        def timed(request):
+            http = self._thread_http()
+            started = time.perf_counter()
+            try:
+                result = request(http).execute(http=http)
+            except HttpError as e:
+                if not is_rate_limited(e):
+                    raise
+                return time.perf_counter() - started, True, 0
+            items = len(result.get('items', [])) \
+                if isinstance(result, dict) else 0
+            return time.perf_counter() - started, False, items
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(timed, requests))
+        wall = time.perf_counter() - started
+        return ([r[0] for r in results], sum(r[1] for r in results),
+                sum(r[2] for r in results), wall)
+
+    def _bench_auth(self, count):
+        """Times getting an access token, as a run with expired credentials
+        does; None without OAuth."""
+        self._GoogleAuth()
+        if not self.credentials:
+            return None
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            self.credentials.refresh(self._new_http())
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def bench(self, count=32):
+        """Times the API as the selected calendars see it, reading only:
+        auth, discovery, the calendar list, and the first page of events
+        for each page size in BENCH_PAGE_SIZES with each number of threads
+        in BENCH_THREADS, `count` requests each.  Yields (phase, page size,
+        threads, latencies, throttled, items, wall time) as each phase is
+        done; page size and threads are None where they don't apply, and
+        there's no auth phase without OAuth (see api_endpoint)."""
+        short = min(count, 5)
+        latencies = self._bench_auth(short)
+        if latencies is not None:
+            yield ('auth', None, None, latencies, 0, 0, sum(latencies))
+
+        latencies = []
+        for _ in range(short):
+            started = time.perf_counter()
+            self._discover(self._new_http())
+            latencies.append(time.perf_counter() - started)
+        yield ('discovery', None, None, latencies, 0, 0, sum(latencies))
+
+        service = self._cal_service()
+        yield ('calendarList', None, 1) + self._bench_requests(
+            [lambda http: service.calendarList().list()] * short, 1)
+
+        # free/busy readers can't list events
+        cals = [cal for cal in self.cals
+                if cal['accessRole'] != self.ACCESS_FREEBUSY]
+        if not cals:
+            return
+
+        def first_page(cal, size):
+            return lambda http: self._list_events(cal, None, None, None,
+                                                  maxResults=size)
+
+        for size in self.BENCH_PAGE_SIZES:
+            requests = [first_page(cals[n % len(cals)], size)
+                        for n in range(count)]
+            for threads in self.BENCH_THREADS:
+                yield ('events', size, threads) + \
+                    self._bench_requests(requests, threads)
+
+    def _bench_choice(self, results):
+        """The events page size and threads with the best throughput, going
+        for fewer threads when that's nearly as quick; settings throttled
+        more than BENCH_MAX_THROTTLED of the time are ruled out."""
+        cells = [(items / wall if wall else 0, size, threads)
+                 for phase, size, threads, latencies, throttled, items, wall
+                 in results if phase == 'events' and
+                 throttled <= len(latencies) * self.BENCH_MAX_THROTTLED]
+        if not cells:
+            return None
+        best = max(cells)[0]
+        _, size, threads = min(
+            (cell for cell in cells if cell[0] >= 0.9 * best),
+            key=lambda cell: (cell[2], -cell[1]))
+        return size, threads
+
+    @per_query
+    def bench_query(self, count=32):
+        if not self.tsv:
+            cli.print_msg(colors.CLR_NRM(),
+                          '\n%-12s %5s %7s %8s %8s %8s %9s %9s\n' % (
+                              'phase', 'page', 'threads', 'requests',
+                              'p50 ms', 'p95 ms', 'items/s',
+                              'throttled'))
+
+        results = []
+        for result in self.bench(count):
+            results.append(result)
+            phase, size, threads, latencies, throttled, items, wall = result
+            columns = [phase, size or '', threads or '', len(latencies),
+                       '%.1f' % (percentile(latencies, 50) * 1000),
+                       '%.1f' % (percentile(latencies, 95) * 1000),
+                       '%.0f' % (items / wall) if wall else '0',
+                       '%.1f%%' % (100.0 * throttled / len(latencies))]
+            if self.tsv:
+                sys.stdout.write('\t'.join(str(c) for c in columns) + '\n')
+            else:
+                cli.print_msg(self.date_color, '%-12s' % phase)
+                cli.print_msg(colors.CLR_NRM(),
+                              ' %5s %7s %8d %8s %8s %9s %9s\n' % tuple(
+                                  columns[1:]))
+            sys.stdout.flush()
+
+        if self.tsv:
+            return
+
+        choice = self._bench_choice(results)
+        if choice is None:
+            cli.print_msg(colors.CLR_YLW(),
+                          '\nNo events could be listed without throttling\n')
+        else:
+            cli.print_msg(colors.CLR_NRM(),
+                          '\nRecommended: --page_size %d --fetch_threads %d'
+                          '\n' % choice)
+
+    def _cal_window(self, cmd, start_text='', count=1):
 
         if start_text == '':
             # convert now to midnight this morning and use for default
@@ -1342,13 +2629,8 @@ class GoogleCalendarInterface:
                                      second=0,
                                      microsecond=0)
         else:
-            try:
-                start = self.date_parser.from_string(start_text)
-                start = start.replace(hour=0, minute=0, second=0,
-                                      microsecond=0)
-            except Exception:
-                cli.print_err_msg('Error: failed to parse start time\n')
-                return
+            start = self._when(start_text, 'start')
+            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
 
         # convert start date to the beginning of the week or month
         if cmd == 'calw':
@@ -1378,10 +2660,65 @@ class GoogleCalendarInterface:
             if totalDays % 7:
                 count += 1
 
-        event_list = self._search_for_cal_events(start, end, None)
+        return start, end, count
 
+    @per_query
+    def cal_query(self, cmd, start_text='', count=1):
+        try:
+            start, end, count = self._cal_window(cmd, start_text, count)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return
+
+        event_list = self._search_for_cal_events(start, end, None)
         self._graph_events(cmd, start, count, event_list)
 
+    @per_query
+    def _watch_frame(self, cmd, state, start_text='', end_text='', count=1):
+        try:
+            if cmd == 'agenda':
+                window = self._agenda_window(start_text, end_text)
+            elif cmd == 'caly':
+                window = self._year_window(start_text)
+            else:
+                window = self._cal_window(cmd, start_text, count)
+        except ValueError as e:
+            cli.print_err_msg('Error: %s\n' % e)
+            return None
+
+        event_list = self._sync_cal_events(state, window[0], window[1])
+        if cmd == 'agenda' and self.limit:
+            event_list = [e for e in event_list
+                          if not self._hidden(e)][:self.limit]
+
+        frame = io.StringIO()
+        with redirect_stdout(frame):
+            if cmd == 'agenda':
+                self._agenda_render(window[0], event_list)
+            elif cmd == 'caly':
+                self._graph_year(window[0], window[2], event_list)
+            else:
+                self._graph_events(cmd, window[0], window[2], event_list)
+        return frame.getvalue().split('\n')
+
+    def watch(self, cmd, interval, start_text='', end_text='', count=1):
+        """Keep redrawing an agenda, calw, calm or caly every `interval`
+        seconds, fetching only changed events and repainting only changed
+        lines."""
+        state = {}
+        screen = []
+        sys.stdout.write(cli.CLEAR_SCREEN)
+
+        while True:
+            lines = self._watch_frame(cmd, state, start_text=start_text,
+                                      end_text=end_text, count=count)
+            if lines is None:
+                return
+            sys.stdout.write(cli.repaint(screen, lines))
+            sys.stdout.flush()
+            screen = lines
+            time.sleep(interval)
+
     def quick_add_event(self, eventText, reminder=None):
 
         if eventText == '':
@@ -1422,16 +2759,12 @@ your cache file might be stale and you might need to remove it and try again.
             hLink = self._ShortenURL(newEvent['htmlLink'])
             cli.print_msg(colors.CLR_GRN(), 'New event added: %s\n' % hLink)
 
-    def add_event(self, eTitle, eWhere, eStart, eEnd, eDescr, eWho, reminder):
-
-        if len(self.cals) != 1:
-            cli.print_err_msg("Must specify a single calendar\n")
-            return
-
+    def _new_event_body(self, eTitle, eWhere, eStart, eEnd, eDescr, eWho,
+                        reminder, all_day):
         event = {}
         event['summary'] = eTitle
 
-        if self.all_day:
+        if all_day:
             event['start'] = {'date': eStart}
             event['end'] = {'date': eEnd}
 
@@ -1446,7 +2779,7 @@ your cache file might be stale and you might need to remove it and try again.
         if eDescr:
             event['description'] = eDescr
 
-        event['attendees'] = map(lambda w: {'email': w}, eWho)
+        event['attendees'] = [{'email': w} for w in eWho]
 
         if reminder or not self.defaultReminders:
             event['reminders'] = {'useDefault': False,
@@ -1456,6 +2789,17 @@ your cache file might be stale and you might need to remove it and try again.
                 event['reminders']['overrides'].append({'minutes': n,
                                                         'method': m})
 
+        return event
+
+    def add_event(self, eTitle, eWhere, eStart, eEnd, eDescr, eWho, reminder):
+
+        if len(self.cals) != 1:
+            cli.print_err_msg("Must specify a single calendar\n")
+            return
+
+        event = self._new_event_body(eTitle, eWhere, eStart, eEnd, eDescr,
+                                     eWho, reminder, self.all_day)
+
         newEvent = self._retry_with_backoff(
             self._cal_service().events().
             insert(calendarId=self.cals[0]['id'], body=event))
@@ -1464,6 +2808,72 @@ your cache file might be stale and you might need to remove it and try again.
             hLink = self._ShortenURL(newEvent['htmlLink'])
             cli.print_msg(colors.CLR_GRN(), 'New event added: %s\n' % hLink)
 
+    def add_events(self, rows):
+        """Insert the events read by parse_batch_events, batchSize to a
+        request, and report how each row went.  Returns the number of rows
+        that failed."""
+
+        if len(self.cals) != 1:
+            cli.print_err_msg("Must specify a single calendar\n")
+            return len(rows)
+
+        service = self._cal_service()
+        by_line = {row['line']: row for row in rows}
+        results = {}
+        pending = list(rows)
+
+        for n in range(self.maxRetries):
+            throttled = []
+
+            def callback(request_id, response, exception):
+                row = by_line[int(request_id)]
+                if exception is None:
+                    results[row['line']] = (True, response)
+                elif isinstance(exception, HttpError) and \
+                        is_rate_limited(exception):
+                    throttled.append(row)
+                else:
+                    results[row['line']] = (False, exception)
+
+            for i in range(0, len(pending), self.batchSize):
+                batch = service.new_batch_http_request(callback=callback)
+                for row in pending[i:i + self.batchSize]:
+                    body = self._new_event_body(
+                            row['title'], row['where'], row['start'],
+                            row['end'], row['description'], row['who'],
+                            row['reminder'], row['allday'])
+                    batch.add(service.events().insert(
+                                  calendarId=self.cals[0]['id'], body=body),
+                              request_id=str(row['line']))
+                self._retry_with_backoff(batch)
+
+            if not throttled:
+                break
+            pending = throttled
+            time.sleep((2 ** n) + random.random())
+        else:
+            for row in throttled:
+                results[row['line']] = (False, 'rate limit exceeded')
+
+        failed = 0
+        for row in rows:
+            ok, result = results[row['line']]
+            if ok:
+                link = (self._ShortenURL(result['htmlLink'])
+                        if self.detail_url else result['start'].get(
+                            'dateTime', result['start'].get('date')))
+                cli.print_msg(colors.CLR_GRN(), 'line %d: added "%s" %s\n' % (
+                    row['line'], row['title'], link))
+            else:
+                failed += 1
+                cli.print_err_msg('line %d: failed: %s\n' % (
+                    row['line'], result))
+
+        cli.print_msg(colors.CLR_NRM(), '%d added, %d failed\n' % (
+            len(rows) - failed, failed))
+        return failed
+
+    @per_query
     def delete_events(self, searchText='', expert=False, start=None, end=None):
 
         # the empty string would get *ALL* events...
@@ -1476,6 +2886,7 @@ your cache file might be stale and you might need to remove it and try again.
         self._iterate_events(self.now, event_list,
                              yearDate=True, work=self._delete_event)
 
+    @per_query
     def EditEvents(self, searchText=''):
 
         # the empty string would get *ALL* events...
@@ -1487,6 +2898,7 @@ your cache file might be stale and you might need to remove it and try again.
         self._iterate_events(self.now, event_list,
                              yearDate=True, work=self._edit_event)
 
+    @per_query
     def Remind(self, minutes=10, command=None, use_reminders=False):
         """Check for events between now and now+minutes.
            If use_reminders is True, then only remind if
@@ -1553,13 +2965,13 @@ your cache file might be stale and you might need to remove it and try again.
                 print("+----------------+")
 
             if hasattr(ve, 'summary'):
-                cli.debug_print("SUMMARY: %s\n" % ve.summary.value)
+                trace.PARSE('SUMMARY: %s', ve.summary.value)
                 if verbose:
                     print("Event........{}".format(ve.summary.value))
                 event['summary'] = ve.summary.value
 
             if hasattr(ve, 'location'):
-                cli.debug_print("LOCATION: %s\n" % ve.location.value)
+                trace.PARSE('LOCATION: %s', ve.location.value)
                 if verbose:
                     print("Location.....{}".format(ve.location.value))
                 event['location'] = ve.location.value
@@ -1570,9 +2982,9 @@ your cache file might be stale and you might need to remove it and try again.
                 return None
 
             if ve.dtstart.value:
-                cli.debug_print("DTSTART: %s\n" % ve.dtstart.value.isoformat())
+                trace.PARSE('DTSTART: %s', ve.dtstart.value)
             if ve.dtend.value:
-                cli.debug_print("DTEND: %s\n" % ve.dtend.value.isoformat())
+                trace.PARSE('DTEND: %s', ve.dtend.value)
             if verbose:
                 if ve.dtstart.value:
                     print("Start........{}".format(
@@ -1589,7 +3001,7 @@ your cache file might be stale and you might need to remove it and try again.
 
             if hasattr(ve, 'rrule'):
 
-                cli.debug_print("RRULE: %s\n" % ve.rrule.value)
+                trace.PARSE('RRULE: %s', ve.rrule.value)
                 if verbose:
                     print("Recurrence...%s" % ve.rrule.value)
 
@@ -1641,13 +3053,13 @@ your cache file might be stale and you might need to remove it and try again.
 
             if hasattr(ve, 'description') and ve.description.value.strip():
                 descr = ve.description.value.strip()
-                cli.debug_print("DESCRIPTION: %s\n" % descr)
+                trace.PARSE('DESCRIPTION: %s', descr)
                 if verbose:
                     print("Description:\n%s" % descr)
                 event['description'] = descr
 
             if hasattr(ve, 'organizer'):
-                cli.debug_print("ORGANIZER: %s\n" % ve.organizer.value)
+                trace.PARSE('ORGANIZER: %s', ve.organizer.value)
 
                 if ve.organizer.value.startswith("MAILTO:"):
                     email = ve.organizer.value[7:]
@@ -1659,7 +3071,7 @@ your cache file might be stale and you might need to remove it and try again.
                                       'email': email}
 
             if hasattr(ve, 'attendee_list'):
-                cli.debug_print("ATTENDEE_LIST : %s\n" % ve.attendee_list)
+                trace.PARSE('ATTENDEE_LIST : %s', ve.attendee_list)
                 if verbose:
                     print("attendees:")
                 event['attendees'] = []
@@ -1698,12 +3110,12 @@ your cache file might be stale and you might need to remove it and try again.
                 cli.print_err_msg("Error: " + str(e) + "!\n")
                 sys.exit(1)
 
-        while True:
+        # all of the file is parsed first, so --memprofile has the parse
+        # phase apart from the inserts
+        components = list(vobject.readComponents(f))
+        self._mem_phase('parse')
 
-            try:
-                v = vobject.readComponents(f).next()
-            except StopIteration:
-                break
+        for v in components:
 
             for ve in v.vevent_list:
 
@@ -1744,8 +3156,83 @@ your cache file might be stale and you might need to remove it and try again.
                     sys.exit(1)
 
 
+def unique_cals(cals):
+    """`cals` without repeats, by id, in order."""
+    return list(collections.OrderedDict(
+        (cal['id'], cal) for cal in cals).values())
+
+
+def user_agent(gzip=True):
+    # Google only compresses responses for user agents that mention gzip
+    agent = __program__ + '/' + __version__
+    return agent + ' (gzip)' if gzip else agent
+
+
+def trace_requests(http):
+    """Traces every request on `http` as an http span."""
+    request = http.request
+
+    def traced_request(uri, method='GET', body=None, headers=None,
+                       *args, **kwargs):
+        with trace.HTTP.span('%s %s', method, uri) as span:
+            response, content = request(uri, method, body, headers, *args,
+                                        **kwargs)
+            span.note(status=response.status, bytes=len(content or b''))
+        return response, content
+
+    http.request = traced_request
+    return http
+
+
+def set_transfer_encoding(http, gzip=True):
+    """Makes every request on `http` ask for gzip compressed responses, or
+    for uncompressed ones if `gzip` is off.  httplib2 decompresses them."""
+    request = http.request
+    agent = user_agent(gzip)
+
+    def compressed_request(uri, method='GET', body=None, headers=None,
+                           *args, **kwargs):
+        headers = dict(headers or {})
+        # the API client adds its own "(gzip)" whatever we want
+        other = headers.pop('user-agent', '').replace('(gzip)', '').strip()
+        headers['user-agent'] = agent + (' ' + other if other else '')
+        headers['accept-encoding'] = 'gzip' if gzip else 'identity'
+        return request(uri, method, body, headers, *args, **kwargs)
+
+    http.request = compressed_request
+    return http
+
+
+def percentile(values, percent):
+    """The nearest-rank `percent`th percentile of `values`, 0 if empty."""
+    if not values:
+        return 0
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
+
+
+def is_rate_limited(error):
+    """True if an HttpError is a 403/429 quota error worth retrying."""
+    if error.resp.status not in (403, 429):
+        return False
+    if error.resp.status == 429:
+        return True
+    content = error.content
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    try:
+        reason = json.loads(content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return False
+    return reason in ['rateLimitExceeded', 'userRateLimitExceeded']
+
+
+REMINDER_RE = r'^(\d+)([wdhm]?)(?:\s+(popup|email|sms))?$'
+
+
 def parse_reminder(rem):
-    matchObj = re.match(r'^(\d+)([wdhm]?)(?:\s+(popup|email|sms))?$', rem)
+    matchObj = re.match(REMINDER_RE, rem)
     if not matchObj:
         cli.print_err_msg('Invalid reminder: ' + rem + '\n')
         sys.exit(1)
@@ -1763,3 +3250,113 @@ def parse_reminder(rem):
         m = 'popup'
 
     return n, m
+
+
+def parse_working_hours(text):
+    """'9-17' or '09:00-17:30' as a (start, end) pair of times."""
+    times = text.split('-')
+    if len(times) != 2:
+        raise ValueError('invalid working hours: %s' % text)
+    try:
+        return tuple(
+            datetime.strptime(t.strip(), '%H:%M' if ':' in t else '%H').time()
+            for t in times)
+    except ValueError:
+        raise ValueError('invalid working hours: %s' % text)
+
+
+BATCH_FIELDS = ['title', 'where', 'when', 'duration', 'description', 'who',
+                'reminder', 'allday']
+
+
+def _read_batch_rows(f):
+    """(line number, dict) pairs from CSV, TSV or JSON Lines input."""
+    text = f.read()
+    first = text.lstrip()[:1]
+    if first in ('{', ''):
+        for line, record in enumerate(text.splitlines(), 1):
+            if record.strip():
+                yield line, json.loads(record)
+        return
+
+    header = text.splitlines()[0]
+    reader = csv.DictReader(io.StringIO(text),
+                            delimiter='\t' if '\t' in header else ',')
+    for record in reader:
+        yield reader.line_num, record
+
+
+def parse_batch_events(f, defaults):
+    """Read and validate the events for `add --batch`.
+
+    Column names match the add flags; empty columns fall back to the flag
+    values in `defaults`.  `who` takes several addresses separated by
+    commas, semicolons or spaces and `reminder` several reminders separated
+    by semicolons (JSON Lines may use lists for both).
+
+    Returns (rows, errors); nothing should be inserted if there are any
+    errors."""
+    rows = []
+    errors = []
+
+    try:
+        records = list(_read_batch_rows(f))
+    except (ValueError, csv.Error) as e:
+        return [], ['invalid input: %s' % e]
+
+    for line, record in records:
+        if not isinstance(record, dict):
+            errors.append('line %d: expected a JSON object' % line)
+            continue
+
+        unknown = set(record) - set(BATCH_FIELDS)
+        if unknown:
+            errors.append('line %d: unknown field(s) %s' % (
+                line, ', '.join(sorted(str(u) for u in unknown))))
+            continue
+
+        def field(name):
+            value = record.get(name)
+            if value is None or value == '':
+                return defaults.get(name)
+            return value
+
+        allday = field('allday')
+        if isinstance(allday, str):
+            allday = allday.strip().lower() in ('1', 'y', 'yes', 'true')
+
+        who = field('who') or []
+        if isinstance(who, str):
+            who = [w for w in re.split(r'[,;\s]+', who) if w]
+        reminder = field('reminder') or []
+        if isinstance(reminder, str):
+            reminder = [r.strip() for r in reminder.split(';') if r.strip()]
+
+        bad = [r for r in reminder if not re.match(REMINDER_RE, r)]
+        if bad:
+            errors.append('line %d: invalid reminder %s' % (
+                line, ', '.join(bad)))
+            continue
+
+        if not field('when') or field('duration') is None:
+            errors.append('line %d: when and duration are required' % line)
+            continue
+
+        try:
+            start, end = get_time_from_str(
+                    str(field('when')), field('duration'), allday)
+        except ValueError as e:
+            errors.append('line %d: %s' % (line, e))
+            continue
+
+        rows.append({'line': line,
+                     'title': field('title') or '',
+                     'where': field('where'),
+                     'description': field('description'),
+                     'start': start,
+                     'end': end,
+                     'who': who,
+                     'reminder': reminder,
+                     'allday': bool(allday)})
+
+    return rows, errors
@@ -0,0 +1,315 @@
+import heapq
+import itertools
+import random
+
+
+def event_key(event):
+    # the same event can be on several of the selected calendars
+    return (event['gcalcli_cal']['id'], event['id'])
+
+
+class _Node(object):
+    __slots__ = ('key', 'end', 'event', 'priority', 'left', 'right',
+                 'max_end')
+
+    def __init__(self, key, end, event, priority):
+        self.key = key
+        self.end = end
+        self.event = event
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+class IntervalIndex(object):
+    """Events indexed by their [s, e) span.
+
+    This is an interval tree: a treap ordered by start time whose nodes also
+    know the latest end in their subtree, so finding the events that overlap
+    a window takes O(log n + k) and adding, replacing or removing an event
+    O(log n), all expected.  Iterating gives the events in start order, with
+    events starting at the same time in the order they were first added.
+    """
+
+    def __init__(self, events=(), key=event_key):
+        self._root = None
+        self._key = key
+        self._nodes = {}
+        self._seq = itertools.count()
+        # a fixed seed keeps the shape, and so the timings, reproducible
+        self._random = random.Random(0)
+        for event in events:
+            self.add(event)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self.starting())
+
+    def __contains__(self, event):
+        return self._key(event) in self._nodes
+
+    def add(self, event):
+        """Adds `event`, replacing any event with the same key."""
+        key = self._key(event)
+        old = self._nodes.get(key)
+        seq = next(self._seq)
+        if old is not None:
+            self._root = _delete(self._root, old.key)
+            seq = old.key[1]
+        node = _Node((event['s'], seq), event['e'], event,
+                     self._random.random())
+        self._nodes[key] = node
+        self._root = _insert(self._root, node)
+
+    def discard(self, key):
+        """Removes the event with this key, if there is one."""
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            self._root = _delete(self._root, node.key)
+
+    def overlapping(self, start=None, end=None):
+        """The events overlapping [start, end), in start order.  Events
+        without a duration count if they are at or after `start`.  None
+        leaves that side of the window open."""
+        out = []
+        _overlapping(self._root, start, end, out)
+        return out
+
+    def starting(self, start=None, end=None):
+        """The events starting in [start, end), in start order."""
+        out = []
+        _starting(self._root, start, end, out)
+        return out
+
+
+def _fix(node):
+    max_end = node.end
+    if node.left is not None and node.left.max_end > max_end:
+        max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > max_end:
+        max_end = node.right.max_end
+    node.max_end = max_end
+
+
+def _rotate_right(node):
+    top = node.left
+    node.left = top.right
+    top.right = node
+    _fix(node)
+    _fix(top)
+    return top
+
+
+def _rotate_left(node):
+    top = node.right
+    node.right = top.left
+    top.left = node
+    _fix(node)
+    _fix(top)
+    return top
+
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    _fix(node)
+    return node
+
+
+def _merge(left, right):
+    # every key in `left` is before every key in `right`
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _fix(left)
+        return left
+    right.left = _merge(left, right.left)
+    _fix(right)
+    return right
+
+
+def _delete(node, key):
+    if node is None:
+        return None
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    elif node.key < key:
+        node.right = _delete(node.right, key)
+    else:
+        return _merge(node.left, node.right)
+    _fix(node)
+    return node
+
+
+def _overlapping(node, start, end, out):
+    while node is not None:
+        # max_end == start still leaves events without a duration at start
+        if start is not None and node.max_end < start:
+            return
+        _overlapping(node.left, start, end, out)
+        if end is not None and node.key[0] >= end:
+            # so does everything to the right
+            return
+        if start is None or node.end > start or node.key[0] >= start:
+            out.append(node.event)
+        node = node.right
+
+
+def _starting(node, start, end, out):
+    while node is not None:
+        if start is not None and node.key[0] < start:
+            node = node.right
+            continue
+        _starting(node.left, start, end, out)
+        if end is not None and node.key[0] >= end:
+            return
+        out.append(node.event)
+        node = node.right
+
+
+def overlapping_pairs(events):
+    """Every pair of `events`, which must be in start order, that overlap in
+    time, found by sweeping through them with the events still running kept
+    in a heap by end time: O(n log n + k) for k pairs.  Each pair is
+    (earlier, later), in the order the later event starts.  Events without
+    a duration take no time and so overlap nothing."""
+    ending = []
+    running = {}
+    for seq, event in enumerate(events):
+        if event['e'] <= event['s']:
+            continue
+        while ending and ending[0][0] <= event['s']:
+            running.pop(heapq.heappop(ending)[1])
+        for other in running.values():
+            yield other, event
+        heapq.heappush(ending, (event['e'], seq))
+        running[seq] = event
+
+
+def interval_union(intervals):
+    """Merges (start, end) `intervals`, in start order, into the disjoint
+    intervals covering the same time, in one pass."""
+    current = None
+    for start, end in intervals:
+        if current is None:
+            current = [start, end]
+        elif start <= current[1]:
+            if end > current[1]:
+                current[1] = end
+        else:
+            yield tuple(current)
+            current = [start, end]
+    if current is not None:
+        yield tuple(current)
+
+
+def window_gaps(covered, start, end):
+    """The parts of [start, end) that `covered`, disjoint (start, end)
+    intervals in start order, leaves out."""
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            yield cursor, covered_start
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        yield cursor, end
+
+
+def free_slots(busy, windows, duration):
+    """The stretches of at least `duration` inside `windows` (e.g. working
+    hours) not covered by `busy`.  Both are (start, end) in start order and
+    are walked together once, so neither is held in memory."""
+    busy = iter(busy)
+    current = next(busy, None)
+    for window_start, window_end in windows:
+        cursor = window_start
+        while current is not None and current[0] < window_end:
+            start, end = current
+            if start - cursor >= duration:
+                yield cursor, start
+            cursor = max(cursor, end)
+            if end > window_end:
+                # still busy in the next window
+                break
+            current = next(busy, None)
+        if window_end - cursor >= duration:
+            yield cursor, window_end
+
+
+class _Usage(object):
+    __slots__ = ('events', 'summed', 'allday', 'covered', 'run_start',
+                 'run_end')
+
+    def __init__(self, zero):
+        self.events = 0
+        self.summed = zero
+        self.allday = zero
+        self.covered = zero
+        self.run_start = None
+        self.run_end = None
+
+    @property
+    def union(self):
+        """The time covered by at least one of the timed intervals."""
+        if self.run_start is None:
+            return self.covered
+        return self.covered + (self.run_end - self.run_start)
+
+
+class UsageTotals(object):
+    """Running totals of time use by key, in one pass and without keeping
+    the intervals: how many there were, their summed length, and the length
+    of their union, which counts overlapping time once.  The intervals for
+    each key must come in start order.  All-day intervals are summed
+    separately and left out of the timed totals."""
+
+    def __init__(self, zero=0):
+        self._zero = zero
+        self._totals = {}
+
+    def __len__(self):
+        return len(self._totals)
+
+    def add(self, key, start, end, allday=False):
+        usage = self._totals.get(key)
+        if usage is None:
+            usage = self._totals[key] = _Usage(self._zero)
+        usage.events += 1
+        if allday:
+            usage.allday += end - start
+            return
+        usage.summed += end - start
+        if usage.run_start is not None and start <= usage.run_end:
+            if end > usage.run_end:
+                usage.run_end = end
+            return
+        if usage.run_start is not None:
+            usage.covered += usage.run_end - usage.run_start
+        usage.run_start = start
+        usage.run_end = end
+
+    def get(self, key):
+        return self._totals.get(key)
+
+    def items(self):
+        """(key, usage) pairs in the order the keys were first seen; usage
+        has events, summed, union and allday."""
+        return self._totals.items()
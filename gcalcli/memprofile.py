@@ -0,0 +1,109 @@
+"""Memory profiling with tracemalloc, for --memprofile.
+
+The command marks the ends of its phases (fetch, parse, render) and each
+mark takes a snapshot.  The report gives, per phase, the memory still
+allocated at its end, the peak during it, and the sites that allocated most
+of what the phase added and kept alive.  A site is the innermost gcalcli
+line an allocation came from, so memory allocated inside a library (a JSON
+decoder, vobject) is put down to the gcalcli code that called it.
+
+Queries have a fetch phase, which takes in decoding the events and
+turning them into Python objects, and a render phase; importing has a
+parse phase, ending once all of the ICS file is parsed.  When events are
+streamed (with --limit, or --fetch_threads 1) they are rendered as they
+are fetched, so the fetch phase takes in what rendering them allocated.
+"""
+import collections
+import os
+import tracemalloc
+
+import gcalcli
+
+PACKAGE = os.path.dirname(os.path.abspath(gcalcli.__file__))
+TESTS = os.path.join(PACKAGE, 'tests')
+
+
+def _size(size):
+    if abs(size) < 1024:
+        return '%d B' % size
+    for unit in ('KiB', 'MiB', 'GiB'):
+        size /= 1024.0
+        if abs(size) < 1024 or unit == 'GiB':
+            return '%.1f %s' % (size, unit)
+
+
+OWN = (tracemalloc.__file__, __file__)
+
+
+def _site(traceback):
+    """Where an allocation comes from: its innermost gcalcli frame, or its
+    innermost frame if it doesn't come from gcalcli.  None for the
+    profiler's own allocations."""
+    if traceback[-1].filename in OWN:
+        return None
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PACKAGE) and \
+                not frame.filename.startswith(TESTS) and \
+                frame.filename != __file__:
+            return frame.filename, frame.lineno
+    frame = traceback[-1]
+    return frame.filename, frame.lineno
+
+
+def _sites(snapshot):
+    """The memory allocated in `snapshot` by site."""
+    sites = collections.Counter()
+    for stat in snapshot.statistics('traceback'):
+        site = _site(stat.traceback)
+        if site is not None:
+            sites[site] += stat.size
+    return sites
+
+
+class MemoryProfile(object):
+    """Traces allocations from its creation on.  Call phase() at the end of
+    each phase and report() at the end; with `folder`, every snapshot is
+    also dumped there, to load with tracemalloc.Snapshot.load() and compare
+    across versions."""
+
+    def __init__(self, folder=None, top=10, frames=8):
+        self.folder = os.path.expanduser(folder) if folder else None
+        if self.folder and not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        self.top = top
+        self.phases = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._sites = _sites(tracemalloc.take_snapshot())
+
+    def phase(self, name):
+        """Marks the end of phase `name`."""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        sites = _sites(snapshot)
+        # what the phase allocated and kept
+        grown = sites - self._sites
+        self.phases.append((name, current, peak, grown.most_common(self.top)))
+
+        if self.folder:
+            snapshot.dump(os.path.join(self.folder, '%02d-%s.snapshot' % (
+                len(self.phases), name)))
+        self._sites = sites
+        if hasattr(tracemalloc, 'reset_peak'):
+            # Python 3.9 on: a peak per phase, rather than so far
+            tracemalloc.reset_peak()
+
+    def report(self, out):
+        for name, current, peak, sites in self.phases:
+            out.write('%s: %s allocated, peak %s\n' % (
+                name, _size(current), _size(peak)))
+            for (filename, lineno), size in sites:
+                if filename.startswith(PACKAGE):
+                    filename = 'gcalcli' + filename[len(PACKAGE):]
+                out.write('  %10s  %s:%d\n' % (_size(size), filename,
+                                               lineno))
+        if self.folder:
+            out.write('snapshots in %s\n' % self.folder)
+
+    def stop(self):
+        tracemalloc.stop()
@@ -0,0 +1,215 @@
+"""Recording the HTTP exchanges of a run, and replaying them later without
+the network, e.g. to reproduce a slow run on another machine or to keep it
+as a benchmark fixture.
+
+A recording is a folder holding exchanges.jsonl, one request and its
+response per line in the order they completed, and meta.json with the
+times queries started at, which a replay hands out again so that windows
+relative to now ask for the same times.  Credentials are redacted: the
+Authorization header, OAuth parameters in URIs and request bodies, and
+tokens in response bodies.
+"""
+import base64
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from dateutil.parser import parse
+from dateutil.tz import tzlocal
+import httplib2
+
+EXCHANGES = 'exchanges.jsonl'
+META = 'meta.json'
+REDACTED = 'REDACTED'
+
+SECRET_HEADERS = ('authorization', 'cookie', 'set-cookie')
+SECRET_PARAMS = re.compile(
+    r'\b(access_token|refresh_token|id_token|client_secret|code|key)='
+    r'[^&\s"]*')
+SECRET_FIELDS = re.compile(
+    r'("(?:access_token|refresh_token|id_token|client_secret)"\s*:\s*)'
+    r'"[^"]*"')
+
+
+class ReplayError(httplib2.HttpLib2Error):
+    pass
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def redact_params(text):
+    """`text`, a URI or form, without OAuth secrets."""
+    return SECRET_PARAMS.sub(r'\1=' + REDACTED, text)
+
+
+def redact_fields(text):
+    """`text`, a JSON body, without OAuth tokens."""
+    return SECRET_FIELDS.sub(r'\1"%s"' % REDACTED, text)
+
+
+def redact_headers(headers):
+    return dict((_text(k), REDACTED if _text(k).lower() in SECRET_HEADERS
+                 else _text(v)) for k, v in (headers or {}).items())
+
+
+def _body(body):
+    """A request body as recorded: redacted text, None if there's none."""
+    if body is None:
+        return None
+    if hasattr(body, 'read'):
+        # a stream, e.g. a media upload: only its size is kept
+        return '<%d bytes>' % len(body.getvalue()) \
+            if hasattr(body, 'getvalue') else '<stream>'
+    return redact_fields(redact_params(_text(body)))
+
+
+def _digest(body):
+    if body is None:
+        return None
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+class Recorder(object):
+    """Records what goes through the Https it wraps into `folder`, which
+    is emptied first.  Safe to use from several threads."""
+
+    offline = False
+
+    def __init__(self, folder):
+        self.folder = os.path.expanduser(folder)
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        self._lock = threading.Lock()
+        self._meta = {'recorded': datetime.now(tzlocal()).isoformat(),
+                      'queries': []}
+        self._write_meta()
+        self._file = open(os.path.join(self.folder, EXCHANGES), 'w')
+
+    def _write_meta(self):
+        with open(os.path.join(self.folder, META), 'w') as f:
+            json.dump(self._meta, f, indent=1)
+
+    def query_time(self):
+        now = datetime.now(tzlocal())
+        with self._lock:
+            self._meta['queries'].append(now.isoformat())
+            self._write_meta()
+        return now
+
+    def time(self):
+        return datetime.now(tzlocal())
+
+    def wrap(self, http):
+        request = http.request
+
+        def recorded_request(uri, method='GET', body=None, headers=None,
+                             *args, **kwargs):
+            started = time.perf_counter()
+            response, content = request(uri, method, body, headers, *args,
+                                        **kwargs)
+            self.add(uri, method, body, headers, response, content,
+                     time.perf_counter() - started)
+            return response, content
+
+        http.request = recorded_request
+        return http
+
+    def add(self, uri, method, body, headers, response, content, seconds):
+        exchange = {
+            'method': method,
+            'uri': redact_params(_text(uri)),
+            'headers': redact_headers(headers),
+            'body': _body(body),
+            'status': response.status,
+            'reason': _text(getattr(response, 'reason', '')),
+            'response': redact_headers(response),
+            'seconds': round(seconds, 6)}
+        try:
+            exchange['content'] = redact_fields(content.decode('utf-8'))
+        except UnicodeDecodeError:
+            exchange['content_base64'] = \
+                base64.b64encode(content).decode('ascii')
+        line = json.dumps(exchange, sort_keys=True) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+class Replayer(object):
+    """Answers the requests of the Https it wraps from a recording made by
+    Recorder, without the network.  A request gets the responses recorded
+    for the same method, URI and body in turn, the last one again once
+    they run out; requests whose bodies vary from run to run (batches)
+    fall back to matching on method and URI."""
+
+    offline = True
+
+    def __init__(self, folder):
+        self.folder = os.path.expanduser(folder)
+        self._lock = threading.Lock()
+        try:
+            with open(os.path.join(self.folder, META)) as f:
+                meta = json.load(f)
+            with open(os.path.join(self.folder, EXCHANGES)) as f:
+                exchanges = [json.loads(line) for line in f if line.strip()]
+        except (IOError, ValueError) as e:
+            raise ReplayError('can\'t read the recording in %s: %s' %
+                              (folder, e))
+
+        self._queries = collections.deque(
+            parse(when) for when in meta['queries'])
+        self._now = self._queries[0] if self._queries else \
+            parse(meta['recorded'])
+        self._exact = collections.defaultdict(collections.deque)
+        self._loose = collections.defaultdict(collections.deque)
+        for exchange in exchanges:
+            key = (exchange['method'], exchange['uri'])
+            self._exact[key + (_digest(exchange['body']),)].append(exchange)
+            self._loose[key].append(exchange)
+
+    def query_time(self):
+        with self._lock:
+            if self._queries:
+                self._now = self._queries.popleft()
+            return self._now
+
+    def time(self):
+        return self._now
+
+    def wrap(self, http):
+        def replayed_request(uri, method='GET', body=None, headers=None,
+                             *args, **kwargs):
+            return self.response(uri, method, body)
+
+        http.request = replayed_request
+        return http
+
+    def response(self, uri, method='GET', body=None):
+        key = (method, redact_params(_text(uri)))
+        with self._lock:
+            for exchanges in (self._exact.get(key + (_digest(_body(body)),)),
+                              self._loose.get(key)):
+                if exchanges:
+                    exchange = exchanges.popleft() if len(exchanges) > 1 \
+                        else exchanges[0]
+                    break
+            else:
+                raise ReplayError('no recorded response for %s %s' % key)
+
+        response = httplib2.Response(dict(exchange['response'],
+                                          status=str(exchange['status'])))
+        response.reason = exchange['reason']
+        if 'content_base64' in exchange:
+            content = base64.b64decode(exchange['content_base64'])
+        else:
+            content = exchange['content'].encode('utf-8')
+        return response, content
@@ -0,0 +1,755 @@
+"""A local stand-in for the Google Calendar v3 endpoints gcalcli talks to.
+
+The server generates synthetic calendars on start up and answers the same
+JSON the real API does for calendarList, events list/get/insert/patch/
+delete/quickAdd, freeBusy and the multipart batch endpoint, with partial
+responses for the events list ``fields`` parameter.  It also serves the
+discovery document so that apiclient's ``build()`` can be pointed at it
+with gcalcli's ``--api_endpoint`` flag.
+
+Latency and 403/429 rate limit errors can be injected to see how the client
+behaves on a slow or throttled link.
+
+Run it by hand with::
+
+    python -m gcalcli.tests.standin --events 10000 --port 8080
+    gcalcli --api_endpoint http://127.0.0.1:8080 --nocache agenda
+"""
+import argparse
+import base64
+import bisect
+import calendar
+import collections
+import gzip
+import itertools
+import json
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from dateutil.parser import parse
+from dateutil.tz import tzutc
+
+TEST_DATA_DIR = os.path.dirname(os.path.abspath(__file__)) + '/data'
+
+SUMMARIES = ['Standup', 'Design review', 'Lunch', '1:1', 'Planning',
+             'Interview', 'Customer call', 'Retro', 'Focus time',
+             'All hands']
+# roughly 1% of events get this title, handy for search and delete runs
+RARE_SUMMARY = 'Offsite'
+LOCATIONS = ['', '', 'Room 1', 'Room 2', 'Cafeteria', 'Video call']
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut '
+         'enim ad minim veniam, quis nostrud exercitation ullamco laboris '
+         'nisi ut aliquip ex ea commodo consequat.\n')
+
+MAX_PAGE_SIZE = 2500
+
+
+def to_epoch(when):
+    """Seconds since the epoch for an API start/end dict or RFC3339 string.
+    Naive values and all-day dates are taken to be UTC."""
+    if isinstance(when, dict):
+        when = when.get('dateTime') or when['date']
+    dt = parse(when)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tzutc())
+    return calendar.timegm(dt.utctimetuple())
+
+
+def rfc3339(epoch):
+    return datetime.fromtimestamp(epoch, tzutc()).strftime(
+            '%Y-%m-%dT%H:%M:%SZ')
+
+
+class EventStore:
+    """The events of one calendar, ordered by start time."""
+
+    def __init__(self):
+        self.starts = []
+        self.events = []
+        self.spans = {}
+        self.max_length = 0
+        # deleted events, kept so showDeleted queries can report them
+        self.tombstones = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        s, e = to_epoch(event['start']), to_epoch(event['end'])
+        idx = bisect.bisect_right(self.starts, s)
+        self.starts.insert(idx, s)
+        self.events.insert(idx, event)
+        self.spans[event['id']] = (s, e)
+        self.max_length = max(self.max_length, e - s)
+
+    def extend(self, spans):
+        """Bulk load (start, end, event) triples, sorting once at the end."""
+        pairs = list(zip(self.starts, self.events))
+        for s, e, event in spans:
+            pairs.append((s, event))
+            self.spans[event['id']] = (s, e)
+            self.max_length = max(self.max_length, e - s)
+        pairs.sort(key=lambda p: p[0])
+        self.starts = [p[0] for p in pairs]
+        self.events = [p[1] for p in pairs]
+
+    def get(self, event_id):
+        if event_id not in self.spans:
+            return None
+        return self.events[self._index(event_id)]
+
+    def remove(self, event_id):
+        idx = self._index(event_id)
+        del self.starts[idx]
+        del self.events[idx]
+        del self.spans[event_id]
+
+    def _index(self, event_id):
+        s = self.spans[event_id][0]
+        idx = bisect.bisect_left(self.starts, s)
+        while self.events[idx]['id'] != event_id:
+            idx += 1
+        return idx
+
+    def window(self, time_min=None, time_max=None):
+        """Indexes of the events overlapping [time_min, time_max)."""
+        lo = 0
+        if time_min is not None:
+            lo = bisect.bisect_left(self.starts, time_min - self.max_length)
+        hi = len(self.starts)
+        if time_max is not None:
+            hi = bisect.bisect_left(self.starts, time_max)
+        for idx in range(lo, hi):
+            if time_min is not None and \
+                    self.spans[self.events[idx]['id']][1] <= time_min:
+                continue
+            yield idx
+
+    def cancelled(self, time_min=None, time_max=None):
+        for s, e, event in self.tombstones.values():
+            if (time_min is None or e > time_min) and \
+                    (time_max is None or s < time_max):
+                yield event
+
+
+class SyntheticCalendars:
+    """Deterministic synthetic calendars.
+
+    `events` is the total across all calendars.  `recurrence` is the share
+    of events that are instances of weekly recurring series, and
+    `descr_size` the length in characters of every event description."""
+
+    def __init__(self, events=1000, calendars=1, recurrence=0.2,
+                 descr_size=0, span_days=365,
+                 start=datetime(2018, 1, 1, tzinfo=tzutc()),
+                 roles=('owner',), seed=0):
+        self.start = start
+        self.span_days = span_days
+        self.calendars = []
+        self.stores = {}
+        self.updated = to_epoch(start.isoformat())
+        self._next_id = 0
+
+        for i in range(calendars):
+            cal_id = 'cal%d@standin.gcalcli' % i
+            self.calendars.append({
+                'kind': 'calendar#calendarListEntry',
+                'etag': '"%d"' % i,
+                'id': cal_id,
+                'summary': 'Synthetic %d' % i,
+                'timeZone': 'UTC',
+                'accessRole': roles[i % len(roles)],
+                'defaultReminders': [],
+                'selected': True})
+            self.stores[cal_id] = EventStore()
+
+        self._generate(events, recurrence, descr_size, random.Random(seed))
+
+    def new_id(self):
+        self._next_id += 1
+        return 'ev%07d' % self._next_id
+
+    def make_event(self, cal_id, summary, start, end, all_day=False,
+                   description='', location='', event_id=None):
+        event_id = event_id or self.new_id()
+        if all_day:
+            start = {'date': start.strftime('%Y-%m-%d')}
+            end = {'date': end.strftime('%Y-%m-%d')}
+        else:
+            start = {'dateTime': start.strftime('%Y-%m-%dT%H:%M:%SZ')}
+            end = {'dateTime': end.strftime('%Y-%m-%dT%H:%M:%SZ')}
+        event = {'kind': 'calendar#event',
+                 'etag': '"%d"' % self.updated,
+                 'id': event_id,
+                 'status': 'confirmed',
+                 'htmlLink': ('https://www.google.com/calendar/event?eid=' +
+                              event_id),
+                 'updated': rfc3339(self.updated),
+                 'summary': summary,
+                 'creator': {'email': cal_id},
+                 'organizer': {'email': cal_id, 'self': True},
+                 'start': start,
+                 'end': end,
+                 'iCalUID': event_id + '@standin.gcalcli',
+                 'reminders': {'useDefault': True}}
+        if description:
+            event['description'] = description
+        if location:
+            event['location'] = location
+        return event
+
+    def _generate(self, total, recurrence, descr_size, rnd):
+        by_cal = collections.defaultdict(list)
+        lorem = LOREM * (descr_size // len(LOREM) + 2)
+        made = 0
+        while made < total:
+            cal_id = self.calendars[made % len(self.calendars)]['id']
+            if rnd.random() < 0.01:
+                summary = RARE_SUMMARY
+            else:
+                summary = rnd.choice(SUMMARIES)
+            location = rnd.choice(LOCATIONS)
+            offset = rnd.randrange(len(LOREM))
+            description = lorem[offset:offset + descr_size]
+            day = self.start + timedelta(days=rnd.randrange(self.span_days))
+
+            all_day = rnd.random() < 0.05
+            if all_day:
+                start = day
+                end = day + timedelta(days=rnd.randint(1, 3))
+            else:
+                start = day + timedelta(hours=rnd.randint(8, 17),
+                                        minutes=rnd.choice((0, 15, 30, 45)))
+                end = start + timedelta(
+                        minutes=rnd.choice((15, 30, 60, 90, 120)))
+
+            instances = 1
+            if rnd.random() < recurrence:
+                instances = min(rnd.randint(4, 12), total - made)
+            series_id = self.new_id() if instances > 1 else None
+
+            for week in range(instances):
+                shift = timedelta(weeks=week)
+                event_id = None
+                if series_id:
+                    event_id = '%s_%s' % (series_id, (start + shift)
+                                          .strftime('%Y%m%dT%H%M%SZ'))
+                event = self.make_event(cal_id, summary, start + shift,
+                                        end + shift, all_day=all_day,
+                                        description=description,
+                                        location=location, event_id=event_id)
+                if series_id:
+                    event['recurringEventId'] = series_id
+                    event['originalStartTime'] = event['start']
+                by_cal[cal_id].append((
+                    calendar.timegm((start + shift).utctimetuple()),
+                    calendar.timegm((end + shift).utctimetuple()),
+                    event))
+            made += instances
+
+        for cal_id, spans in by_cal.items():
+            self.stores[cal_id].extend(spans)
+
+    def touch(self, event):
+        self.updated = max(self.updated + 1, int(time.time()))
+        event['updated'] = rfc3339(self.updated)
+        event['etag'] = '"%d"' % self.updated
+
+
+def parse_fields(text):
+    """A partial response `fields` selector, e.g. 'etag,items(id,start)',
+    as {'etag': None, 'items': {'id': None, 'start': None}}."""
+    def fields(i):
+        spec = {}
+        name = ''
+        while i < len(text):
+            c = text[i]
+            if c == '(':
+                spec[name.strip()], i = fields(i + 1)
+                name = ''
+            elif c == ')':
+                break
+            elif c == ',':
+                if name.strip():
+                    spec[name.strip()] = None
+                name = ''
+            else:
+                name += c
+            i += 1
+        if name.strip():
+            spec[name.strip()] = None
+        return spec, i
+
+    return fields(0)[0]
+
+
+def select_fields(value, spec):
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [select_fields(v, spec) for v in value]
+    return {k: select_fields(v, spec[k]) for k, v in value.items()
+            if k in spec}
+
+
+def _matches(event, terms):
+    text = ' '.join((event.get('summary', ''),
+                     event.get('description', ''),
+                     event.get('location', ''))).lower()
+    for term in terms:
+        if term.startswith('-'):
+            if term[1:] in text:
+                return False
+        elif term not in text:
+            return False
+    return True
+
+
+def _error(code, reason, message):
+    domain = 'usageLimits' if code in (403, 429) else 'global'
+    return code, {'error': {'errors': [{'domain': domain,
+                                        'reason': reason,
+                                        'message': message}],
+                            'code': code,
+                            'message': message}}
+
+
+def _encode_token(params):
+    return base64.urlsafe_b64encode(
+            json.dumps(params).encode('utf-8')).decode('ascii')
+
+
+def _decode_token(token):
+    return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+
+
+class StandinAPI:
+    """Routes (method, path, query, body) to a JSON response, independent of
+    the HTTP plumbing so batch requests can be dispatched the same way."""
+
+    def __init__(self, data, page_size=250):
+        self.data = data
+        self.page_size = page_size
+        self.lock = threading.RLock()
+
+    def route(self, method, path, query, body):
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+        if parts[:2] != ['calendar', 'v3']:
+            return _error(404, 'notFound', 'Not Found')
+        parts = parts[2:]
+
+        with self.lock:
+            if parts == ['users', 'me', 'calendarList'] and method == 'GET':
+                return self.calendar_list(query)
+            if parts == ['freeBusy'] and method == 'POST':
+                return self.freebusy(body)
+            if len(parts) < 3 or parts[0] != 'calendars' or \
+                    parts[2] != 'events':
+                return _error(404, 'notFound', 'Not Found')
+
+            store = self.data.stores.get(parts[1])
+            if store is None:
+                return _error(404, 'notFound', 'Not Found')
+
+            if len(parts) == 3:
+                if method == 'GET':
+                    return self.list_events(parts[1], store, query)
+                if method == 'POST':
+                    return self.insert(parts[1], store, body)
+            elif parts[3] == 'quickAdd' and method == 'POST':
+                return self.quick_add(parts[1], store, query)
+            elif len(parts) == 4:
+                event = store.get(parts[3])
+                if event is None:
+                    return _error(404, 'notFound', 'Not Found')
+                if method == 'GET':
+                    return 200, event
+                if method in ('PATCH', 'PUT'):
+                    return self.patch(store, event, body)
+                if method == 'DELETE':
+                    span = store.spans[event['id']]
+                    store.remove(event['id'])
+                    event['status'] = 'cancelled'
+                    self.data.touch(event)
+                    store.tombstones[event['id']] = span + (event,)
+                    return 204, None
+
+        return _error(405, 'methodNotAllowed', 'Method Not Allowed')
+
+    def _page_size(self, query):
+        return min(int(query.get('maxResults', self.page_size)),
+                   MAX_PAGE_SIZE)
+
+    def calendar_list(self, query):
+        offset = int(query.get('pageToken', 0))
+        size = self._page_size(query)
+        page = {'kind': 'calendar#calendarList',
+                'etag': '"%d"' % self.data.updated,
+                'items': self.data.calendars[offset:offset + size]}
+        if offset + size < len(self.data.calendars):
+            page['nextPageToken'] = str(offset + size)
+        return 200, page
+
+    def list_events(self, cal_id, store, query):
+        # as with the real API, continuation requests only carry the page
+        # token, so the token has to remember the original query
+        fields = query.get('fields')
+        offset = 0
+        if 'pageToken' in query:
+            token = _decode_token(query['pageToken'])
+            offset = token.pop('offset')
+            query = token
+
+        time_min = to_epoch(query['timeMin']) if 'timeMin' in query else None
+        time_max = to_epoch(query['timeMax']) if 'timeMax' in query else None
+        updated_min = None
+        if 'updatedMin' in query:
+            updated_min = to_epoch(query['updatedMin'])
+        terms = query.get('q', '').lower().split()
+        size = self._page_size(query)
+
+        candidates = (store.events[idx]
+                      for idx in store.window(time_min, time_max))
+        if query.get('showDeleted') == 'true':
+            candidates = itertools.chain(
+                    candidates, store.cancelled(time_min, time_max))
+
+        items = []
+        matched = 0
+        more = False
+        for event in candidates:
+            if terms and not _matches(event, terms):
+                continue
+            if updated_min is not None and \
+                    to_epoch(event['updated']) < updated_min:
+                continue
+            matched += 1
+            if matched <= offset:
+                continue
+            if len(items) == size:
+                more = True
+                break
+            items.append(event)
+
+        page = {'kind': 'calendar#events',
+                'etag': '"%d"' % self.data.updated,
+                'summary': cal_id,
+                'updated': rfc3339(self.data.updated),
+                'timeZone': 'UTC',
+                'accessRole': 'owner',
+                'defaultReminders': [],
+                'items': items}
+        if more:
+            token = dict(query, offset=offset + size)
+            token.pop('pageToken', None)
+            token.pop('fields', None)
+            page['nextPageToken'] = _encode_token(token)
+        if fields:
+            page = select_fields(page, parse_fields(fields))
+        return 200, page
+
+    def insert(self, cal_id, store, body):
+        event = json.loads(body.decode('utf-8'))
+        if 'start' not in event or 'end' not in event:
+            return _error(400, 'required', 'Missing end time.')
+        new = self.data.make_event(cal_id, event.get('summary', ''),
+                                   self.data.start, self.data.start)
+        new.update(event)
+        self.data.touch(new)
+        store.add(new)
+        return 200, new
+
+    def quick_add(self, cal_id, store, query):
+        start = datetime.fromtimestamp(
+                (int(time.time()) // 3600 + 1) * 3600, tzutc())
+        event = self.data.make_event(cal_id, query.get('text', ''),
+                                     start, start + timedelta(hours=1))
+        self.data.touch(event)
+        store.add(event)
+        return 200, event
+
+    def patch(self, store, event, body):
+        changes = json.loads(body.decode('utf-8'))
+        store.remove(event['id'])
+        event.update(changes)
+        self.data.touch(event)
+        store.add(event)
+        return 200, event
+
+    def freebusy(self, body):
+        request = json.loads(body.decode('utf-8'))
+        time_min = to_epoch(request['timeMin'])
+        time_max = to_epoch(request['timeMax'])
+        result = {'kind': 'calendar#freeBusy',
+                  'timeMin': request['timeMin'],
+                  'timeMax': request['timeMax'],
+                  'calendars': {}}
+        for item in request.get('items', []):
+            store = self.data.stores.get(item['id'])
+            if store is None:
+                result['calendars'][item['id']] = {
+                        'errors': [{'domain': 'global',
+                                    'reason': 'notFound'}],
+                        'busy': []}
+                continue
+            busy = []
+            for idx in store.window(time_min, time_max):
+                s, e = store.spans[store.events[idx]['id']]
+                busy.append({'start': rfc3339(max(s, time_min)),
+                             'end': rfc3339(min(e, time_max))})
+            result['calendars'][item['id']] = {'busy': busy}
+        return 200, result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PATCH(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+
+        server.count(self.command, url.path)
+        if server.latency:
+            time.sleep(server.latency)
+
+        if url.path.startswith('/discovery/'):
+            return self._send(200, server.discovery())
+
+        error = server.injected_error()
+        if error:
+            return self._send(*error)
+
+        if url.path == '/batch/calendar/v3':
+            return self._batch(body)
+
+        status, payload = server.api.route(self.command, url.path, query,
+                                           body)
+        etag = payload.get('etag') if isinstance(payload, dict) else None
+        if etag and self.command == 'GET' and status == 200 and \
+                self.headers.get('If-None-Match') == etag:
+            server.count_not_modified()
+            status, payload = 304, None
+        self._send(status, payload, etag=etag)
+
+    def _send(self, status, payload, content_type='application/json',
+              etag=None):
+        if payload is None:
+            data = b''
+        elif isinstance(payload, bytes):
+            data = payload
+        else:
+            data = json.dumps(payload).encode('utf-8')
+            content_type += '; charset=UTF-8'
+        # like Google, only compress for clients that say gzip in both
+        compress = data and \
+            'gzip' in self.headers.get('Accept-Encoding', '') and \
+            'gzip' in self.headers.get('User-Agent', '')
+        if compress:
+            data = gzip.compress(data)
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        if data:
+            self.send_header('Content-Type', content_type)
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count_bytes(len(data))
+
+    def _batch(self, body):
+        head = ('Content-Type: %s\r\n\r\n' %
+                self.headers['Content-Type']).encode('utf-8')
+        message = BytesParser().parsebytes(head + body)
+        boundary = 'batch_standin_%d' % random.getrandbits(32)
+
+        out = []
+        for part in message.get_payload():
+            request = part.get_payload()
+            if isinstance(request, list):  # parsed as message/http
+                request = request[0].as_string()
+            head, _, inner_body = re.split(r'(\r?\n\r?\n)', request, 1)
+            request_line = head.splitlines()[0]
+            method, target = request_line.split(' ')[:2]
+            url = urlsplit(target)
+
+            self.server.count(method, url.path, batched=True)
+            status, payload = self.server.api.route(
+                    method, url.path, dict(parse_qsl(url.query)),
+                    inner_body.encode('utf-8'))
+            text = json.dumps(payload) if payload is not None else ''
+            content_id = part['Content-ID'] or '<+%d>' % len(out)
+            out.append('--%s\r\n'
+                       'Content-Type: application/http\r\n'
+                       'Content-ID: <response-%s\r\n\r\n'
+                       'HTTP/1.1 %d %s\r\n'
+                       'Content-Type: application/json; charset=UTF-8\r\n'
+                       'Content-Length: %d\r\n\r\n%s\r\n' % (
+                           boundary, content_id[1:], status,
+                           self.responses.get(status, ('',))[0],
+                           len(text.encode('utf-8')), text))
+        out.append('--%s--\r\n' % boundary)
+        self._send(200, ''.join(out).encode('utf-8'),
+                   'multipart/mixed; boundary=%s' % boundary)
+
+
+class StandinServer(socketserver.ThreadingMixIn, HTTPServer):
+    """Serves `data` (a SyntheticCalendars) on a background thread.
+
+    `latency` is added to every request, in seconds.  `error_rate` is the
+    chance of any API request failing with `error_code` (403 for
+    rateLimitExceeded, 429 for too many requests)."""
+
+    daemon_threads = True
+
+    def __init__(self, data, page_size=250, latency=0.0, error_rate=0.0,
+                 error_code=403, seed=0, address=('127.0.0.1', 0)):
+        HTTPServer.__init__(self, address, _Handler)
+        self.data = data
+        self.api = StandinAPI(data, page_size)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.stats = collections.Counter()
+        self._forced_errors = 0
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self._discovery = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def discovery(self):
+        if self._discovery is None:
+            with open(TEST_DATA_DIR + '/cal_service_discovery.json') as f:
+                doc = json.load(f)
+            doc['rootUrl'] = self.url + '/'
+            doc['baseUrl'] = self.url + doc['basePath']
+            self._discovery = json.dumps(doc).encode('utf-8')
+        return self._discovery
+
+    def fail_next(self, count, code=None):
+        """Force the next `count` API requests to fail."""
+        with self._stats_lock:
+            self._forced_errors = count
+            if code:
+                self.error_code = code
+
+    def injected_error(self):
+        with self._stats_lock:
+            if self._forced_errors:
+                self._forced_errors -= 1
+            elif not self.error_rate or \
+                    self._random.random() >= self.error_rate:
+                return None
+            self.stats['errors'] += 1
+        if self.error_code == 429:
+            return _error(429, 'rateLimitExceeded', 'Too Many Requests')
+        return _error(403, 'rateLimitExceeded', 'Rate Limit Exceeded')
+
+    def count(self, method, path, batched=False):
+        with self._stats_lock:
+            if path.startswith('/discovery/'):
+                self.stats['discovery'] += 1
+            elif batched:
+                self.stats['batched'] += 1
+            else:
+                self.stats['requests'] += 1
+            path = re.sub(r'/events/(?!quickAdd$)[^/]+$', '/events/*', path)
+            path = re.sub(r'/calendars/[^/]+/', '/calendars/*/', path)
+            self.stats['%s %s' % (method, path)] += 1
+
+    def count_bytes(self, count):
+        with self._stats_lock:
+            self.stats['bytes'] += count
+
+    def count_not_modified(self):
+        with self._stats_lock:
+            self.stats['not_modified'] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description='Serve synthetic calendars over a local stand-in for '
+                        'the Google Calendar v3 API')
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--calendars', type=int, default=1)
+    parser.add_argument('--recurrence', type=float, default=0.2)
+    parser.add_argument('--descr-size', type=int, default=0)
+    parser.add_argument('--page-size', type=int, default=250)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-code', type=int, default=403,
+                        choices=(403, 429))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    data = SyntheticCalendars(events=args.events, calendars=args.calendars,
+                              recurrence=args.recurrence,
+                              descr_size=args.descr_size)
+    server = StandinServer(data, page_size=args.page_size,
+                           latency=args.latency, error_rate=args.error_rate,
+                           error_code=args.error_code,
+                           address=(args.host, args.port))
+    print('Serving %d events on %s' % (args.events, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 from gcalcli import colors
-from gcalcli.gcal import GoogleCalendarInterface
-from gcalcli.cli import print_msg, debug_print, get_cal_colors, parse_args
+from gcalcli.gcal import GoogleCalendarInterface, parse_batch_events
+from gcalcli.cli import (print_msg, get_cal_colors, parse_args,
+                         repaint, BufferedOutput, OutputClosed,
+                         cached_command, result_cache_file)
 from apiclient.discovery import HttpMock, build
 import pytest
+import io
 import os
 from json import load
 
@@ -84,12 +87,62 @@ def test_print_msg(capsys):
     assert captured.out == expected
 
 
-@pytest.fixture
-def test_debug_print(capsys):
-    colors.CLR.use_color = True
-    debug_print('test')
-    captured = capsys.readouterr()
-    assert captured == str(colors.CLR_YLW()) + 'test' + str(colors.CLR_NRM())
+def test_buffered_output():
+    r, w = os.pipe()
+    out = BufferedOutput(os.fdopen(w, 'w'), size=10)
+    out.write('12345')
+    out.check()
+    out.write('67890')  # fills the buffer
+    assert os.read(r, 100) == b'1234567890'
+
+    out.write('abc')
+    os.close(r)
+    with pytest.raises(OutputClosed):
+        out.check()
+    with pytest.raises(OutputClosed):
+        out.write('more')
+    out.close()
+
+
+class ResultFlags(object):
+    refresh = False
+    stale_while_revalidate = False
+
+    def __init__(self, config_folder, result_ttl):
+        self.config_folder = config_folder
+        self.result_ttl = result_ttl
+
+    def FlagValuesDict(self):
+        return {'config_folder': self.config_folder, 'result_ttl': 0}
+
+
+def test_result_cache(tmpdir, capsys):
+    flags = ResultFlags(str(tmpdir), 60)
+    args = ['agenda', 'today']
+    calls = []
+
+    def run():
+        calls.append(1)
+        print('output %d' % len(calls))
+
+    def unreachable():
+        raise OSError('network is down')
+
+    cached_command(flags, args, run)
+    cached_command(flags, args, run)
+    assert calls == [1]
+    assert capsys.readouterr().out == 'output 1\noutput 1\n'
+    assert os.path.exists(result_cache_file(flags, args))
+
+    # expired, and the API can't be reached: the old output it is
+    flags.result_ttl = 0
+    cached_command(flags, args, unreachable)
+    assert capsys.readouterr().out == 'output 1\n'
+    with pytest.raises(OSError):
+        cached_command(flags, ['agenda', 'tomorrow'], unreachable)
+
+    cached_command(flags, args, run)
+    assert capsys.readouterr().out == 'output 2\n'
 
 
 def test_get_cal_colors():
@@ -101,3 +154,32 @@ def test_get_cal_colors():
     assert isinstance(reply[test_cal], colors.CLR_RED)
 
     assert no_color_reply == get_cal_colors([test_cal + '#notarealcolorname'])
+
+
+def test_repaint():
+    colors.CLR.use_color = False
+    assert repaint(['a', 'b'], ['a', 'b']) == ''
+    assert repaint(['a', 'b'], ['a', 'c']) == '\033[2;1Hc\033[K'
+    assert repaint(['a', 'b', 'c'], ['a']) == '\033[2;1H\033[J'
+
+
+def test_parse_batch_events():
+    csv_text = ('title,when,duration,who,reminder\n'
+                'Intro,2018-03-05 10:00,60,a@b.com;c@d.com,10;1h email\n'
+                'Lab,2018-03-06 10:00,,,\n')
+    rows, errors = parse_batch_events(io.StringIO(csv_text),
+                                      {'duration': 30, 'reminder': []})
+    assert errors == []
+    assert [r['line'] for r in rows] == [2, 3]
+    assert rows[0]['who'] == ['a@b.com', 'c@d.com']
+    assert rows[0]['reminder'] == ['10', '1h email']
+    assert rows[1]['end'].startswith('2018-03-06T10:30')
+
+    jsonl = ('{"title": "x", "when": "2018-03-05", "duration": 2, '
+             '"allday": true}\n'
+             '{"title": "y", "when": "garbage", "duration": 5}\n'
+             '{"title": "z", "when": "2018-03-05", "duration": 5, '
+             '"reminder": ["soon"]}\n')
+    rows, errors = parse_batch_events(io.StringIO(jsonl), {})
+    assert rows[0]['start'] == '2018-03-05' and rows[0]['end'] == '2018-03-07'
+    assert [e.split(':')[0] for e in errors] == ['line 2', 'line 3']
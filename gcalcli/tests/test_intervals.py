@@ -0,0 +1,103 @@
+from gcalcli.intervals import (IntervalIndex, UsageTotals, free_slots,
+                               interval_union, overlapping_pairs)
+from datetime import datetime, timedelta
+import random
+
+BASE = datetime(2018, 1, 1)
+CAL = {'id': 'cal'}
+
+
+def make_event(n, start, hours):
+    s = BASE + timedelta(hours=start)
+    return {'id': str(n), 'gcalcli_cal': CAL, 's': s,
+            'e': s + timedelta(hours=hours)}
+
+
+def overlapping(events, start, end):
+    return [e for e in sorted(events, key=lambda x: x['s'])
+            if e['s'] < end and (e['e'] > start or e['s'] >= start)]
+
+
+def test_overlapping():
+    rnd = random.Random(1)
+    events = [make_event(n, rnd.randrange(1000), rnd.choice([0, 1, 2, 72]))
+              for n in range(500)]
+    index = IntervalIndex(events)
+    assert len(index) == 500
+    assert list(index) == sorted(events, key=lambda x: x['s'])
+
+    for _ in range(100):
+        start = BASE + timedelta(hours=rnd.randrange(1000))
+        end = start + timedelta(hours=rnd.randrange(1, 48))
+        assert index.overlapping(start, end) == \
+            overlapping(events, start, end)
+        assert index.starting(start, end) == \
+            [e for e in overlapping(events, start, end) if e['s'] >= start]
+
+    assert index.overlapping() == list(index)
+
+
+def test_updates():
+    events = [make_event(n, n, 1) for n in range(10)]
+    index = IntervalIndex(events)
+
+    index.discard(('cal', '3'))
+    index.discard(('cal', 'missing'))
+    moved = make_event(5, 100, 1)
+    index.add(moved)
+    index.add(make_event(10, 4, 2))
+
+    assert len(index) == 10
+    assert [e['id'] for e in index] == \
+        ['0', '1', '2', '4', '10', '6', '7', '8', '9', '5']
+    window = (BASE + timedelta(hours=4, minutes=30),
+              BASE + timedelta(hours=6))
+    assert [e['id'] for e in index.overlapping(*window)] == ['4', '10']
+    assert moved in index
+
+
+def test_overlapping_pairs():
+    rnd = random.Random(2)
+    events = sorted([make_event(n, rnd.randrange(200), rnd.choice([0, 1, 3]))
+                     for n in range(300)], key=lambda x: x['s'])
+    expected = set()
+    for i, a in enumerate(events):
+        for b in events[i + 1:]:
+            if a['s'] < b['e'] and b['s'] < a['e'] and \
+                    a['s'] < a['e'] and b['s'] < b['e']:
+                expected.add((a['id'], b['id']))
+
+    pairs = list(overlapping_pairs(events))
+    assert set((a['id'], b['id']) for a, b in pairs) == expected
+    assert len(pairs) == len(expected)
+    assert all(a['s'] <= b['s'] for a, b in pairs)
+
+
+def test_interval_union():
+    assert list(interval_union([])) == []
+    assert list(interval_union([(1, 3), (2, 4), (4, 5), (7, 8), (7, 9)])) == \
+        [(1, 5), (7, 9)]
+    assert list(interval_union([(1, 10), (2, 3), (4, 5)])) == [(1, 10)]
+
+
+def test_free_slots():
+    busy = [(9, 10), (10, 11), (12, 14), (16, 20), (33, 40)]
+    windows = [(8, 17), (32, 41), (56, 65)]
+    assert list(free_slots(busy, windows, 1)) == \
+        [(8, 9), (11, 12), (14, 16), (32, 33), (40, 41), (56, 65)]
+    assert list(free_slots(busy, windows, 2)) == [(14, 16), (56, 65)]
+    assert list(free_slots([(0, 100)], windows, 1)) == []
+
+
+def test_usage_totals():
+    totals = UsageTotals()
+    for key, start, end in [('a', 1, 3), ('b', 1, 2), ('a', 2, 4),
+                            ('a', 6, 7), ('b', 5, 6), ('a', 6, 6)]:
+        totals.add(key, start, end)
+    totals.add('a', 0, 24, allday=True)
+    usage = dict(totals.items())
+    assert list(usage) == ['a', 'b']
+    assert (usage['a'].events, usage['a'].summed, usage['a'].union,
+            usage['a'].allday) == (5, 5, 4, 24)
+    assert (usage['b'].events, usage['b'].summed, usage['b'].union) == \
+        (2, 2, 2)
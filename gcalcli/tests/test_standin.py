@@ -0,0 +1,837 @@
+from gcalcli import colors, gcal, trace
+from gcalcli.gcal import GoogleCalendarInterface, parse_batch_events
+from gcalcli.intervals import interval_union
+from gcalcli.tests.standin import (RARE_SUMMARY, StandinServer,
+                                   SyntheticCalendars)
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from dateutil.parser import parse
+import io
+import json
+import pytest
+
+
+@pytest.fixture
+def standin():
+    data = SyntheticCalendars(events=300, calendars=2, descr_size=40)
+    with StandinServer(data, page_size=25) as server:
+        yield server
+
+
+@pytest.fixture
+def gcal_standin(standin, monkeypatch):
+    monkeypatch.setattr(gcal.time, 'sleep', lambda secs: None)
+    return GoogleCalendarInterface(use_cache=False, api_endpoint=standin.url)
+
+
+def test_calendar_list(gcal_standin):
+    assert [c['summary'] for c in gcal_standin.all_cals] == \
+        ['Synthetic 0', 'Synthetic 1']
+
+
+def test_pagination(gcal_standin, standin):
+    gcal_standin.fetchThreads = 1
+    events = gcal_standin._search_for_cal_events(None, None, None)
+    assert len(events) == 300
+    assert events == sorted(events, key=lambda e: e['s'])
+    # one request per page of 25, per calendar
+    pages = sum((len(store) + 24) // 25
+                for store in standin.data.stores.values())
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == pages
+
+
+@pytest.mark.parametrize('window', [
+    (None, None),
+    ('2018-02-10T00:00:00Z', None),
+    ('2018-02-10T00:00:00Z', '2018-11-20T00:00:00Z')])
+def test_sharded_fetch(gcal_standin, standin, window):
+    start, end = [parse(w) if w else None for w in window]
+    gcal_standin.fetchThreads = 1
+    sequential = gcal_standin._search_for_cal_events(start, end, None)
+    requests = standin.stats['requests']
+
+    gcal_standin.fetchThreads = 4
+    sharded = gcal_standin._search_for_cal_events(start, end, None)
+    assert [e['id'] for e in sharded] == [e['id'] for e in sequential]
+    # a probe per calendar, then shards
+    assert standin.stats['requests'] - requests > len(gcal_standin.cals)
+
+
+def test_search_window(gcal_standin):
+    start = parse('2018-03-01T00:00:00Z')
+    end = parse('2018-04-01T00:00:00Z')
+    events = gcal_standin._search_for_cal_events(start, end, RARE_SUMMARY)
+    assert all(e['summary'] == RARE_SUMMARY for e in events)
+    assert all(e['e'] > start and e['s'] < end for e in events)
+
+
+def test_agenda(gcal_standin, capsys):
+    colors.CLR.use_color = False
+    gcal_standin.agenda_query('2018-03-01', '2018-03-08')
+    captured = capsys.readouterr()
+    assert 'No Events Found' not in captured.out
+    assert 'Mar 0' in captured.out
+
+
+def test_rate_limit_retry(gcal_standin, standin):
+    for code in (403, 429):
+        standin.fail_next(2, code)
+        events = gcal_standin._search_for_cal_events(None, None, None)
+        assert len(events) == 300
+    assert standin.stats['errors'] == 4
+
+
+def test_batch_insert(gcal_standin, standin):
+    results = []
+    service = gcal_standin._cal_service()
+    batch = service.new_batch_http_request(
+            callback=lambda req_id, resp, exc: results.append((resp, exc)))
+    for n in range(3):
+        batch.add(service.events().insert(
+            calendarId='cal0@standin.gcalcli',
+            body={'summary': 'batched %d' % n,
+                  'start': {'dateTime': '2018-05-01T10:00:00Z'},
+                  'end': {'dateTime': '2018-05-01T11:00:00Z'}}))
+    batch.execute()
+
+    assert [r['summary'] for r, e in results] == \
+        ['batched 0', 'batched 1', 'batched 2']
+    assert standin.stats['batched'] == 3
+
+
+def test_watch_sync(gcal_standin, standin):
+    start = parse('2018-03-01T00:00:00Z')
+    end = parse('2018-03-08T00:00:00Z')
+    state = {}
+    first = gcal_standin._sync_cal_events(state, start, end)
+    assert first
+
+    service = gcal_standin._cal_service()
+    service.events().patch(calendarId=first[0]['gcalcli_cal']['id'],
+                           eventId=first[0]['id'],
+                           body={'summary': 'renamed'}).execute()
+    service.events().delete(calendarId=first[1]['gcalcli_cal']['id'],
+                            eventId=first[1]['id']).execute()
+
+    requests = standin.stats['GET /calendar/v3/calendars/*/events']
+    second = gcal_standin._sync_cal_events(state, start, end)
+    ids = [e['id'] for e in second]
+    assert len(second) == len(first) - 1
+    assert first[1]['id'] not in ids
+    assert second[ids.index(first[0]['id'])]['summary'] == 'renamed'
+    # one small request per calendar rather than the full page chain
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == \
+        requests + len(gcal_standin.cals)
+
+
+def test_watch_frame(gcal_standin):
+    colors.CLR.use_color = False
+    state = {}
+    lines = gcal_standin._watch_frame('calw', state, start_text='2018-03-05')
+    assert len(lines) > 5
+    assert lines == gcal_standin._watch_frame('calw', state,
+                                              start_text='2018-03-05')
+
+
+def test_add_events_batch(gcal_standin, standin, capsys):
+    gcal_standin.cals = [gcal_standin.cals[0]]
+    gcal_standin.batchSize = 4
+    lines = ['title\twhen\tduration'] + [
+        'Session %d\t2018-06-%02d 09:00\t45' % (n, n + 1) for n in range(10)]
+    rows, errors = parse_batch_events(io.StringIO('\n'.join(lines)), {})
+    assert not errors
+
+    store = standin.data.stores['cal0@standin.gcalcli']
+    before = len(store)
+    standin.fail_next(1)
+    assert gcal_standin.add_events(rows) == 0
+    out = capsys.readouterr().out
+    assert out.endswith('10 added, 0 failed\n')
+    assert 'line 11: added "Session 9"' in out
+    # 10 rows in batches of 4, one batch retried after the injected 403
+    assert standin.stats['POST /batch/calendar/v3'] == 4
+    assert standin.stats['batched'] == 10
+    assert len(store) == before + 10
+
+
+def test_limit(gcal_standin, standin):
+    everything = gcal_standin._search_for_cal_events(None, None, None)
+    requests = standin.stats['GET /calendar/v3/calendars/*/events']
+
+    events = gcal_standin._search_for_cal_events(None, None, None, limit=5)
+    assert [e['id'] for e in events] == [e['id'] for e in everything[:5]]
+    # the first page of each calendar already holds the answer
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == \
+        requests + len(gcal_standin.cals)
+
+
+def test_prefetch(gcal_standin, standin):
+    cal = gcal_standin.cals[0]
+    pages = []
+    for prefetch in (False, True):
+        first = gcal_standin._list_events(cal, None, None, None).execute()
+        pages.append([e['id'] for e in gcal_standin._iter_events(
+            cal, first, None, prefetch=prefetch)])
+    assert pages[0] == pages[1]
+    assert len(pages[0]) == len(standin.data.stores[cal['id']])
+
+    # paging in sequence still fetches the next page while parsing one
+    gcal_standin.fetchThreads = 1
+    gcal_standin._prefetcher = None
+    events = gcal_standin._search_for_cal_events(None, None, None)
+    assert len(events) == 300
+    assert gcal_standin._prefetcher is not None
+
+
+def test_tsv_keeps_declined(gcal_standin, capsys):
+    cal = gcal_standin.cals[0]
+    gcal_standin._cal_service().events().insert(calendarId=cal['id'], body={
+        'summary': 'Turned down',
+        'start': {'dateTime': '2018-03-01T10:00:00Z'},
+        'end': {'dateTime': '2018-03-01T11:00:00Z'},
+        'attendees': [{'email': cal['id'],
+                       'responseStatus': 'declined'}]}).execute()
+    colors.CLR.use_color = False
+    gcal_standin.ignoreDeclined = True
+    gcal_standin.agenda_query('2018-03-01', '2018-03-02')
+    assert 'Turned down' not in capsys.readouterr().out
+
+    gcal_standin.tsv = True
+    gcal_standin.agenda_query('2018-03-01', '2018-03-02')
+    assert '\tTurned down\n' in capsys.readouterr().out
+
+    # the rest still leave declined events out, whatever the output
+    assert 'Turned down' not in [e['summary'] for e in gcal_standin.events(
+        '2018-03-01', '2018-03-02')]
+    gcal_standin._cal_service().events().insert(
+        calendarId=gcal_standin.cals[1]['id'], body={
+            'summary': 'Clash',
+            'start': {'dateTime': '2018-03-01T10:30:00Z'},
+            'end': {'dateTime': '2018-03-01T11:30:00Z'}}).execute()
+    pairs = gcal_standin.conflicts('2018-03-01', '2018-03-02')
+    assert 'Turned down' not in [e['summary'] for pair in pairs
+                                 for e in pair]
+    gcal_standin.ignoreDeclined = False
+    pairs = gcal_standin.conflicts('2018-03-01', '2018-03-02')
+    assert ('Turned down', 'Clash') in [(a['summary'], b['summary'])
+                                        for a, b in pairs]
+
+
+def test_instances_independent(gcal_standin, standin):
+    other = GoogleCalendarInterface(cal_names=['Synthetic 1'],
+                                    cal_name_colors=[None],
+                                    use_cache=False, api_endpoint=standin.url)
+    assert [c['summary'] for c in other.cals] == ['Synthetic 1']
+    assert len(gcal_standin.cals) == 2
+    other.all_cals.pop()
+    assert len(gcal_standin.all_cals) == 2
+
+
+def test_concurrent_queries(gcal_standin, capsys):
+    colors.CLR.use_color = False
+    windows = [('2018-03-%02d' % d, '2018-03-%02d' % (d + 3))
+               for d in range(1, 25, 3)]
+
+    def query(window):
+        return [e['id'] for e in gcal_standin._search_for_cal_events(
+            parse(window[0] + 'T00:00:00Z'), parse(window[1] + 'T00:00:00Z'),
+            None)]
+
+    sequential = [query(w) for w in windows]
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(query, windows)) == sequential
+
+    gcal_standin.agenda_query('2018-03-01', '2018-03-08')
+    assert gcal_standin._local.now is None
+
+
+def test_events_iterator(gcal_standin, standin):
+    start = parse('2018-02-01T00:00:00Z')
+    expected = gcal_standin._search_for_cal_events(start, None, None)
+
+    gcal_standin.fetchThreads = 1
+    requests = standin.stats['GET /calendar/v3/calendars/*/events']
+    events = gcal_standin.events(start)
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == requests
+
+    first = next(events)
+    assert first['gcalcli_cal'] in gcal_standin.cals
+    assert first['s'] <= first['e']
+    # only the first page of each calendar so far
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == \
+        requests + len(gcal_standin.cals)
+    assert [first['id']] + [e['id'] for e in events] == \
+        [e['id'] for e in expected]
+
+    assert all(e['summary'] == RARE_SUMMARY
+               for e in gcal_standin.search_events(RARE_SUMMARY))
+    with pytest.raises(ValueError):
+        gcal_standin.events('not a date at all')
+
+
+def test_etags(standin, tmpdir):
+    def search():
+        gcal = GoogleCalendarInterface(config_folder=str(tmpdir),
+                                       api_endpoint=standin.url, gzip=False)
+        return gcal, [e['id'] for e in gcal.events('2018-03-01')]
+
+    first, expected = search()
+    assert first.etag_stats['not_modified'] == 0
+    bytes_sent = standin.stats['bytes']
+
+    again, events = search()
+    assert events == expected
+    assert again.etag_stats['not_modified'] == \
+        again.etag_stats['modified'] + again.etag_stats['not_modified']
+    assert standin.stats['not_modified'] == again.etag_stats['not_modified']
+    # nothing but the discovery document the second time
+    assert standin.stats['bytes'] - bytes_sent == len(standin.discovery())
+    assert '100%' in again.etag_report()
+
+
+def test_gzip(standin):
+    sizes = []
+    results = []
+    for gzip in (False, True):
+        before = standin.stats['bytes']
+        gcal = GoogleCalendarInterface(use_cache=False, gzip=gzip,
+                                       api_endpoint=standin.url)
+        results.append([e['description'] for e in gcal.events()])
+        sizes.append(standin.stats['bytes'] - before)
+    assert results[0] == results[1]
+    assert sizes[1] * 3 < sizes[0]
+
+
+def test_conflicts(gcal_standin, capsys):
+    start = parse('2018-03-05T00:00:00Z')
+    end = parse('2018-03-12T00:00:00Z')
+    service = gcal_standin._cal_service()
+    for cal, summary in (('cal0', 'Room booking'), ('cal1', 'Dentist')):
+        service.events().insert(
+            calendarId='%s@standin.gcalcli' % cal,
+            body={'summary': summary,
+                  'start': {'dateTime': '2018-03-07T23:00:00Z'},
+                  'end': {'dateTime': '2018-03-08T00:30:00Z'}}).execute()
+    service.events().insert(
+        calendarId='cal0@standin.gcalcli',
+        body={'summary': 'Holiday', 'start': {'date': '2018-03-07'},
+              'end': {'date': '2018-03-09'}}).execute()
+
+    events = [e for e in gcal_standin._search_for_cal_events(start, end, None)
+              if 'date' not in e['start']]
+    expected = set()
+    for i, a in enumerate(events):
+        for b in events[i + 1:]:
+            if a['s'] < b['e'] and b['s'] < a['e']:
+                expected.add(frozenset([a['id'], b['id']]))
+
+    pairs = gcal_standin.conflicts(start, end)
+    found = set(frozenset([a['id'], b['id']]) for a, b in pairs)
+    assert found == expected
+    assert ('Room booking', 'Dentist') in \
+        [(a['summary'], b['summary']) for a, b in pairs]
+    assert 'Holiday' not in [e['summary'] for pair in pairs for e in pair]
+
+    gcal_standin.tsv = True
+    gcal_standin.conflicts_query(start.isoformat(), end.isoformat())
+    booking = [a for a, b in pairs if a['summary'] == 'Room booking'][0]
+    assert '%s\t%s\tRoom booking\tSynthetic 0\tDentist\tSynthetic 1\n' % (
+        booking['s'].strftime('%Y-%m-%d\t%H:%M'),
+        booking['e'].strftime('%Y-%m-%d\t%H:%M')) in capsys.readouterr().out
+
+
+def test_find_time(monkeypatch, capsys):
+    data = SyntheticCalendars(events=300, calendars=4, descr_size=40,
+                              roles=('owner', 'freeBusyReader'))
+    with StandinServer(data, page_size=25) as server:
+        monkeypatch.setattr(gcal.time, 'sleep', lambda secs: None)
+        gcal_standin = GoogleCalendarInterface(use_cache=False,
+                                               api_endpoint=server.url)
+        start = parse('2018-03-05T00:00:00Z')
+        end = parse('2018-03-19T00:00:00Z')
+        busy = [e for e in gcal_standin._search_for_cal_events(start, end,
+                                                               None)
+                if e.get('transparency') != 'transparent']
+
+        duration = timedelta(minutes=45)
+        slots = list(gcal_standin.find_time(start, end, duration,
+                                            weekends=True))
+        assert slots
+        assert server.stats['POST /calendar/v3/freeBusy'] == 1
+        for slot_start, slot_end in slots:
+            assert slot_end - slot_start >= duration
+            assert start <= slot_start and slot_end <= end
+            assert not [e for e in busy
+                        if e['s'] < slot_end and slot_start < e['e']]
+        assert slots == sorted(slots)
+
+        gcal_standin.tsv = True
+        gcal_standin.findtime_query(start.isoformat(), end.isoformat(), 45,
+                                    count=3, weekends=True)
+        lines = capsys.readouterr().out.splitlines()
+        assert lines == ['\t'.join([s.strftime('%Y-%m-%d\t%H:%M'),
+                                    e.strftime('%Y-%m-%d\t%H:%M')])
+                         for s, e in slots[:3]]
+
+
+def test_stats(gcal_standin, capsys):
+    start = parse('2018-03-01T00:00:00Z')
+    end = parse('2018-04-01T00:00:00Z')
+    events = [e for e in gcal_standin._search_for_cal_events(start, end, None)
+              if 'date' not in e['start']]
+    spans = [(max(e['s'], start), min(e['e'], end)) for e in events]
+    summed = sum((e - s for s, e in spans), timedelta(0))
+    busy = sum((e - s for s, e in interval_union(sorted(spans))),
+               timedelta(0))
+
+    for by in gcal_standin.STATS_BY:
+        rows, total = gcal_standin.stats(start, end, by)
+        assert total.summed == summed
+        assert total.union == busy
+        if by != 'attendee':
+            assert sum((u.summed for k, u in rows), timedelta(0)) == summed
+            assert sum((u.union for k, u in rows), timedelta(0)) >= \
+                total.union
+
+    rows, total = gcal_standin.stats(start, end, 'calendar')
+    assert [k for k, u in rows] == sorted(
+        ['Synthetic 0', 'Synthetic 1'],
+        key=lambda k: -dict(rows)[k].summed)
+
+    gcal_standin.tsv = True
+    gcal_standin.stats_query(start.isoformat(), end.isoformat(), 'day')
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split('\t')[0] for line in lines] == \
+        [str(k) for k, u in gcal_standin.stats(start, end, 'day')[0]]
+
+
+def test_caly(gcal_standin, capsys, monkeypatch):
+    colors.CLR.use_color = False
+    monkeypatch.setattr(gcal.ART, 'useArt', False)
+    start, end, weeks = gcal_standin._year_window('2018-01-01')
+    assert start <= parse('2018-01-01T00:00:00Z') < start + timedelta(days=7)
+    assert weeks in (53, 54)
+    # a year on from a leap day
+    leap = gcal_standin._year_window('2024-02-29')
+    assert leap[1] - timedelta(days=7) < parse('2025-02-28T00:00:00Z') <= \
+        leap[1]
+    events = gcal_standin._search_for_cal_events(start, end, None)
+
+    counts = gcal_standin._day_counts(
+        int(gcal.days_since_epoch(start)), weeks * 7, events)
+    for n, count in enumerate(counts[:60]):
+        day = start + timedelta(days=n)
+        assert count == len([e for e in events if e['s'] < day +
+                             timedelta(days=1) and
+                             (e['e'] > day or e['s'] >= day)])
+
+    gcal_standin.caly_query('2018-01-01')
+    lines = capsys.readouterr().out.strip('\n').split('\n')
+    assert lines[1].startswith('|2018|Jan')
+    assert len(lines) == 12
+    grid = [line[6:-1] for line in lines[3:10]]
+    assert all(len(row) == weeks for row in grid)
+    assert ''.join(grid).strip(gcal_standin.HEAT) == ''
+    assert '#' in ''.join(grid)
+    assert 'busiest day: %d events' % max(counts) in lines[-1]
+
+
+def test_details_cache(gcal_standin, monkeypatch):
+    colors.CLR.use_color = False
+    gcal_standin.detail_descr = True
+    gcal_standin.detail_length = True
+    rendered = []
+    descr_detail = gcal_standin._descr_detail
+    monkeypatch.setattr(gcal_standin, '_descr_detail',
+                        lambda event: rendered.append(event['id']) or
+                        descr_detail(event))
+
+    state = {}
+    window = dict(start_text='2018-03-01', end_text='2018-03-08')
+    first = gcal_standin._watch_frame('agenda', state, **window)
+    assert 'Description:' in '\n'.join(first)
+    count = len(rendered)
+    assert count
+
+    event = state['events'].overlapping()[0]
+    gcal_standin._cal_service().events().patch(
+        calendarId=event['gcalcli_cal']['id'], eventId=event['id'],
+        body={'description': 'changed'}).execute()
+    second = gcal_standin._watch_frame('agenda', state, **window)
+    # only the changed event is rendered again
+    assert rendered[count:] == [event['id']]
+    assert ' changed ' in '\n'.join(second)
+
+    gcal_standin.detail_descr_width = 60
+    gcal_standin._watch_frame('agenda', state, **window)
+    assert len(rendered) == 2 * count + 1
+
+    # only the blocks drawn last are kept
+    monkeypatch.setattr(gcal_standin, 'DETAILS_CACHED', count // 2)
+    gcal_standin._watch_frame('agenda', state, start_text='2018-04-01',
+                              end_text='2018-04-08')
+    blocks = gcal_standin._details[2]
+    assert len(blocks) == count // 2
+    assert set(blocks) <= set((e['gcalcli_cal']['id'], e['id'])
+                              for e in state['events'].overlapping())
+
+
+def test_edit_details(gcal_standin, monkeypatch, capsys):
+    colors.CLR.use_color = False
+    gcal_standin.detail_location = True
+    cal = gcal_standin.cals[0]
+    gcal_standin._cal_service().events().insert(calendarId=cal['id'], body={
+        'summary': 'Offsite', 'location': 'Room A',
+        'start': {'dateTime': '2018-03-01T10:00:00Z'},
+        'end': {'dateTime': '2018-03-01T11:00:00Z'}}).execute()
+    event = list(gcal_standin.search_events('Offsite', '2018-03-01',
+                                            '2018-03-02'))[0]
+    gcal_standin._print_event(event, '')
+    assert 'Location: Room A' in capsys.readouterr().out
+
+    answers = iter(['l', 'Room B', 'n'])
+    monkeypatch.setattr('builtins.input', lambda: next(answers))
+    gcal_standin._edit_event(event)
+    out = capsys.readouterr().out
+    assert 'Location: Room B' in out
+    assert 'Room A' not in out
+
+
+def test_fast_json(gcal_standin, standin):
+    model = gcal.FastJsonModel()
+    assert model.deserialize(b'{"a": [1, "\\u00e9"]}') == {'a': [1, u'\xe9']}
+    assert model.deserialize(b'not json') == 'not json'
+    assert gcal.FastJsonModel(json.loads).deserialize('{}') == {}
+
+    start = parse('2018-03-01T00:00:00Z')
+    end = parse('2018-04-01T00:00:00Z')
+    full = gcal_standin._search_for_cal_events(start, end, None)
+    bytes_sent = standin.stats['bytes']
+
+    gcal_standin.event_fields = gcal_standin.LEAN_EVENT_FIELDS
+    lean = gcal_standin._search_for_cal_events(start, end, None)
+    assert [e['id'] for e in lean] == [e['id'] for e in full]
+    assert [(e['s'], e['e'], e['summary']) for e in lean] == \
+        [(e['s'], e['e'], e['summary']) for e in full]
+    assert 'description' not in lean[0] and 'description' in full[0]
+    assert standin.stats['bytes'] - bytes_sent < bytes_sent
+
+
+def test_shared_windows(gcal_standin, standin):
+    windows = {}
+    first = GoogleCalendarInterface(use_cache=False, api_endpoint=standin.url,
+                                    window_cache=windows)
+    march = (parse('2018-03-01T00:00:00Z'), parse('2018-04-01T00:00:00Z'))
+    first._search_for_cal_events(march[0], march[1], None)
+    requests = standin.stats['requests']
+
+    other = GoogleCalendarInterface(cal_names=['Synthetic 1'],
+                                    cal_name_colors=['red'], session=first,
+                                    window_cache=windows)
+    assert other.cal_service is first.cal_service
+    assert standin.stats['requests'] == requests
+    # inside what was fetched: nothing more to fetch
+    window = (parse('2018-03-10T12:00:00Z'), parse('2018-03-20T00:00:00Z'))
+    events = other._search_for_cal_events(window[0], window[1], None)
+    assert standin.stats['requests'] == requests
+    expected = gcal_standin._search_for_cal_events(window[0], window[1],
+                                                   None)
+    assert [e['id'] for e in events] == \
+        [e['id'] for e in expected
+         if e['gcalcli_cal']['summary'] == 'Synthetic 1']
+    assert all(e['gcalcli_cal']['colorSpec'] == 'red' for e in events)
+    assert 'colorSpec' not in first.cals[1]
+
+    # partly outside: only the rest of the window is fetched
+    window = (parse('2018-03-25T00:00:00Z'), parse('2018-04-05T00:00:00Z'))
+    requests = standin.stats['requests']
+    events = first._search_for_cal_events(window[0], window[1], None)
+    assert standin.stats['requests'] - requests == len(first.cals)
+    assert [e['id'] for e in events] == \
+        [e['id'] for e in gcal_standin._search_for_cal_events(
+            window[0], window[1], None)]
+
+
+def test_batch_command(standin, tmpdir, monkeypatch, capsys):
+    from gcalcli import cli
+    monkeypatch.setenv('HOME', str(tmpdir))
+    monkeypatch.setattr(colors.CLR, 'use_color', True)
+    monkeypatch.setattr(gcal.ART, 'useArt', True)
+    lines = tmpdir.join('commands')
+    lines.write('agenda 2018-03-01 2018-03-08\n'
+                '# a comment\n\n'
+                'agenda 2018-03-02 2018-03-05 --calendar "Synthetic 1"\n'
+                'nonsense\n')
+    argv = ['gcalcli', '--api_endpoint', standin.url, '--nocache',
+            '--nocolor', 'batch', str(lines)]
+    with pytest.raises(SystemExit) as exit:
+        cli.run_batch(['batch', str(lines)], argv)
+    assert exit.value.code == 1
+    out = capsys.readouterr().out
+    headers = [line for line in out.splitlines() if line.startswith('==>')]
+    assert headers == ['==> agenda 2018-03-01 2018-03-08 <==',
+                       '==> agenda 2018-03-02 2018-03-05 --calendar '
+                       '"Synthetic 1" <==',
+                       '==> nonsense <==']
+    assert 'nonsense is an invalid command' in out
+    # the second agenda's window was fetched for the first
+    assert standin.stats['GET /calendar/v3/calendars/*/events'] == 2
+
+
+def test_batch_revalidate(standin, tmpdir, monkeypatch, capsys):
+    from gcalcli import cli
+    monkeypatch.setenv('HOME', str(tmpdir))
+    monkeypatch.delenv(cli.REVALIDATING, raising=False)
+    rerun = []
+    monkeypatch.setattr(cli.subprocess, 'Popen',
+                        lambda cmd, **kwargs: rerun.append(cmd))
+    lines = tmpdir.join('commands')
+    lines.write('agenda 2018-03-01 2018-03-08\n'
+                'agenda 2018-03-02 2018-03-05 --calendar "Synthetic 1"\n')
+    argv = ['gcalcli', '--api_endpoint', standin.url, '--nocache',
+            '--nocolor', '--result_ttl', '0', '--stale_while_revalidate',
+            'batch', str(lines)]
+    cli.run_batch(['batch', str(lines)], argv)
+    first = capsys.readouterr().out
+    assert not rerun
+
+    # each stale line is refreshed by rerunning it alone
+    cli.run_batch(['batch', str(lines)], argv)
+    assert capsys.readouterr().out == first
+    options = ['--api_endpoint', standin.url, '--nocache', '--nocolor',
+               '--result_ttl', '0', '--stale_while_revalidate']
+    assert [cmd[3:] for cmd in rerun] == [
+        options + ['agenda', '2018-03-01', '2018-03-08'],
+        options + ['agenda', '2018-03-02', '2018-03-05', '--calendar',
+                   'Synthetic 1']]
+
+
+def test_bench(gcal_standin, monkeypatch, capsys):
+    monkeypatch.setattr(gcal_standin, 'BENCH_PAGE_SIZES', [10, 100])
+    monkeypatch.setattr(gcal_standin, 'BENCH_THREADS', [1, 4])
+    results = list(gcal_standin.bench(8))
+    assert [r[:3] for r in results] == [
+        ('discovery', None, None), ('calendarList', None, 1),
+        ('events', 10, 1), ('events', 10, 4),
+        ('events', 100, 1), ('events', 100, 4)]
+    for phase, size, threads, latencies, throttled, items, wall in results:
+        assert len(latencies) == (8 if phase == 'events' else 5)
+        assert throttled == 0
+    assert [r[5] for r in results[2:]] == [80, 80, 800, 800]
+
+    gcal_standin.bench_query(8)
+    out = capsys.readouterr().out
+    assert 'Recommended: --page_size 100 --fetch_threads ' in out
+
+
+def test_bench_throttled(monkeypatch):
+    monkeypatch.setattr(gcal.time, 'sleep', lambda secs: None)
+    data = SyntheticCalendars(events=100, calendars=2)
+    with StandinServer(data, error_rate=0.5, error_code=429) as server:
+        gci = GoogleCalendarInterface(use_cache=False,
+                                      api_endpoint=server.url)
+        gci.BENCH_PAGE_SIZES = [50]
+        gci.BENCH_THREADS = [2]
+        phase, _, _, latencies, throttled, items, _ = list(gci.bench(40))[-1]
+    assert 0 < throttled < len(latencies)
+    assert gci._bench_choice([(phase, 50, 2, latencies, throttled, items,
+                               1.0)]) is None
+
+
+def test_record_replay(tmpdir):
+    from gcalcli.recording import Recorder, Replayer, ReplayError
+    folder = str(tmpdir.join('recording'))
+    data = SyntheticCalendars(events=300, calendars=2, descr_size=40)
+    with StandinServer(data, page_size=25) as server:
+        gci = GoogleCalendarInterface(use_cache=False,
+                                      api_endpoint=server.url,
+                                      transport=Recorder(folder))
+        recorded = list(gci.agenda_events('2018-03-01', '2018-03-08'))
+        requests = server.stats['requests']
+    assert recorded
+
+    # the server is gone: everything comes from the recording
+    gci = GoogleCalendarInterface(use_cache=False, api_endpoint=server.url,
+                                  transport=Replayer(folder))
+    replayed = list(gci.agenda_events('2018-03-01', '2018-03-08'))
+    assert [(e['id'], e['s']) for e in replayed] == \
+        [(e['id'], e['s']) for e in recorded]
+    with open(tmpdir.join('recording', 'exchanges.jsonl').strpath) as f:
+        # and the discovery document
+        assert len(f.readlines()) == requests + 1
+    with pytest.raises(ReplayError):
+        list(gci.search_events('nothing like this was recorded'))
+
+
+def test_recording_redacted(tmpdir):
+    from gcalcli.recording import Recorder, Replayer
+    import httplib2
+    folder = str(tmpdir)
+    recorder = Recorder(folder)
+    recorder.add('https://oauth2.googleapis.com/token?key=abc', 'POST',
+                 'refresh_token=hush1&client_secret=hush2&grant=x',
+                 {'Authorization': 'Bearer hush3', 'user-agent': 'x'},
+                 httplib2.Response({'status': '200'}),
+                 b'{"access_token": "hush4", "expires_in": 3600}', 0.1)
+    with open(tmpdir.join('exchanges.jsonl').strpath) as f:
+        text = f.read()
+    assert "hush" not in text and 'abc' not in text
+    assert 'grant=x' in text and '3600' in text
+
+    # and the request still finds its response
+    response, content = Replayer(folder).response(
+        'https://oauth2.googleapis.com/token?key=other', 'POST',
+        'refresh_token=other&client_secret=other&grant=x')
+    assert response.status == 200
+    assert json.loads(content.decode('utf-8'))['expires_in'] == 3600
+
+
+def test_memprofile(standin, tmpdir):
+    from gcalcli.memprofile import MemoryProfile
+    import tracemalloc
+    profile = MemoryProfile(str(tmpdir), top=5)
+    try:
+        gci = GoogleCalendarInterface(use_cache=False,
+                                      api_endpoint=standin.url,
+                                      memprofile=profile)
+        events = gci._search_for_cal_events(parse('2018-01-01T00:00:00Z'),
+                                            parse('2019-01-01T00:00:00Z'),
+                                            None)
+        profile.phase('render')
+    finally:
+        profile.stop()
+
+    assert [p[0] for p in profile.phases] == ['fetch', 'render']
+    name, current, peak, sites = profile.phases[0]
+    assert 0 < current <= peak
+    assert 0 < len(sites) <= 5
+    # the events are kept, so fetching grew memory
+    assert sum(size for site, size in sites) > len(events) * 100
+
+    out = io.StringIO()
+    profile.report(out)
+    assert out.getvalue().startswith('fetch: ')
+    assert 'gcalcli/gcal.py:' in out.getvalue()
+    snapshot = tracemalloc.Snapshot.load(
+        tmpdir.join('01-fetch.snapshot').strpath)
+    assert snapshot.traces
+
+    # streamed, fetch is marked once the stream is done
+    profile = MemoryProfile(top=5)
+    try:
+        gci.memprofile = profile
+        gci.fetchThreads = 1
+        assert list(gci.events('2018-01-01', '2018-02-01'))
+        assert len(list(gci.events('2018-01-01', limit=3))) == 3
+    finally:
+        profile.stop()
+    assert [p[0] for p in profile.phases] == ['fetch', 'fetch']
+
+
+def test_plan(monkeypatch, tmpdir):
+    data = SyntheticCalendars(events=300, calendars=4, descr_size=40,
+                              roles=('owner', 'freeBusyReader'))
+    with StandinServer(data, page_size=25) as server:
+        monkeypatch.setattr(gcal.time, 'sleep', lambda secs: None)
+        # both patterns match Synthetic 1
+        gci = GoogleCalendarInterface(
+            cal_names=['Synthetic [01]', 'Synthetic 1'],
+            cal_name_colors=[None, None], use_cache=False,
+            api_endpoint=server.url, window_cache={})
+        assert [c['summary'] for c in gci.cals] == \
+            ['Synthetic 0', 'Synthetic 1']
+        owner, reader = gci.cals
+        window = (parse('2018-03-05T00:00:00Z'),
+                  parse('2018-03-19T00:00:00Z'))
+
+        path = tmpdir.join('plan.txt').strpath
+        trace.enable([trace.PLAN], path)
+        try:
+            plan = gci._plan(window[0], window[1], None)
+            busy_plan = gci._plan(window[0], window[1], None, cached=False,
+                                  busy=True)
+        finally:
+            trace.disable()
+        # events are listed even where we only see busy times, unless
+        # those are all that's needed
+        assert plan == [(owner, gci.PLAN_LIST, [window]),
+                        (reader, gci.PLAN_LIST, [window])]
+        assert busy_plan == [(owner, gci.PLAN_LIST, [window]),
+                             (reader, gci.PLAN_FREEBUSY, [window])]
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 6
+        assert 'Synthetic 1: freebusy' in lines[5]
+        assert 'role=freeBusyReader' in lines[5]
+
+        events = gci._search_for_cal_events(window[0], window[1], None)
+        assert server.stats['POST /calendar/v3/freeBusy'] == 0
+        assert [e['id'] for e in gci._merged_cal_events(
+            window[0], window[1], None)] == [e['id'] for e in events]
+
+        # fetched windows come from the cache, and only what's missing of
+        # a wider one is fetched
+        requests = server.stats['requests']
+        assert [source for _, source, _ in gci._plan(
+            window[0], window[1], None)] == [gci.PLAN_CACHE, gci.PLAN_CACHE]
+        assert gci._search_for_cal_events(window[0], window[1], None) == \
+            events
+        assert server.stats['requests'] == requests
+        wider = (window[0] - timedelta(days=7), window[1])
+        assert [windows for _, _, windows in gci._plan(
+            wider[0], wider[1], None)] == [[(wider[0], window[0])]] * 2
+
+        assert [source for _, source, _ in gci._plan(
+            window[0], window[1], None, synced=True, cached=False)] == \
+            [gci.PLAN_SYNC, gci.PLAN_SYNC]
+
+
+def test_find_time_freebusy_errors(monkeypatch):
+    data = SyntheticCalendars(events=300, calendars=2, descr_size=40,
+                              roles=('owner', 'freeBusyReader'))
+    with StandinServer(data, page_size=25) as server:
+        monkeypatch.setattr(gcal.time, 'sleep', lambda secs: None)
+        gci = GoogleCalendarInterface(use_cache=False,
+                                      api_endpoint=server.url)
+        start = parse('2018-03-05T00:00:00Z')
+        end = parse('2018-03-19T00:00:00Z')
+        expected = list(gci.find_time(start, end, weekends=True))
+        events = server.stats['GET /calendar/v3/calendars/*/events']
+
+        freebusy = server.api.freebusy
+
+        def failing(body):
+            status, result = freebusy(body)
+            for info in result['calendars'].values():
+                info['errors'] = [{'domain': 'calendar',
+                                   'reason': 'tooManyCalendarsRequested'
+                                             'ForExpansion'}]
+            return status, result
+        monkeypatch.setattr(server.api, 'freebusy', failing)
+        # the calendar is listed instead of looking free
+        assert list(gci.find_time(start, end, weekends=True)) == expected
+        assert server.stats['GET /calendar/v3/calendars/*/events'] > \
+            events * 2
+
+
+def test_memprofile_import(standin, tmpdir, capsys):
+    from gcalcli.memprofile import MemoryProfile
+    event = ('BEGIN:VEVENT\r\nUID:%d@example.com\r\nSUMMARY:Imported %d\r\n'
+             'DTSTART:20180301T100000Z\r\nDTEND:20180301T110000Z\r\n'
+             'END:VEVENT\r\n')
+    ics = tmpdir.join('two.ics')
+    # two calendars in one file
+    ics.write(''.join('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n%s'
+                      'END:VCALENDAR\r\n' % (event % (n, n))
+                      for n in range(2)))
+    profile = MemoryProfile(top=5)
+    try:
+        gci = GoogleCalendarInterface(use_cache=False,
+                                      api_endpoint=standin.url,
+                                      memprofile=profile)
+        gci.ImportICS(dump=True, reminder=[], icsFile=ics.strpath)
+    finally:
+        profile.stop()
+    assert 'Imported 1' in capsys.readouterr().out
+    # parsed once for the whole file
+    assert [p[0] for p in profile.phases] == ['parse']
@@ -0,0 +1,70 @@
+from gcalcli import trace
+import json
+import pytest
+
+
+@pytest.fixture
+def traced(tmpdir):
+    def enable(categories, format='text'):
+        path = tmpdir.join('trace.%s' % format).strpath
+        trace.enable(categories, path, format)
+        return path
+    yield enable
+    trace.disable()
+
+
+def test_categories():
+    assert trace.parse_categories('all') == trace.CATEGORIES
+    assert trace.parse_categories(' cache,http ') == [trace.CACHE, trace.HTTP]
+    assert trace.parse_categories('') == []
+    with pytest.raises(ValueError):
+        trace.parse_categories('http,nope')
+
+
+def test_lazy(traced):
+    class Costly(object):
+        def __str__(self):
+            raise AssertionError('formatted while off')
+
+    path = traced([trace.HTTP])
+    trace.RENDER('%s', Costly())
+    with trace.RENDER.span('%s', Costly()) as span:
+        span.note(rows=1)
+    trace.HTTP('GET %s', '/calendars')
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 and lines[0].endswith(' http   GET /calendars')
+
+
+def test_text(traced):
+    path = traced(trace.CATEGORIES)
+    with trace.HTTP.span('GET %s', '/events') as span:
+        span.note(status=200)
+    trace.CACHE('%d hits', 3, calendar='work')
+
+    @trace.RENDER.traced
+    def draw():
+        return 'done'
+
+    assert draw() == 'done'
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert 'http   GET /events status=200 (' in lines[0]
+    assert lines[0].endswith(' ms)')
+    assert lines[1].endswith('cache  3 hits calendar=work')
+    assert 'render draw (' in lines[2]
+
+
+def test_json(traced):
+    path = traced([trace.HTTP, trace.PARSE], 'json')
+    with trace.HTTP.span('GET %s', '/events'):
+        trace.PARSE('page of %d events', 250)
+    with open(path) as f:
+        text = f.read()
+    # a Chrome trace, which may leave out the closing bracket
+    events = json.loads(text.rstrip(',\n') + ']')
+    assert [(e['cat'], e['ph'], e['name']) for e in events] == [
+        ('parse', 'i', 'page of 250 events'), ('http', 'X', 'GET /events')]
+    parse, http = events
+    assert http['ts'] <= parse['ts'] <= http['ts'] + http['dur']
+    assert parse['tid'] == http['tid']
@@ -1,4 +1,5 @@
-from gcalcli.utils import get_time_from_str
+from gcalcli.utils import DateTimeParser, _parse_absolute, get_time_from_str
+import pytest
 
 
 def test_get_time_from_str():
@@ -6,3 +7,24 @@ def test_get_time_from_str():
     two_hrs_later = '2018-01-01T02:00:00+00:00'
     assert (begin_2018_gmt, two_hrs_later) == \
         get_time_from_str(begin_2018_gmt, e_duration=120)
+
+
+def test_date_parser_memo():
+    parser = DateTimeParser()
+    _parse_absolute.cache_clear()
+
+    first = parser.from_string('2018-03-05 10:00')
+    assert parser.from_string('2018-03-05 10:00') == first
+    assert _parse_absolute.cache_info().hits == 1
+
+    # fuzzy input fails dateutil once, after which the failure is cached
+    parser.from_string('tomorrow')
+    parser.from_string('tomorrow')
+    assert _parse_absolute.cache_info().hits == 2
+
+    with pytest.raises(ValueError):
+        parser.from_string('not a date at all')
+
+
+def test_date_parser_shares_pdt_calendar():
+    assert DateTimeParser().pdtCalendar is DateTimeParser().pdtCalendar
@@ -0,0 +1,180 @@
+"""Structured tracing, for --debug and --trace.
+
+Trace points belong to a category, one of HTTP, CACHE, PLAN, PARSE and
+RENDER, each turned on separately with enable().  A trace point is an
+instant::
+
+    trace.CACHE('%s: %d events from the window cache', name, count)
+
+or a span with a duration::
+
+    with trace.HTTP.span('%s %s', method, uri) as span:
+        ...
+        span.note(status=200)
+
+which can also cover a whole function with @trace.RENDER.traced.
+
+Messages are %-formatted only if their category is on, and a category that
+is off costs an attribute check, so trace points can sit in tight loops;
+arguments that are costly to compute should still be guarded with
+``if trace.RENDER.on:``.
+
+Output is either lines of text or Chrome trace events (JSON), which
+chrome://tracing and Perfetto load as a timeline, one row per thread.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+FORMATS = ['text', 'json']
+
+_lock = threading.Lock()
+_out = None
+_format = 'text'
+_target = None
+_started = time.perf_counter()
+
+
+class _NoSpan(object):
+    """What span() gives when the category is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def note(self, **fields):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span(object):
+
+    def __init__(self, category, msg, args, fields):
+        self.category = category
+        self.msg = msg
+        self.args = args
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        _emit(self.category.name, self.msg, self.args, self.fields,
+              self.start, time.perf_counter() - self.start)
+        return False
+
+    def note(self, **fields):
+        """Adds `fields` to what the span records."""
+        self.fields.update(fields)
+
+
+class Category(object):
+    __slots__ = ('name', 'on')
+
+    def __init__(self, name):
+        self.name = name
+        self.on = False
+
+    def __call__(self, msg, *args, **fields):
+        if self.on:
+            _emit(self.name, msg, args, fields, time.perf_counter(), None)
+
+    def span(self, msg, *args, **fields):
+        if not self.on:
+            return _NO_SPAN
+        return _Span(self, msg, args, fields)
+
+    def traced(self, function):
+        """Decorates `function` to be traced as a span named after it."""
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.on:
+                return function(*args, **kwargs)
+            with _Span(self, name, (), {}):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+HTTP = Category('http')
+CACHE = Category('cache')
+PLAN = Category('plan')
+PARSE = Category('parse')
+RENDER = Category('render')
+
+CATEGORIES = [HTTP, CACHE, PLAN, PARSE, RENDER]
+
+
+def parse_categories(value):
+    """The categories named in `value`, e.g. 'http,cache' or 'all'.  Raises
+    ValueError for unknown names."""
+    names = set(name.strip() for name in value.split(',') if name.strip())
+    if 'all' in names:
+        return list(CATEGORIES)
+    known = dict((category.name, category) for category in CATEGORIES)
+    unknown = names - set(known)
+    if unknown:
+        raise ValueError('unknown trace categories: %s' %
+                         ', '.join(sorted(unknown)))
+    return [known[name] for name in sorted(names)]
+
+
+def enable(categories, path=None, format='text'):
+    """Turns on `categories`, and off the others, writing to the file at
+    `path` (stderr by default) in `format`, 'text' or 'json'.  Enabling
+    again with the same path and format carries on with the same trace."""
+    global _out, _format, _target
+    with _lock:
+        if _target != (path, format):
+            _out = open(path, 'w') if path else sys.stderr
+            _format = format
+            _target = (path, format)
+            if format == 'json':
+                # Chrome's trace format allows leaving out the closing ]
+                _out.write('[\n')
+    for category in CATEGORIES:
+        category.on = category in categories
+
+
+def disable():
+    for category in CATEGORIES:
+        category.on = False
+
+
+def _emit(category, msg, args, fields, start, duration):
+    text = msg % args if args else msg
+    with _lock:
+        if _out is None:
+            return
+        if _format == 'json':
+            record = {'name': text, 'cat': category,
+                      'ts': round((start - _started) * 1e6, 1),
+                      'pid': os.getpid(), 'tid': threading.get_ident()}
+            if duration is None:
+                record.update(ph='i', s='t')
+            else:
+                record.update(ph='X', dur=round(duration * 1e6, 1))
+            if fields:
+                record['args'] = fields
+            _out.write(json.dumps(record, default=str) + ',\n')
+        else:
+            line = '%10.3f %-6s %s' % ((start - _started) * 1000, category,
+                                       text.rstrip('\n'))
+            if fields:
+                line += ' ' + ' '.join('%s=%s' % item
+                                       for item in sorted(fields.items()))
+            if duration is not None:
+                line += ' (%.1f ms)' % (duration * 1000)
+            _out.write(line + '\n')
+        _out.flush()
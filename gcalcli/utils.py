@@ -1,5 +1,6 @@
-import calendar
-from datetime import datetime, timedelta
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 import time
 
 # Required 3rd party libraries
@@ -24,19 +25,26 @@ except Exception:
 
 
 class DateTimeParser:
-    def __init__(self):
-        self.pdtCalendar = parsedatetime.Calendar()
+    # Building a parsedatetime.Calendar is expensive, so every parser in the
+    # process shares the same one.  It keeps state while parsing, so only one
+    # thread at a time gets to use it.
+    _pdtCalendar = None
+    _pdtLock = threading.Lock()
+
+    @property
+    def pdtCalendar(self):
+        if DateTimeParser._pdtCalendar is None:
+            DateTimeParser._pdtCalendar = parsedatetime.Calendar()
+        return DateTimeParser._pdtCalendar
 
     def from_string(self, eWhen):
-        defaultDateTime = datetime.now(tzlocal()).replace(hour=0,
-                                                          minute=0,
-                                                          second=0,
-                                                          microsecond=0)
+        eTimeStart = _parse_absolute(eWhen, date.today())
 
-        try:
-            eTimeStart = parse(eWhen, default=defaultDateTime)
-        except Exception:
-            struct, result = self.pdtCalendar.parse(eWhen)
+        if eTimeStart is None:
+            # fuzzy strings ("tomorrow 3pm", "in 2 hours") depend on the time
+            # of day and not just the day, so these are never memoised
+            with DateTimeParser._pdtLock:
+                struct, result = self.pdtCalendar.parse(eWhen)
             if not result:
                 raise ValueError("Date and time is invalid")
             eTimeStart = datetime.fromtimestamp(time.mktime(struct), tzlocal())
@@ -44,17 +52,36 @@ class DateTimeParser:
         return eTimeStart
 
 
+@lru_cache(maxsize=1024)
+def _parse_absolute(eWhen, day):
+    """dateutil's reading of eWhen with missing fields taken from midnight
+    of `day`, or None if dateutil can't parse it.  The result only depends on
+    the arguments, so it is memoised, including the failures that send
+    from_string on to parsedatetime."""
+    defaultDateTime = datetime(day.year, day.month, day.day, tzinfo=tzlocal())
+    try:
+        return parse(eWhen, default=defaultDateTime)
+    except Exception:
+        return None
+
+
+# Because I hate magic numbers
+__DAYS_IN_SECONDS__ = 24 * 60 * 60
+__EPOCH_ORDINAL__ = date(1970, 1, 1).toordinal()
+
+
 def days_since_epoch(dt):
-    # Because I hate magic numbers
-    __DAYS_IN_SECONDS__ = 24 * 60 * 60
-    return calendar.timegm(dt.timetuple()) / __DAYS_IN_SECONDS__
+    # the same as calendar.timegm(dt.timetuple()) / __DAYS_IN_SECONDS__,
+    # without building the time tuple: caly calls this for every event
+    seconds = (dt.toordinal() - __EPOCH_ORDINAL__) * __DAYS_IN_SECONDS__
+    if isinstance(dt, datetime):
+        seconds += dt.hour * 3600 + dt.minute * 60 + dt.second
+    return seconds / __DAYS_IN_SECONDS__
 
 
 def get_time_from_str(e_when, e_duration=0, allday=False):
-    dtp = DateTimeParser()
-
     try:
-        e_time_start = dtp.from_string(e_when)
+        e_time_start = DateTimeParser().from_string(e_when)
     except Exception:
         raise ValueError('Date and time is invalid.')
 